@@ -1,3 +1,4 @@
 """Init module"""
 
-from .utils import read_csv_and_analyze, analyze_custom_time_range
+from .utils import read_csv_and_analyze, analyze_custom_time_range, analyze_otlp_file
+from .follow import follow_traces
@@ -0,0 +1,219 @@
+"""
+This module implements a local cache of fetched and parsed spans.
+The spans are stored in a SQLite database together with the time ranges
+they completely cover, so only the uncovered parts of a time range have to be fetched.
+"""
+
+import hashlib
+import json
+import logging
+import os
+import sqlite3
+import time
+
+from trace_explorer import config
+from trace_explorer.definitions import span as span_def
+from trace_explorer.parsers.common import loads
+
+logger = logging.getLogger(__name__)
+logger.setLevel(logging.DEBUG)
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS segments (
+    id INTEGER PRIMARY KEY,
+    start_time INTEGER,
+    end_time INTEGER,
+    covering INTEGER NOT NULL,
+    size INTEGER NOT NULL,
+    last_used REAL NOT NULL
+);
+CREATE TABLE IF NOT EXISTS spans (
+    trace_id TEXT NOT NULL,
+    span_id TEXT NOT NULL,
+    start_time INTEGER NOT NULL,
+    segment INTEGER NOT NULL,
+    data TEXT NOT NULL,
+    PRIMARY KEY (trace_id, span_id)
+);
+CREATE INDEX IF NOT EXISTS spans_start_time ON spans (start_time);
+CREATE INDEX IF NOT EXISTS spans_span_id ON spans (span_id);
+CREATE INDEX IF NOT EXISTS spans_segment ON spans (segment);
+"""
+
+
+def get_cache_path():
+    """
+    Return the path of the cache database for the configured Storage-Backend.
+    Every Storage-Backend and dataformat has a separate database.
+    """
+    source = json.dumps([
+        config.DB_SETTINGS.get(key) for key in ['ENGINE', 'URL', 'PORT', 'DATAFORMAT',
+                                                'INDEX_PREFIX', 'PATH']
+    ])
+    name = hashlib.sha1(source.encode('utf-8')).hexdigest()[:16]
+    return os.path.join(config.CACHE_DIR, f'spans-{name}.sqlite')
+
+def get_cache():
+    """Return the span cache or None if the cache is disabled (config)."""
+    if not config.CACHE_ENABLED:
+        return None
+    os.makedirs(config.CACHE_DIR, exist_ok=True)
+    return SpanCache(get_cache_path(), config.CACHE_MAX_BYTES)
+
+
+class SpanCache:
+    """
+    Stores parsed spans (traceID -> spanID -> span data) in segments.
+    A segment contains the spans of a single fetch and is either covering a time range
+    completely or just contains some spans (e.g. referenced spans fetched by their IDs).
+    Least recently used segments are evicted if the cached data exceeds the maximum size.
+    """
+
+    def __init__(self, path, max_bytes):
+        self.max_bytes = max_bytes
+        self.connection = sqlite3.connect(path)
+        self.connection.executescript(SCHEMA)
+
+    def close(self):
+        """Closes the database connection."""
+        self.connection.close()
+
+    def get_gaps(self, start_time, end_time):
+        """Return the parts of the time range which are not covered by the cache."""
+        covered = self.connection.execute(
+            "SELECT start_time, end_time FROM segments "
+            "WHERE covering AND end_time >= ? AND start_time <= ? ORDER BY start_time",
+            (start_time, end_time)
+        )
+        gaps = []
+        current = start_time
+        for covered_start, covered_end in covered:
+            if covered_start > current:
+                gaps.append((current, covered_start))
+            current = max(current, covered_end)
+        if current < end_time:
+            gaps.append((current, end_time))
+        return gaps
+
+    def load_range(self, start_time, end_time, result):
+        """Merges all cached spans which started in the time range into the result."""
+        rows = self.connection.execute(
+            "SELECT trace_id, span_id, data, segment FROM spans "
+            "WHERE start_time >= ? AND start_time <= ?",
+            (start_time, end_time)
+        )
+        self.touch(self.merge_rows(rows, result))
+
+    def load_spans_by_ids(self, span_ids, result):
+        """Merges the cached spans with the given IDs into the result. Returns the found IDs."""
+        found = set()
+        span_ids = list(span_ids)
+        segments = set()
+        for i in range(0, len(span_ids), 500): # stay below the limit of SQL variables
+            chunk = span_ids[i:i + 500]
+            rows = self.connection.execute(
+                "SELECT trace_id, span_id, data, segment FROM spans "
+                f"WHERE span_id IN ({','.join('?' * len(chunk))})",
+                chunk
+            )
+            segments.update(self.merge_rows(rows, result, found))
+        self.touch(segments)
+        return found
+
+    @staticmethod
+    def merge_rows(rows, result, found=None):
+        """Merges spans from the database into the result. Returns their segments."""
+        segments = set()
+        for trace_id, span_id, data, segment in rows:
+            result.setdefault(trace_id, {})[span_id] = loads(data)
+            segments.add(segment)
+            if found is not None:
+                found.add(span_id)
+        return segments
+
+    def touch(self, segments):
+        """Marks the segments as recently used."""
+        now = time.time()
+        with self.connection:
+            self.connection.executemany(
+                "UPDATE segments SET last_used = ? WHERE id = ?",
+                [(now, segment) for segment in segments]
+            )
+
+    def store(self, traces, start_time=None, end_time=None):
+        """
+        Stores the spans of a fetch. If a time range is given, the spans are marked
+        as covering it, except for its most recent part (config.CACHE_SETTLE_TIME)
+        which could still be incomplete.
+        """
+        covering = start_time is not None
+        if covering:
+            now = time.time_ns() // 1000 # microseconds
+            end_time = min(end_time, now - config.CACHE_SETTLE_TIME)
+            covering = end_time > start_time
+
+        rows = []
+        size = 0
+        for trace_id, spans in traces.items():
+            for span_id, span_data in spans.items():
+                data = json.dumps(span_data)
+                size += len(data)
+                rows.append((trace_id, span_id, span_data[span_def.START_TIME], data))
+        if not rows and not covering:
+            return
+
+        with self.connection:
+            segment = self.connection.execute(
+                "INSERT INTO segments (start_time, end_time, covering, size, last_used) "
+                "VALUES (?, ?, ?, ?, ?)",
+                (start_time, end_time, covering, size, time.time())
+            ).lastrowid
+            # spans of a covering segment have to be evicted with it, other spans stay in
+            # their segment, so that a covering segment does not lose them by an eviction
+            conflict = 'REPLACE' if covering else 'IGNORE'
+            self.connection.executemany(
+                f"INSERT OR {conflict} INTO spans (trace_id, span_id, start_time, segment, data) "
+                "VALUES (?, ?, ?, ?, ?)",
+                [row[:3] + (segment,) + row[3:] for row in rows]
+            )
+        self.evict()
+
+    def invalidate(self, start_time, end_time):
+        """Removes the segments overlapping with the time range."""
+        with self.connection:
+            segments = [row[0] for row in self.connection.execute(
+                "SELECT DISTINCT segment FROM spans WHERE start_time >= ? AND start_time <= ? "
+                "UNION SELECT id FROM segments "
+                "WHERE covering AND end_time >= ? AND start_time <= ?",
+                (start_time, end_time, start_time, end_time)
+            )]
+            self.delete(segments)
+
+    def evict(self):
+        """
+        Removes the least recently used segments until the size of the cached data is
+        below the maximum. The size of a segment is not reduced if some of its spans are
+        replaced by a later segment or were already cached, so the size is rather overestimated.
+        """
+        total = self.connection.execute(
+            "SELECT COALESCE(SUM(size), 0) FROM segments"
+        ).fetchone()[0]
+        if total <= self.max_bytes:
+            return
+        segments = []
+        for segment, size in self.connection.execute(
+            "SELECT id, size FROM segments ORDER BY last_used, id"
+        ).fetchall():
+            if total <= self.max_bytes:
+                break
+            segments.append(segment)
+            total -= size
+        logger.info('Evicting %r segments from the span cache.', len(segments))
+        with self.connection:
+            self.delete(segments)
+
+    def delete(self, segments):
+        """Removes the segments and their spans."""
+        params = [(segment,) for segment in segments]
+        self.connection.executemany("DELETE FROM spans WHERE segment = ?", params)
+        self.connection.executemany("DELETE FROM segments WHERE id = ?", params)
@@ -26,21 +26,65 @@ def adjust_timestamps(span, shift):
     for log in span.logs:
         log[logs.TIMESTAMP] += shift
 
-def adjust_clock_skew(parent, child):
+def get_clock_skew_shifts(root):
     """
-    Adjust timestamp of child if clock skew detected.
+    Calculates the time shifts for all spans of the tree in topological order.
+    A span is shifted if it starts before its (already shifted) parent,
+    the shift is inherited by all of its descendants.
+    Returns the shifted spans with their total shift
+    and the spans with a detected clock skew with their own shift.
     """
-    if parent.start_time < child.start_time:
-        return
+    shifted = []
+    skewed = []
+    stack = [(root, None, 0)] # span, shifted start time of the parent, inherited shift
+    while stack:
+        span, parent_start, shift = stack.pop()
+        start_time = span.start_time + shift
+        if parent_start is not None and parent_start >= start_time:
+            own_shift = get_time_shift(
+                parent_start,
+                span.parent.duration,
+                start_time,
+                span.duration
+            )
+            skewed.append((span, own_shift))
+            shift += own_shift
+            start_time += own_shift
+        if shift:
+            shifted.append((span, shift))
+        for child in span.children:
+            stack.append((child, start_time, shift))
+    return shifted, skewed
 
-    shift = get_time_shift(
-        parent.start_time, 
-        parent.duration, 
-        child.start_time, 
-        child.duration
-    )
-    adjust_timestamps(child, shift)
-    logger.info(
-        'Timestamp adjusted in Trace %s: Service "%s" with Span ID "%s"', 
-        child.trace_id, child.service, child.span_id
-    )
+def summarize_clock_skew(skewed):
+    """
+    Return the number of spans with a detected clock skew
+    and the largest shift per service.
+    """
+    result = {}
+    for span, shift in skewed:
+        summary = result.setdefault(span.service.get('name'), {'spans': 0, 'maxShift': 0})
+        summary['spans'] += 1
+        # ties are broken by the sign to be independent of the order of the spans
+        if (abs(shift), shift) > (abs(summary['maxShift']), summary['maxShift']):
+            summary['maxShift'] = shift
+    return result
+
+def adjust_clock_skew(root):
+    """
+    Adjusts the timestamps of all spans of the tree which started before their parent
+    (and of their descendants). Has to be done after all relations are resolved,
+    so the result does not depend on the order of the references.
+    Returns a summary of the detected clock skew per service.
+    """
+    shifted, skewed = get_clock_skew_shifts(root)
+    for span, shift in shifted:
+        adjust_timestamps(span, shift)
+
+    summary = summarize_clock_skew(skewed)
+    for service, service_summary in sorted(summary.items()):
+        logger.info(
+            'Timestamps adjusted in Trace %s: Service "%s" with %s span(s), largest shift %s',
+            root.trace_id, service, service_summary['spans'], service_summary['maxShift']
+        )
+    return summary
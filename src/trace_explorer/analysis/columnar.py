@@ -0,0 +1,71 @@
+"""
+This module provides a column-oriented representation of the spans of one or more traces.
+The statistics of large time ranges can be computed without creating a Span-object per span.
+"""
+import numpy as np
+
+from trace_explorer.definitions import tags, http
+from trace_explorer.definitions import span as span_def
+from trace_explorer.queries.stats import get_span_stats
+
+
+def has_error(span_data):
+    """
+    Checks wheter the span contains the error tag or the HTTP status code 500,
+    like the error query of the Storage-Backends.
+    """
+    span_tags = span_data[span_def.TAGS]
+    if span_tags.get(tags.ERROR_KEY):
+        return True
+    return str(span_tags.get(tags.HTTP_STATUS_CODE_KEY)) == str(http.STATUS_500)
+
+
+class SpanColumns:
+    """
+    Represents the spans of one or more traces as arrays with one entry per span.
+    Traces and services are stored as integer codes.
+    """
+
+    def __init__(self, traces_raw):
+        """
+        Builds the columns from the output of a parser (traceID -> spanID -> span data).
+        """
+        trace_codes = {}
+        service_codes = {}
+        trace = []
+        start_time = []
+        duration = []
+        error = []
+        service = []
+        for trace_id, spans in traces_raw.items():
+            trace_code = trace_codes.setdefault(trace_id, len(trace_codes))
+            for span_data in spans.values():
+                name = span_data[span_def.SERVICE_NAME]['name']
+                trace.append(trace_code)
+                start_time.append(span_data[span_def.START_TIME])
+                duration.append(span_data[span_def.DURATION])
+                error.append(has_error(span_data))
+                service.append(service_codes.setdefault(name, len(service_codes)))
+
+        self.trace_ids = list(trace_codes)
+        self.services = list(service_codes)
+        self.trace = np.array(trace, dtype=np.int64)
+        self.start_time = np.array(start_time, dtype=np.int64)
+        self.duration = np.array(duration, dtype=np.int64)
+        self.error = np.array(error, dtype=bool)
+        self.service = np.array(service, dtype=np.int64)
+
+    def __len__(self):
+        return len(self.trace)
+
+    def get_stats(self, start: int, end: int):
+        """
+        Return the number of traces and spans starting in the time range and per service
+        the number of spans and errors and the statistics of their durations,
+        like the statistics of the Storage-Backends (query.get_szenario_stats).
+        """
+        mask = (self.start_time >= start) & (self.start_time <= end)
+        return get_span_stats(self.trace[mask],
+                              np.array(self.services, dtype=str)[self.service[mask]],
+                              self.duration[mask],
+                              self.error[mask])
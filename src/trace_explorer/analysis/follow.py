@@ -0,0 +1,209 @@
+"""
+This module implements the continuous analysis of new spans (follow mode).
+The Storage-Backend is polled with a moving watermark on the start time of the spans.
+The spans are buffered per trace until no new span of the trace arrived for a quiet
+period (config.FOLLOW_QUIET_PERIOD), then the trace is analyzed like in a single run.
+"""
+
+import logging
+import time
+
+from trace_explorer import config
+from trace_explorer.definitions import span as span_def
+from trace_explorer.parsers import get_parser
+from trace_explorer.queries import QUERY_ERRORS, get_query
+from trace_explorer.reports.ndjson import open_results
+from trace_explorer.rules.parser import get_rules
+
+from .models import Szenario
+from .utils import (
+    create_executor, create_reports, fetch_missing_spans, fetch_spans_in_range, map_traces
+)
+
+logger = logging.getLogger(__name__)
+logger.setLevel(logging.DEBUG)
+
+# Number of analyzed traces which are remembered to ignore their late spans
+COMPLETED_SIZE = 100000
+# Number of the most recent traces with errors in the szenario report
+REPORTED_SIZE = 1000
+
+
+class TraceBuffer:
+    """
+    Buffers the spans of open traces, ordered by the time their last new span arrived.
+    The number of buffered spans is limited (config.FOLLOW_MAX_SPANS), the traces
+    which were not updated for the longest time are evicted first.
+    """
+
+    def __init__(self, max_spans, completed_size=COMPLETED_SIZE):
+        self.max_spans = max_spans
+        self.completed_size = completed_size
+        self.traces = {} # TraceID -> spans, least recently updated first
+        self.updated = {} # TraceID -> time of the last new span
+        self.span_count = 0
+        self.completed = {} # TraceIDs of analyzed traces, oldest first (ordered set)
+
+    def add(self, traces_raw, now):
+        """
+        Adds fetched spans to their traces. Spans which are already buffered do not
+        count as update of their trace. Returns the number of new spans.
+        Spans of traces which were already analyzed are ignored.
+        """
+        added = 0
+        for trace_id, spans in traces_raw.items():
+            if trace_id in self.completed:
+                logger.debug('Ignoring spans of already analyzed trace %s.', trace_id)
+                continue
+            trace = self.traces.get(trace_id, {})
+            new = {span_id: span_data for span_id, span_data in spans.items()
+                   if span_id not in trace}
+            if not new:
+                continue
+            # move the trace to the end of the order
+            self.traces.pop(trace_id, None)
+            trace.update(new)
+            self.traces[trace_id] = trace
+            self.updated[trace_id] = now
+            added += len(new)
+        self.span_count += added
+        return added
+
+    def pop(self, trace_id):
+        """Removes a trace from the buffer and remembers it as analyzed."""
+        spans = self.traces.pop(trace_id)
+        del self.updated[trace_id]
+        self.span_count -= len(spans)
+        self.completed[trace_id] = None
+        if len(self.completed) > self.completed_size:
+            del self.completed[next(iter(self.completed))]
+        return spans
+
+    def pop_complete(self, now, quiet_period):
+        """
+        Removes and returns the traces without new spans for the quiet period.
+        If too many spans are buffered, the least recently updated traces are
+        returned as well, even if they could still be incomplete.
+        """
+        complete = []
+        for trace_id in self.traces:
+            if self.updated[trace_id] > now - quiet_period:
+                break
+            complete.append(trace_id)
+        result = {trace_id: self.pop(trace_id) for trace_id in complete}
+        evicted = 0
+        while self.span_count > self.max_spans:
+            trace_id = next(iter(self.traces))
+            result[trace_id] = self.pop(trace_id)
+            evicted += 1
+        if evicted:
+            logger.warning('Buffer full, analyzing %r traces before their quiet period.', evicted)
+        return result
+
+    def restore(self, traces_raw, now):
+        """Adds popped traces again, which could not be analyzed, so they are retried."""
+        for trace_id in traces_raw:
+            self.completed.pop(trace_id, None)
+        self.add(traces_raw, now)
+
+    def pop_all(self):
+        """Removes and returns all buffered traces."""
+        return {trace_id: self.pop(trace_id) for trace_id in list(self.traces)}
+
+
+class Follower:
+    """
+    Polls the Storage-Backend for new spans and analyzes the traces as soon
+    as they are complete. The results are written into the configured outputs.
+    """
+
+    def __init__(self, rules, query, parser, start_time):
+        self.rules = rules
+        self.query = query
+        self.parser = parser
+        self.watermark = start_time
+        self.buffer = TraceBuffer(config.FOLLOW_MAX_SPANS)
+        self.szenario = Szenario(f"Follow - {start_time}", "", "")
+        self.results = open_results()
+        # the worker processes are kept for all polls instead of being started per batch
+        self.executor = create_executor() if config.WORKERS > 1 else None
+
+    def poll(self, now):
+        """
+        Fetches the spans since the watermark and analyzes the complete traces.
+        Spans are only stored when they end, so the polled time ranges overlap
+        (config.FOLLOW_OVERLAP) to find long spans which arrive late.
+        If the Storage-Backend fails, the watermark is kept and the next poll retries.
+        """
+        fetched = {}
+        try:
+            fetch_spans_in_range(self.query, self.parser,
+                                 self.watermark - config.FOLLOW_OVERLAP, now, fetched)
+        except QUERY_ERRORS as error:
+            logger.error('Could not fetch the spans since %r, retrying with the next poll: %s',
+                         self.watermark, error)
+            return
+        self.watermark = now
+        added = self.buffer.add(fetched, now)
+        logger.debug('Fetched %r new spans, %r spans buffered.', added, self.buffer.span_count)
+        self.analyze(self.buffer.pop_complete(now, config.FOLLOW_QUIET_PERIOD), now)
+
+    def analyze(self, traces_raw, now):
+        """
+        Analyzes complete traces and writes their results. If the referenced spans
+        can not be fetched, the traces are buffered again and retried after the quiet period.
+        """
+        if not traces_raw:
+            return
+        start_time = min(span_data[span_def.START_TIME]
+                         for spans in traces_raw.values() for span_data in spans.values())
+        try:
+            fetch_missing_spans(traces_raw, self.query, self.parser, start_time, now)
+        except QUERY_ERRORS as error:
+            logger.error('Could not fetch the referenced spans of %r traces, retrying later: %s',
+                         len(traces_raw), error)
+            self.buffer.restore(traces_raw, now)
+            return
+        error_count = 0
+        for summary in map_traces(traces_raw, self.rules, self.executor):
+            if summary:
+                if self.results is not None:
+                    self.results.write(summary, [self.szenario.name])
+                self.szenario.add_trace(summary)
+                error_count += summary.error_count > 0
+        # only the most recent traces with errors are kept for the report
+        del self.szenario.traces[:-REPORTED_SIZE]
+        create_reports([self.szenario])
+        logger.info('Analyzed %r traces, %r with errors.', len(traces_raw), error_count)
+
+    def close(self):
+        """Analyzes all buffered traces, closes the outputs and stops the worker processes."""
+        try:
+            self.analyze(self.buffer.pop_all(), time.time_ns() // 1000)
+        finally:
+            if self.results is not None:
+                self.results.close()
+            if self.executor is not None:
+                self.executor.shutdown()
+
+    def run(self):
+        """Polls until the process is interrupted."""
+        try:
+            while True:
+                self.poll(time.time_ns() // 1000)
+                time.sleep(config.FOLLOW_POLL_INTERVAL / 1e6)
+        except KeyboardInterrupt:
+            logger.info('Stopping, analyzing %r buffered traces.', len(self.buffer.traces))
+        finally:
+            self.close()
+
+
+def follow_traces(start_time=None):
+    """
+    Analyzes new traces continuously until the process is interrupted.
+    Without a start time, only spans from now on are analyzed.
+    """
+    if start_time is None:
+        start_time = time.time_ns() // 1000
+    logger.info('Following new spans since %r.', start_time)
+    Follower(get_rules(), get_query(), get_parser(), start_time).run()
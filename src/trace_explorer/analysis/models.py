@@ -3,25 +3,30 @@ This module defines all models and helper functions to have an object-oriented
 representation of the data to analyze.
 """
 import re
+import sys
 
 from trace_explorer.definitions import tags, logs, http
 from trace_explorer.definitions import span as span_def
 
-from trace_explorer.queries import get_query
-from trace_explorer.parsers import get_parser
-
 from .clock_skew import adjust_clock_skew
 
 class Span:
     """Represents a span within a trace which was produced by an E2E-Test"""
 
+    # no instance dict: saves memory for traces with many spans
+    __slots__ = (
+        'span_id', 'trace_id', 'operation_name', 'start_time', 'duration', 'end_time',
+        'service', 'tags', 'logs', 'references', 'error', 'children', 'parent', 'previous',
+        'type', 'stack', 'cause_timestamp', 'cause', 'rating', 'caused', 'caused_by'
+    )
+
     def __init__(self, trace_id, span_id, span_data: dict):
         """
         Forcing KeyError if key does not exist
         """
         self.span_id = span_id
-        self.trace_id = trace_id
-        self.operation_name = span_data[span_def.OPERATION_NAME]
+        self.trace_id = sys.intern(trace_id)
+        self.operation_name = sys.intern(span_data[span_def.OPERATION_NAME])
         self.start_time = span_data[span_def.START_TIME]
         self.duration = span_data[span_def.DURATION]
         self.end_time = self.start_time + self.duration # both values must be in microseconds
@@ -42,6 +47,38 @@ class Span:
         self.caused_by = None # reference to a span which is closer to the root cause
 
     def __dict__(self):
+        result = self.get_fields()
+        stack = [(self, result)]
+        while stack:
+            span, fields = stack.pop()
+            for child in span.children:
+                child_fields = child.get_fields()
+                fields['children'].append(child_fields)
+                stack.append((child, child_fields))
+        return result
+
+    def __str__(self):
+        """
+        Makes JSON serialization possible.
+        """
+        return self.span_id
+
+    def __tree__(self):
+        """Return a hierarchical representation of the causal relationship."""
+        result = {}
+        stack = [(self, result)]
+        while stack:
+            span, tree = stack.pop()
+            children = []
+            tree[f'{span.span_id} - {span.operation_name}'] = {'children': children}
+            for child in span.children:
+                child_tree = {}
+                children.append(child_tree)
+                stack.append((child, child_tree))
+        return result
+
+    def get_fields(self):
+        """Return the fields of the span without the fields of its children."""
         return {
             'spanID': self.span_id,
             'operationName': self.operation_name,
@@ -53,22 +90,7 @@ class Span:
             'tags': self.tags,
             'logs': self.logs,
             'stack': self.stack,
-            'children': [child.__dict__() for child in self.children]
-        }
-
-    def __str__(self):
-        """
-        Makes JSON serialization possible.
-        """
-        return self.span_id
-
-    def __tree__(self):
-        """Return a hierarchical representation of the causal relationship."""
-        name = f'{self.span_id} - {self.operation_name}'
-        return {
-             name: {
-                 'children': [child.__tree__() for child in self.children]
-             }
+            'children': []
         }
 
     def has_error(self):
@@ -92,7 +114,6 @@ class Span:
         if isinstance(parent, Span):
             if self.parent is None:
                 self.parent = parent
-                adjust_clock_skew(parent, self)
             else:
                 raise ValueError('Circular dependency detected')
         else:
@@ -136,12 +157,12 @@ class Span:
         Return a list of related spans with errors which
         where produced by the current span.
         """
-        strand = []
-        if self.caused:
-            strand.extend(self.caused.get_caused_strand())
-        elif not self in strand:
-            strand.append(self)
-        return strand
+        span = self
+        visited = set() # stop at circular references
+        while span.caused and span not in visited:
+            visited.add(span)
+            span = span.caused
+        return [span]
 
 
 class Trace:
@@ -150,9 +171,11 @@ class Trace:
     def __init__(self, trace_id, spans):
         self.error_count = 0
         self.trace_id = trace_id
+        self.span_index = {} # SpanID -> Span
         self.spans = self.init_spans(spans)
         self.resolve_relations()
         self.root_span = self.get_root_span()
+        self.clock_skew = adjust_clock_skew(self.root_span) # service name -> summary
         self.start_time = self.get_start_time()
         self.order_children(self.root_span)
         self.filename = f'trace_{self.trace_id}.html'
@@ -171,6 +194,10 @@ class Trace:
             'filename': self.filename
         }
 
+    def summarize(self):
+        """Return a summary of the trace without its spans."""
+        return TraceSummary(self.trace_id, self.error_count, self.start_time, self.filename)
+
     def init_spans(self, spans):
         """
         Initializes Span-objects from their dictionary representation
@@ -179,16 +206,27 @@ class Trace:
         result = []
         for span_id, span in spans.items():
             obj = Span(self.trace_id, span_id, span)
+            self.index_span(obj)
             if obj.error:
                 self.error_count += 1
             result.append(obj)
         return result
 
+    def index_span(self, span):
+        """
+        Adds a span to the lookup index of the trace.
+        SpanIDs have to be unique within a trace.
+        """
+        if span.span_id in self.span_index:
+            raise ValueError("Found spans with same ID. SpanIDs have to be unique!")
+        self.span_index[span.span_id] = span
+
     def add_span(self, span_id, span_data):
         """
         Adds a new span to the existing trace.
         """
         span = Span(self.trace_id, span_id, span_data)
+        self.index_span(span)
         if span.error:
             self.error_count += 1
         self.spans.append(span)
@@ -223,38 +261,34 @@ class Trace:
         """
         Resolves the string-based reference of a span
         to point to the span instance of the reference.
+        Referenced spans outside of the queried data have to be fetched
+        in advance (see analysis.utils.fetch_missing_spans).
         """
         ref_id = reference.get(span_def.SPAN_ID)
         ref_type = reference.get(span_def.REF_TYPE_KEY)
-        parent = list(filter(lambda span: span.span_id == ref_id, self.spans))
+        parent = self.span_index.get(ref_id)
 
-        if len(parent) > 1:
-            raise ValueError("Found spans with same ID. SpanIDs have to be unique!")
-        if len(parent) < 1:
-            try:
-                query = get_query()
-                parser = get_parser()
-                data = query.get_span_from_storage(ref_id)
-                span_dict = parser.parse_spans(data)[self.trace_id]
-                parent = [self.add_span(ref_id, span_dict[ref_id])]
-            except Exception as e:
-                raise ValueError(f"Found a reference to a not existing span!: {ref_id}")
+        if parent is None:
+            raise ValueError(f"Found a reference to a not existing span!: {ref_id}")
 
         if ref_type == span_def.REF_TYPE_CHILD_OF:
-            parent[0].add_child(span)
+            parent.add_child(span)
         elif ref_type == span_def.REF_TYPE_FOLLOWS_FROM:
-            parent[0].add_follower(span)
+            parent.add_follower(span)
 
     def order_children(self, span):
         """
-        Orders the children of a span by their start_time.
+        Orders the children of a span and all of its descendants by their start_time.
         Sets a pointer to the previous span the remain the order.
         """
-        sorted_children = sorted(span.children, key=lambda span: span.start_time)
-        for i, child in enumerate(sorted_children):
-            if i > 0:
-                child.previous = sorted_children[i-1]
-            self.order_children(child)
+        stack = [span]
+        while stack:
+            current = stack.pop()
+            sorted_children = sorted(current.children, key=lambda span: span.start_time)
+            for i, child in enumerate(sorted_children):
+                if i > 0:
+                    child.previous = sorted_children[i-1]
+            stack.extend(sorted_children)
 
     def get_error_strands(self):
         """
@@ -274,6 +308,41 @@ class Trace:
         return strands
 
 
+class TraceSummary:
+    """
+    Represents the result of an analyzed trace without its spans.
+    Lightweight enough to be returned from a worker process.
+    """
+
+    def __init__(self, trace_id, error_count, start_time, filename, result=None):
+        self.trace_id = trace_id
+        self.error_count = error_count
+        self.start_time = start_time
+        self.filename = filename
+        self.result = result # machine-readable result, until it is written
+
+    def __reduce__(self):
+        """
+        Makes pickling possible, which would otherwise use the __dict__ method.
+        """
+        return (TraceSummary, (self.trace_id, self.error_count, self.start_time, self.filename,
+                               self.result))
+
+    def __str__(self):
+        """
+        Makes JSON serialization possible.
+        """
+        return self.trace_id
+
+    def __dict__(self):
+        return {
+            'traceID': self.trace_id,
+            'errorCount': self.error_count,
+            'startTime': self.start_time,
+            'filename': self.filename
+        }
+
+
 class Szenario:
     """Represents a test execution of an E2E-Test"""
 
@@ -281,26 +350,33 @@ class Szenario:
         self.name = name
         self.errors = errors
         self.failures = failures
-        self.traces = []
+        self.traces = [] # only traces with errors, the others are only counted
         self.traces_error_count = 0
+        self.traces_count = 0
+        self.stats = None # statistics of all spans in the time range of the szenario
 
     def __dict__(self):
-        traces_with_error = [trace.__dict__() for trace in self.traces if trace.error_count > 0]
         return {
             'name': self.name,
             'errors': self.errors,
             'failures': self.failures,
-            'traces': traces_with_error,
-            'tracesCount': len(self.traces),
-            'errorsCount': len(traces_with_error),
+            'traces': [trace.__dict__() for trace in self.traces],
+            'tracesCount': self.traces_count,
+            'errorsCount': len(self.traces),
+            'stats': self.stats,
             'test_error': self.has_error(),
             'test_failed': self.has_failed()
         }
 
-    def add_trace(self, trace: Trace):
-        """Adding a trace to the list of traces in the szenario."""
-        self.traces.append(trace)
-        self.traces_error_count += trace.error_count
+    def add_trace(self, trace):
+        """
+        Adding a trace to the szenario. Only traces with errors are kept,
+        the others are dropped after counting them.
+        """
+        self.traces_count += 1
+        if trace.error_count > 0:
+            self.traces.append(trace)
+            self.traces_error_count += trace.error_count
 
     def has_error(self):
         return not bool(re.match(r'^\[\]$', self.errors))
@@ -44,39 +44,60 @@ def rating_hierarchy_level(span):
                     # if timestamps are too close, both spans get rated the same
                     compare_log_timestamps(child.previous, child)
 
-def get_root_cause(parent):
-    """Recursive function for rating the errors in a hierachical span structure."""
-    parent_rating = 0
-    if parent.has_children():
-        rating_hierarchy_level(parent)
-        for child in parent.children:
-            if child.error and parent.error:
-                if child.type == 'child':
-                    logger.debug('Child_of: child.error and parent.error')
-                    earlier = sorted([child, parent], key=lambda span: span.cause_timestamp)
-                    logger.debug('earlier (+1) - %s', earlier[0].span_id)
-                    resolve_cause_relation(earlier[0], earlier[1])
-                    earlier[0].rating += 1 + earlier[1].rating
-                if child.type == 'follower':
-                    logger.debug('Follows_from: child.error and parent.error')
-                    if parent.cause_timestamp < child.cause_timestamp:
-                        logger.debug('Only parent (+1) - %s', parent.span_id)
-                        resolve_cause_relation(parent, child)
-                        parent.rating += 1
-                    else:
-                        logger.debug('Both (+1) - %s & %s', parent.span_id, child.span_id)
-                        child.rating += 1
-                        parent.rating += 1
-                # if timestamps are too close, both spans get rated higher
-                compare_log_timestamps(child, parent)
-
-            elif child.error:
-                logger.debug('Only child (+1) - %s', child.span_id)
-                child.rating +=1
-            elif parent.error:
+def rate_relation(parent, child):
+    """
+    Rates the errors of a span and one of its children.
+    Returns the rating for the parent, which is shared by all of its children.
+    """
+    if child.error and parent.error:
+        if child.type == 'child':
+            logger.debug('Child_of: child.error and parent.error')
+            earlier = sorted([child, parent], key=lambda span: span.cause_timestamp)
+            logger.debug('earlier (+1) - %s', earlier[0].span_id)
+            resolve_cause_relation(earlier[0], earlier[1])
+            earlier[0].rating += 1 + earlier[1].rating
+        if child.type == 'follower':
+            logger.debug('Follows_from: child.error and parent.error')
+            if parent.cause_timestamp < child.cause_timestamp:
                 logger.debug('Only parent (+1) - %s', parent.span_id)
-                parent_rating += 1
+                resolve_cause_relation(parent, child)
+                parent.rating += 1
+            else:
+                logger.debug('Both (+1) - %s & %s', parent.span_id, child.span_id)
+                child.rating += 1
+                parent.rating += 1
+        # if timestamps are too close, both spans get rated higher
+        compare_log_timestamps(child, parent)
 
-            get_root_cause(child)
+    elif child.error:
+        logger.debug('Only child (+1) - %s', child.span_id)
+        child.rating +=1
+    elif parent.error:
+        logger.debug('Only parent (+1) - %s', parent.span_id)
+        return 1
+    return 0
+
+def get_root_cause(root):
+    """
+    Rates the errors in a hierachical span structure depth-first.
+    The subtree of a child is rated before its next sibling.
+    Uses an explicit stack, so the depth of the structure is not limited.
+    """
+    if not root.has_children():
+        return
+    rating_hierarchy_level(root)
+    stack = [[root, 0, 0]] # span, position of the next child, rating for the span
+    while stack:
+        frame = stack[-1]
+        parent, position, _ = frame
+        if position < len(parent.children):
+            child = parent.children[position]
+            frame[1] += 1
+            frame[2] += rate_relation(parent, child)
+            if child.has_children():
+                rating_hierarchy_level(child)
+                stack.append([child, 0, 0])
+            continue
+        stack.pop()
         # number of children should not influence the value of parent rating
-        parent.rating += parent_rating / len(parent.children)
+        parent.rating += frame[2] / len(parent.children)
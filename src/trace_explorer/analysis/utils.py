@@ -3,14 +3,22 @@ This module helps to start the analysis and all corresponding actions.
 """
 
 import logging
+from bisect import bisect_right
+from concurrent.futures import ProcessPoolExecutor
+from functools import partial
 import pandas as pd
 
 from trace_explorer.queries import get_query
-from trace_explorer.parsers import get_parser
+from trace_explorer.parsers import get_parser, otlp
+from trace_explorer.reports import OUTPUT_HTML, OUTPUT_JSON
 from trace_explorer.reports.html import create_szenario_html, create_trace_html
+from trace_explorer.reports.ndjson import create_szenario_json, get_trace_result, open_results
 from trace_explorer.rules.parser import get_rules
+from trace_explorer.definitions import span as span_def
 from trace_explorer import config
 
+from .cache import get_cache
+from .columnar import SpanColumns
 from .models import Trace, Szenario
 from .rca import get_root_cause
 
@@ -21,37 +29,288 @@ logger.setLevel(logging.DEBUG)
 
 
 
-def analyze_traces(start_time, end_time, name, errors, failures, rules):
-    """Initailizes the analysis."""
+def get_missing_span_ids(spans_by_trace, traces_raw):
+    """
+    Returns the SpanIDs referenced by the given spans
+    which are not part of their trace in traces_raw.
+    """
+    missing = set()
+    for trace_id, spans in spans_by_trace.items():
+        trace = traces_raw[trace_id]
+        for span_data in spans.values():
+            for ref in span_data[span_def.REFERENCES]:
+                if ref.get(span_def.SPAN_ID) not in trace:
+                    missing.add(ref.get(span_def.SPAN_ID))
+    return missing
+
+
+def fetch_spans_in_range(query, parser, start_time, end_time, result, cache=None):
+    """
+    Fetches and parses all spans of the time range and merges them into the result.
+    With a cache, only the parts of the time range which are not cached are fetched.
+    """
+    if cache is None:
+        for page in query.iter_spans_in_range(start_time, end_time):
+            parser.parse_spans(page, result)
+        return
+
+    if config.CACHE_REFRESH:
+        cache.invalidate(start_time, end_time)
+    cache.load_range(start_time, end_time, result)
+    for gap_start, gap_end in cache.get_gaps(start_time, end_time):
+        fetched = {}
+        for page in query.iter_spans_in_range(gap_start, gap_end):
+            parser.parse_spans(page, fetched)
+        cache.store(fetched, gap_start, gap_end)
+        for trace_id, spans in fetched.items():
+            result.setdefault(trace_id, {}).update(spans)
+
+
+def fetch_error_traces(query, parser, start_time, end_time, result, cache=None):
+    """
+    Fetches and parses only the spans of the traces with an erroneous span in the
+    time range and merges them into the result. The TraceIDs are aggregated by the
+    Storage-Backend first. The fetched spans are cached, but not as covering the time range.
+    """
+    trace_ids = set()
+    for page in query.iter_error_trace_ids(start_time, end_time):
+        trace_ids.update(page)
+    logger.info('Found %r traces with errors.', len(trace_ids))
+
+    fetched = {}
+    for page in query.iter_spans_by_trace_ids(trace_ids, start_time, end_time):
+        parser.parse_spans(page, fetched)
+    if cache is not None:
+        cache.store(fetched)
+    for trace_id, spans in fetched.items():
+        result.setdefault(trace_id, {}).update(spans)
+
+
+def fetch_spans_by_ids(query, parser, span_ids, start_time, end_time, cache=None):
+    """
+    Fetches and parses the spans with the given IDs.
+    With a cache, only the spans which are not cached are fetched.
+    """
+    result = {}
+    if cache is not None:
+        span_ids = span_ids - cache.load_spans_by_ids(span_ids, result)
+    fetched = {}
+    for page in query.iter_spans_by_ids(span_ids, start_time, end_time):
+        parser.parse_spans(page, fetched)
+    if cache is not None:
+        cache.store(fetched)
+    for trace_id, spans in fetched.items():
+        result.setdefault(trace_id, {}).update(spans)
+    return result
+
+
+def fetch_missing_spans(traces_raw, query, parser, start_time, end_time, cache=None):
+    """
+    Fetches all referenced spans which are missing in their traces with batched
+    queries and merges them into the traces. Fetched spans can reference further
+    missing spans, so this is repeated until no new SpanIDs are found.
+    The spans are searched around the analyzed time range (config.REFERENCE_LOOKBACK).
+    """
+    start_time -= config.REFERENCE_LOOKBACK
+    end_time += config.REFERENCE_LOOKBACK
+    requested = set()
+    missing = get_missing_span_ids(traces_raw, traces_raw)
+    while missing:
+        logger.info('Trying to retrieve span-data for %r unresolved references.', len(missing))
+        requested.update(missing)
+        fetched = fetch_spans_by_ids(query, parser, missing, start_time, end_time, cache)
+
+        added = {}
+        for trace_id, spans in fetched.items():
+            trace = traces_raw.get(trace_id)
+            if trace is None:
+                continue
+            for span_id, span_data in spans.items():
+                if span_id not in trace:
+                    trace[span_id] = span_data
+                    added.setdefault(trace_id, {})[span_id] = span_data
+        missing = get_missing_span_ids(added, traces_raw) - requested
+
+
+def analyze_trace(trace_id, spans, rules, outputs):
+    """
+    Builds and analyzes a single trace and creates its report in the given output formats.
+    Returns a summary of the analyzed trace or None if it could not be analyzed.
+    """
+    try:
+        trace = Trace(trace_id, spans)
+    except ValueError as ve:
+        logger.error('ValueError while analyzing trace %s', trace_id, exc_info=ve)
+        return None
+
+    rules.apply(trace.spans)
+
+    trace.set_error_count()
+
+    get_root_cause(trace.root_span)
+    if OUTPUT_HTML in outputs:
+        create_trace_html([trace])
+    summary = trace.summarize()
+    if OUTPUT_JSON in outputs and trace.error_count:
+        summary.result = get_trace_result(trace)
+    return summary
+
+
+def get_settings():
+    """Returns all settings of the config, including the ones changed at runtime (CLI)."""
+    return {name: value for name, value in vars(config).items() if name.isupper()}
+
+
+def init_worker(settings):
+    """
+    Applies the settings of the parent process to the config of a worker process.
+    Workers which are spawned instead of forked import the config again
+    and would miss the settings changed at runtime otherwise.
+    """
+    for name, value in settings.items():
+        setattr(config, name, value)
+
+
+def create_executor():
+    """Returns a pool of the configured number of worker processes with the current settings."""
+    return ProcessPoolExecutor(max_workers=config.WORKERS, initializer=init_worker,
+                               initargs=(get_settings(),))
+
+
+def map_traces(traces_raw, rules, executor=None):
+    """
+    Analyzes all traces and yields their summaries in order.
+    The traces are distributed to a pool of worker processes,
+    if more than one worker is configured. The pool is created for the traces,
+    unless the pool of the caller is given (executor), e.g. for many small batches.
+    The output formats are decided here and passed to the workers with the traces.
+    """
+    func = partial(analyze_trace, rules=rules, outputs=list(config.OUTPUTS))
+    if executor is None:
+        if config.WORKERS <= 1:
+            yield from map(func, traces_raw.keys(), traces_raw.values())
+            return
+        with create_executor() as executor:
+            yield from map_traces(traces_raw, rules, executor)
+        return
+
+    chunksize = max(1, len(traces_raw) // (config.WORKERS * 4))
+    yield from executor.map(func, traces_raw.keys(), traces_raw.values(), chunksize=chunksize)
+
+
+def coalesce_ranges(ranges):
+    """
+    Merges overlapping time ranges and time ranges with only a small gap
+    (config.SZENARIO_MERGE_GAP) between them. Returns the merged ranges ordered by time.
+    """
+    merged = []
+    for start, end in sorted(ranges):
+        if merged and start - merged[-1][1] <= config.SZENARIO_MERGE_GAP:
+            merged[-1][1] = max(merged[-1][1], end)
+        else:
+            merged.append([start, end])
+    return merged
+
+
+def assign_traces(traces_raw, ranges):
+    """
+    Assigns every trace to the time ranges containing the earliest of its spans
+    which lies in any of the time ranges. Returns the indices of the assigned
+    time ranges per TraceID. Traces without any span in the time ranges are omitted.
+    """
+    order = sorted(range(len(ranges)), key=lambda i: ranges[i][0])
+    starts = [ranges[i][0] for i in order]
+    max_ends = [] # running maximum of the end times to stop searching early
+    for i in order:
+        max_ends.append(max(ranges[i][1], max_ends[-1] if max_ends else ranges[i][1]))
+
+    assignments = {}
+    for trace_id, spans in traces_raw.items():
+        for start_time in sorted(span_data[span_def.START_TIME] for span_data in spans.values()):
+            indices = []
+            position = bisect_right(starts, start_time) - 1
+            while position >= 0 and max_ends[position] >= start_time:
+                if ranges[order[position]][1] >= start_time:
+                    indices.append(order[position])
+                position -= 1
+            if indices:
+                assignments[trace_id] = sorted(indices)
+                break
+    return assignments
+
+
+def analyze_szenarios(rows, rules):
+    """
+    Analyzes multiple szenarios at once. Each row consists of start time, end time,
+    name, errors and failures of a szenario. The spans of all szenarios are fetched
+    together and the traces of all szenarios are analyzed concurrently.
+    The statistics of all spans of a szenario are computed from the fetched spans.
+    With config.ERRORS_ONLY, only traces with errors are fetched, so the statistics
+    are computed by the Storage-Backend and the other traces are counted there.
+    """
+    if not rows:
+        return []
     query = get_query()
     parser = get_parser()
-    data = query.get_spans_in_range(start_time, end_time)
+    ranges = [(row[0], row[1]) for row in rows]
+    merged = coalesce_ranges(ranges)
+    logger.info('Fetching spans of %r szenarios in %r time ranges.', len(rows), len(merged))
 
-    traces_raw = parser.parse_spans(data)
+    cache = get_cache()
+    traces_raw = {}
+    columns = None
+    try:
+        for start_time, end_time in merged:
+            if config.ERRORS_ONLY:
+                fetch_error_traces(query, parser, start_time, end_time, traces_raw, cache)
+            else:
+                fetch_spans_in_range(query, parser, start_time, end_time, traces_raw, cache)
+        if not config.ERRORS_ONLY:
+            columns = SpanColumns(traces_raw)
+        # assign before adding referenced spans, which can lie outside of the time ranges
+        assignments = assign_traces(traces_raw, ranges)
+        traces_raw = {trace_id: traces_raw[trace_id] for trace_id in assignments}
+        fetch_missing_spans(traces_raw, query, parser, merged[0][0], merged[-1][1], cache)
+    finally:
+        if cache is not None:
+            cache.close()
 
     logger.info('Trace IDs: %r', list(traces_raw.keys()))
-    traces = []
 
-    for trace_id, spans in traces_raw.items():
-        try:
-            traces.append(Trace(trace_id, spans))
-        except ValueError as ve:
-            logger.error('ValueError while analyzing trace %s', trace_id, exc_info=ve)
+    szenarios = [Szenario(row[2], row[3], row[4]) for row in rows]
+    results = open_results()
+    try:
+        for trace_id, summary in zip(traces_raw.keys(), map_traces(traces_raw, rules)):
+            if summary:
+                if results is not None:
+                    results.write(summary, [szenarios[i].name for i in assignments[trace_id]])
+                for i in assignments[trace_id]:
+                    szenarios[i].add_trace(summary)
+    finally:
+        if results is not None:
+            results.close()
 
-    szenario = Szenario(name, errors, failures)
+    for szenario, (start_time, end_time) in zip(szenarios, ranges):
+        if columns is not None:
+            szenario.stats = columns.get_stats(start_time, end_time)
+        else:
+            szenario.stats = query.get_szenario_stats(start_time, end_time)
+            szenario.traces_count = szenario.stats['traceCount']
 
-    for trace in traces:
-        for span in trace.spans:
-            for rule in rules:
-                rule.perform(span)
-            
-        trace.set_error_count()
+    return szenarios
 
-        get_root_cause(trace.root_span)
-        szenario.add_trace(trace)
 
-    create_trace_html(traces)
-    return szenario
+def analyze_traces(start_time, end_time, name, errors, failures, rules):
+    """Initailizes the analysis."""
+    return analyze_szenarios([(start_time, end_time, name, errors, failures)], rules)[0]
+
+
+def create_reports(szenarios):
+    """Creates the summaries of the szenarios in all configured output formats."""
+    if OUTPUT_HTML in config.OUTPUTS:
+        create_szenario_html(szenarios)
+    if OUTPUT_JSON in config.OUTPUTS:
+        create_szenario_json(szenarios)
 
 
 def check_traces_and_exit(szenarios):
@@ -72,12 +331,10 @@ def check_traces_and_exit(szenarios):
 def read_csv_and_analyze():
     """Helper function to read csv and trigger analysis."""
     logger.debug("Reading szenario information from csv.")
-    szenarios = []
     rules = get_rules()
     dataframe = pd.read_csv(config.CSV_PATH, sep=';')
-    for data in dataframe.values.tolist():
-        szenarios.append(analyze_traces(data[0], data[1], data[2], data[3], data[4], rules))
-    create_szenario_html(szenarios)
+    szenarios = analyze_szenarios(dataframe.values.tolist(), rules)
+    create_reports(szenarios)
 
     check_traces_and_exit(szenarios)
 
@@ -87,5 +344,25 @@ def analyze_custom_time_range(start_time, end_time, name):
     logger.debug("Reading szenario information from command line.")
     rules = get_rules()
     szenarios = [analyze_traces(start_time, end_time, name, "", "", rules)]
-    create_szenario_html(szenarios)
+    create_reports(szenarios)
     check_traces_and_exit(szenarios)
+
+
+def analyze_otlp_file(path):
+    """Analyzes all traces of an OTLP file ('-' for stdin) without a Storage-Backend."""
+    logger.debug("Reading traces from OTLP file %s.", path)
+    rules = get_rules()
+    szenario = Szenario(f"OTLP - {path}", "", "")
+    traces_raw = otlp.read_file(path)
+    results = open_results()
+    try:
+        for summary in map_traces(traces_raw, rules):
+            if summary:
+                if results is not None:
+                    results.write(summary, [szenario.name])
+                szenario.add_trace(summary)
+    finally:
+        if results is not None:
+            results.close()
+    create_reports([szenario])
+    check_traces_and_exit([szenario])
@@ -10,7 +10,11 @@ import time
 from datetime import timedelta
 from argparse import ArgumentParser
 from tracemalloc import start
-from trace_explorer.analysis import read_csv_and_analyze, analyze_custom_time_range
+from trace_explorer.analysis import (
+    read_csv_and_analyze, analyze_custom_time_range, analyze_otlp_file, follow_traces
+)
+from trace_explorer import config
+from trace_explorer.reports import OUTPUT_HTML, OUTPUT_JSON
 
 logger = logging.getLogger()
 logger.setLevel(logging.INFO)
@@ -32,6 +36,26 @@ def prepare_args():
                         If not set, current time is used as end.''')
     parser.add_argument('-v', '--verbose', action='store_true',
                         help='Verbose logging.')
+    parser.add_argument('-w', '--workers', type=int,
+                        help='''Number of worker processes to analyze the traces in parallel.
+                        If not set, RCA_WORKERS is used (default: 1).''')
+    parser.add_argument('--otlp', metavar='FILE',
+                        help='''Analyze the traces of an OTLP file (JSON or protobuf)
+                        instead of the Storage-Backend. Use - to read from stdin.''')
+    parser.add_argument('--no-cache', action='store_true',
+                        help='Do not use the local cache of fetched spans.')
+    parser.add_argument('--refresh', action='store_true',
+                        help='Fetch all spans again and replace them in the local cache.')
+    parser.add_argument('-o', '--output', nargs='+', choices=[OUTPUT_HTML, OUTPUT_JSON],
+                        help='''Output formats in the report directory: html (reports) and/or
+                        json (results of the traces as NDJSON and szenarios as JSON).
+                        If not set, RCA_OUTPUT is used (default: html).''')
+    parser.add_argument('--errors-only', action='store_true',
+                        help='''Only fetch traces with an error tag or HTTP status code 500.
+                        The other traces are only counted, errors set by rules are missed.''')
+    parser.add_argument('-f', '--follow', action='store_true',
+                        help='''Analyze new traces continuously until interrupted (Ctrl+C).
+                        If --start is set, the analysis begins at the start time.''')
     
     return parser
 
@@ -65,6 +89,27 @@ def main():
     stdout_handler.setFormatter(formatter)
     logger.addHandler(stdout_handler)
 
+    if args.workers:
+        config.WORKERS = args.workers
+    if args.no_cache:
+        config.CACHE_ENABLED = False
+    if args.refresh:
+        config.CACHE_REFRESH = True
+    if args.output:
+        config.OUTPUTS = args.output
+    if args.errors_only:
+        config.ERRORS_ONLY = True
+
+    if args.otlp:
+        analyze_otlp_file(args.otlp)
+
+    if args.follow:
+        start_time = None
+        if args.start:
+            start_time = int(math.ceil(time.time_ns() / 1e3) - get_timedelta(args.start))
+        follow_traces(start_time)
+        return
+
     if args.start:
         current = math.ceil(time.time_ns() / 1e3) # microseconds: rounded up
         start_delta = get_timedelta(args.start)
@@ -8,10 +8,25 @@ root = os.path.dirname(os.path.abspath(__file__))
 cwd = os.getcwd()
 
 DB_SETTINGS = {
+    # Either Elasticsearch, AsyncElasticsearch (concurrent requests) or File (local files)
     "ENGINE": os.environ.get('RCA_DB_ENGINE', 'Elasticsearch'),
     "URL": os.environ.get('RCA_DB_URL', '127.0.0.1'),
     "PORT": os.environ.get('RCA_DB_PORT', '9200'),
-    "DATAFORMAT": os.environ.get('RCA_DB_DATAFORMAT', 'OpenTelemetry')
+    "DATAFORMAT": os.environ.get('RCA_DB_DATAFORMAT', 'OpenTelemetry'),
+    "TERMS_CHUNK_SIZE": int(os.environ.get('RCA_DB_TERMS_CHUNK_SIZE', '1024')),
+    # Either pit (point in time with search_after) or scroll
+    "PAGING": os.environ.get('RCA_DB_PAGING', 'pit'),
+    "PAGE_SIZE": int(os.environ.get('RCA_DB_PAGE_SIZE', '1000')),
+    "INDEX_PREFIX": os.environ.get('RCA_DB_INDEX_PREFIX', 'jaeger-span-'),
+    # Either daily (one index per day) or rollover (read alias)
+    "INDEX_MODE": os.environ.get('RCA_DB_INDEX_MODE', 'daily'),
+    "INDEX_DATE_FORMAT": os.environ.get('RCA_DB_INDEX_DATE_FORMAT', '%Y-%m-%d'),
+    # AsyncElasticsearch: number of concurrent requests (and connections)
+    "CONCURRENCY": int(os.environ.get('RCA_DB_CONCURRENCY', '4')),
+    # AsyncElasticsearch: number of sub-ranges a time range is split into
+    "RANGE_SHARDS": int(os.environ.get('RCA_DB_RANGE_SHARDS', '16')),
+    # File or directory with the spans for the File-Storage-Backend
+    "PATH": os.environ.get('RCA_DB_PATH', '')
 }
 
 JSON_SCHEMA_PATH = os.path.join(root, os.environ.get('RCA_SCHEMA_PATH', 'schemas/schema.json'))
@@ -22,4 +37,55 @@ CSV_PATH = os.path.join(cwd, os.environ.get('RCA_CSV_PATH', ''))
 
 REPORT_DIR = os.path.join(cwd, os.environ.get('RCA_REPORT_DIR', ''))
 
+# Comma-separated output formats in the REPORT_DIR: html (reports) and json (results as NDJSON)
+OUTPUTS = os.environ.get('RCA_OUTPUT', 'html').split(',')
+
 MAX_CLOCK_DEVIATION = float(os.environ.get('RCA_MAX_CLOCK_DEVIATION', '0.0'))
+
+# Time range in microseconds (default: one day) around the analyzed time range
+# to search for referenced spans which are not part of it
+REFERENCE_LOOKBACK = int(os.environ.get('RCA_REFERENCE_LOOKBACK', '86400000000'))
+
+# Validation of parsed spans against the JSON-Schema: full, sampled or off
+SCHEMA_VALIDATION = os.environ.get('RCA_SCHEMA_VALIDATION', 'full')
+
+SCHEMA_SAMPLE_RATE = float(os.environ.get('RCA_SCHEMA_SAMPLE_RATE', '0.01'))
+
+# Szenarios with a gap of less microseconds (default: one minute)
+# between them are fetched with a single query
+SZENARIO_MERGE_GAP = int(os.environ.get('RCA_SZENARIO_MERGE_GAP', '60000000'))
+
+# Number of worker processes for the analysis of traces (1: no worker processes)
+WORKERS = int(os.environ.get('RCA_WORKERS', '1'))
+
+# Only fetch traces with an erroneous span (error tag or HTTP status code 500) in full.
+# The other traces are only counted, so errors which are only set by rules are missed.
+ERRORS_ONLY = os.environ.get('RCA_ERRORS_ONLY', 'off') == 'on'
+
+# Follow mode: interval in microseconds (default: five seconds) between polls for new spans
+FOLLOW_POLL_INTERVAL = int(os.environ.get('RCA_FOLLOW_POLL_INTERVAL', '5000000'))
+
+# Time in microseconds (default: 30 seconds) without new spans until a trace is complete
+FOLLOW_QUIET_PERIOD = int(os.environ.get('RCA_FOLLOW_QUIET_PERIOD', '30000000'))
+
+# Time in microseconds (default: one minute) the polled time ranges overlap.
+# Spans are stored when they end, so long spans arrive after the watermark passed them.
+FOLLOW_OVERLAP = int(os.environ.get('RCA_FOLLOW_OVERLAP', '60000000'))
+
+# Number of buffered spans of open traces, the least recently updated traces are analyzed first
+FOLLOW_MAX_SPANS = int(os.environ.get('RCA_FOLLOW_MAX_SPANS', '1000000'))
+
+# Local cache of fetched and parsed spans (disable with RCA_CACHE=off)
+CACHE_ENABLED = os.environ.get('RCA_CACHE', 'on') != 'off'
+
+CACHE_DIR = os.path.join(cwd, os.environ.get('RCA_CACHE_DIR', '.trace_explorer_cache'))
+
+# Size of the cached span data in bytes (default: 1 GiB), least recently used data is evicted
+CACHE_MAX_BYTES = int(os.environ.get('RCA_CACHE_MAX_BYTES', str(1024 ** 3)))
+
+# Time in microseconds (default: one minute) until the spans of a time range are complete.
+# More recent time ranges are fetched again instead of being marked as cached.
+CACHE_SETTLE_TIME = int(os.environ.get('RCA_CACHE_SETTLE_TIME', '60000000'))
+
+# Ignore the cached time ranges and fetch them again
+CACHE_REFRESH = False
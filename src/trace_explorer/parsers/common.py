@@ -0,0 +1,58 @@
+"""
+This module provides helpers which are used by all parsers.
+"""
+
+import json
+import sys
+
+try:
+    import orjson
+except ImportError: # orjson is optional, it only decodes faster
+    orjson = None
+
+JSON_DECODER = 'orjson' if orjson else 'json'
+
+# String values of the error tag, others are decoded as JSON
+ERROR_VALUES = {'true': True, 'false': False}
+
+# Spans of the same process share a single service dict instead of a copy per span.
+# The shared dicts are dropped when there are too many, e.g. in follow mode.
+services = {}
+SERVICES_SIZE = 10000
+
+
+def loads(data):
+    """Decodes a JSON document (str or bytes) with orjson if it is installed."""
+    if orjson:
+        return orjson.loads(data)
+    return json.loads(data)
+
+def parse_error(error):
+    """Returns the value of the error tag, which can be a string like 'True'."""
+    if isinstance(error, str):
+        error = error.lower()
+        if error in ERROR_VALUES:
+            return ERROR_VALUES[error]
+        return json.loads(error)
+    return error
+
+def get_service(process, get_key_value_from_tags):
+    """
+    Returns the service representation of the process of a span.
+    Spans of the same process share the same dict, so it must not be modified.
+    """
+    tags = process.get('tags', [])
+    try:
+        key = (process['serviceName'], tuple([(tag['key'], tag.get('value')) for tag in tags]))
+        service = services.get(key)
+    except TypeError: # unhashable tag values can not be shared
+        key = service = None
+
+    if service is None:
+        service = get_key_value_from_tags(tags)
+        service['name'] = sys.intern(process['serviceName'])
+        if key is not None:
+            if len(services) >= SERVICES_SIZE:
+                services.clear()
+            services[key] = service
+    return service
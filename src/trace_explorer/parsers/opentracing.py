@@ -2,53 +2,61 @@
 This module implements a parser for the opentracing format.
 """
 
-import json
-from jsonschema import validate as validate_json
+import sys
 
-from trace_explorer.config import JSON_SCHEMA_PATH
+from .common import get_service, parse_error
+from .validation import validate_spans, validate as validate_schema
 
 RELEVANT_KEYS = ['operationName', 'references', 'startTime', 'duration', ]
 
 def get_key_value_from_tags(tags):
     """Transforms a list to a key-value-dictionary."""
-    return dict((tag.get('key'), tag.get('value')) for tag in tags)
+    return {sys.intern(tag['key']): tag.get('value') for tag in tags}
 
 def get_list_of_logs(logs):
     "Returns a formatted list of all logs of a span."
-    result = []
-    for log in logs:
-        result.append({
-            'timestamp': log.get('timestamp'),
-            'fields': get_key_value_from_tags(log.get('fields'))
-        })
-    return result
+    return [{
+        'timestamp': log['timestamp'],
+        'fields': get_key_value_from_tags(log['fields'])
+    } for log in logs]
 
 def validate(span_data):
     """Validates a span representation with a given JSON-Schema"""
-    with open(JSON_SCHEMA_PATH, 'r', encoding="utf-8") as file:
-        schema = file.read()
-    validate_json(instance=span_data, schema=json.loads(schema))
+    validate_schema(span_data)
 
 def extract_span_data(data):
-    """Extractes all relevant span data and formats it."""
-    result = dict((k, data[k]) for k in RELEVANT_KEYS)
-    result['service'] = get_key_value_from_tags(data.get('process').get('tags'))
-    result['service']['name'] = data.get('process').get('serviceName')
-    result['tags'] = get_key_value_from_tags(data.get('tags'))
-    error = result['tags'].get('error', False)
-    if isinstance(error, str):
-        error = json.loads(error.lower())
-    result['tags']['error'] = error
-    result['logs'] = get_list_of_logs(data.get('logs'))
-    validate(result)
-    return result
-
-def parse_spans(spans):
-    """Parsers a list of spans and transforms them into the excpeted format."""
-    result = {}
+    """
+    Extractes all relevant span data and formats it in a single pass.
+    The raw span is not modified.
+    """
+    tags = get_key_value_from_tags(data['tags'])
+    tags['error'] = parse_error(tags.get('error', False))
+    return {
+        'operationName': sys.intern(data['operationName']),
+        'references': data['references'],
+        'startTime': data['startTime'],
+        'duration': data['duration'],
+        'service': get_service(data['process'], get_key_value_from_tags),
+        'tags': tags,
+        'logs': get_list_of_logs(data['logs'])
+    }
+
+def parse_spans(spans, result=None):
+    """
+    Parsers a list of spans and transforms them into the excpeted format.
+    If a result is given, the spans are grouped into its traces.
+    The raw spans are not modified.
+    """
+    if result is None:
+        result = {}
+    batch = []
     for span in spans:
-        if not span.get('traceID') in result:
-            result[span.get('traceID')] = {}
-        span_id = span.pop('spanID')
-        result[span.get('traceID')][span_id] = extract_span_data(span)
+        trace_id = span['traceID']
+        trace = result.get(trace_id)
+        if trace is None:
+            trace = result[trace_id] = {}
+        span_data = extract_span_data(span)
+        trace[span['spanID']] = span_data
+        batch.append(span_data)
+    validate_spans(batch)
     return result
@@ -0,0 +1,306 @@
+"""
+This module implements a parser for the OpenTelemetry protocol (OTLP).
+It reads ResourceSpans in the JSON and the protobuf encoding (e.g. exported by the
+OpenTelemetry Collector) directly, without a Storage-Backend.
+The protobuf encoding requires the optional package opentelemetry-proto.
+"""
+
+import base64
+import binascii
+import gzip
+import json
+import sys
+
+from trace_explorer.definitions import logs, tags as tags_def, span as span_def
+
+from .opentelemetry import key_mapping, extract_error_logs_from_tags
+from .validation import validate_spans
+
+try:
+    from opentelemetry.proto.trace.v1.trace_pb2 import TracesData
+except ImportError: # protobuf is optional, JSON can be parsed without it
+    TracesData = None
+
+GZIP_MAGIC = b'\x1f\x8b'
+
+SERVICE_NAME_KEY = 'service.name'
+UNKNOWN_SERVICE = 'unknown_service'
+SPAN_KIND_KEY = 'span.kind'
+SCOPE_NAME_KEY = 'otel.scope.name'
+SCOPE_VERSION_KEY = 'otel.scope.version'
+STATUS_CODE_KEY = 'otel.status_code'
+STATUS_DESCRIPTION_KEY = 'otel.status_description'
+EXCEPTION_EVENT = 'exception'
+
+SPAN_KINDS = {1: 'internal', 2: 'server', 3: 'client', 4: 'producer', 5: 'consumer'}
+SPAN_KIND_NAMES = {
+    'SPAN_KIND_INTERNAL': 1,
+    'SPAN_KIND_SERVER': 2,
+    'SPAN_KIND_CLIENT': 3,
+    'SPAN_KIND_PRODUCER': 4,
+    'SPAN_KIND_CONSUMER': 5
+}
+
+STATUS_OK = 1
+STATUS_ERROR = 2
+STATUS_CODES = {STATUS_OK: 'OK', STATUS_ERROR: 'ERROR'}
+STATUS_CODE_NAMES = {'STATUS_CODE_OK': STATUS_OK, 'STATUS_CODE_ERROR': STATUS_ERROR}
+
+
+def get_id(value):
+    """
+    Return a TraceID or SpanID as hex string. OTLP/JSON uses hex strings,
+    some exporters use base64 like the protobuf JSON mapping.
+    """
+    if not value:
+        return None
+    try:
+        int(value, 16)
+        return value.lower()
+    except ValueError:
+        return binascii.hexlify(base64.b64decode(value)).decode('ascii')
+
+def get_enum(value, names):
+    """Return the number of an enum value, which can be a number or a name in OTLP/JSON."""
+    if isinstance(value, str):
+        return names.get(value, 0)
+    return value or 0
+
+def get_value(value):
+    """Return the value of an OTLP/JSON AnyValue."""
+    if 'stringValue' in value:
+        return value['stringValue']
+    if 'boolValue' in value:
+        return value['boolValue']
+    if 'intValue' in value:
+        return int(value['intValue']) # 64-bit integers are strings in JSON
+    if 'doubleValue' in value:
+        return float(value['doubleValue'])
+    if 'arrayValue' in value:
+        return [get_value(item) for item in value['arrayValue'].get('values', [])]
+    if 'kvlistValue' in value:
+        return get_attributes(value['kvlistValue'].get('values', []))
+    return value.get('bytesValue')
+
+def get_attributes(attributes):
+    """Transforms a list of OTLP/JSON attributes to a key-value-dictionary."""
+    return {
+        sys.intern(attribute['key']): get_value(attribute.get('value', {}))
+        for attribute in attributes
+    }
+
+def get_proto_value(value):
+    """Return the value of a protobuf AnyValue."""
+    kind = value.WhichOneof('value')
+    if kind == 'array_value':
+        return [get_proto_value(item) for item in value.array_value.values]
+    if kind == 'kvlist_value':
+        return get_proto_attributes(value.kvlist_value.values)
+    if kind == 'bytes_value':
+        return base64.b64encode(value.bytes_value).decode('ascii')
+    if kind is None:
+        return None
+    return getattr(value, kind)
+
+def get_proto_attributes(attributes):
+    """Transforms a list of protobuf attributes to a key-value-dictionary."""
+    return {sys.intern(attribute.key): get_proto_value(attribute.value) for attribute in attributes}
+
+def get_service(resource_attributes):
+    """Return the service of a resource, which is shared by all of its spans."""
+    service = dict(resource_attributes)
+    service['name'] = sys.intern(str(service.pop(SERVICE_NAME_KEY, UNKNOWN_SERVICE)))
+    return service
+
+def get_scope_tags(name, version):
+    """Return the tags describing the instrumentation scope of a span."""
+    result = {}
+    if name:
+        result[SCOPE_NAME_KEY] = name
+    if version:
+        result[SCOPE_VERSION_KEY] = version
+    return result
+
+def get_log(timestamp, name, attributes):
+    """Formats a span event as log. Exception events are formatted as error logs."""
+    fields = {logs.FIELD_EVENT: name}
+    for key, value in attributes.items():
+        if key in key_mapping:
+            fields[logs.FIELD_EVENT] = logs.FIELD_EVENT_ERROR
+            key = key_mapping[key]
+        fields[key] = value
+    if name == EXCEPTION_EVENT:
+        fields[logs.FIELD_EVENT] = logs.FIELD_EVENT_ERROR
+    return {logs.TIMESTAMP: timestamp // 1000, logs.FIELDS: fields}
+
+def get_references(trace_id, parent_id, links):
+    """
+    Return the references of a span. A span can only have a single parent, so a link
+    is only used as FOLLOWS_FROM reference if the span has no parent and if the link
+    points to a span in the same trace.
+    """
+    if parent_id:
+        return [{
+            span_def.REF_TYPE_KEY: span_def.REF_TYPE_CHILD_OF,
+            'traceID': trace_id,
+            span_def.SPAN_ID: parent_id
+        }]
+    for link_trace_id, link_span_id in links:
+        if link_trace_id == trace_id and link_span_id:
+            return [{
+                span_def.REF_TYPE_KEY: span_def.REF_TYPE_FOLLOWS_FROM,
+                'traceID': trace_id,
+                span_def.SPAN_ID: link_span_id
+            }]
+    return []
+
+def make_span_data(service, span_tags, kind, status_code, status_message):
+    """
+    Return a span in the expected format without its name, times, references and logs.
+    Adds the span kind and the status to the tags.
+    """
+    if kind in SPAN_KINDS:
+        span_tags[SPAN_KIND_KEY] = SPAN_KINDS[kind]
+    if status_code in STATUS_CODES:
+        span_tags[STATUS_CODE_KEY] = STATUS_CODES[status_code]
+    if status_message:
+        span_tags[STATUS_DESCRIPTION_KEY] = status_message
+    error = span_tags.get(tags_def.ERROR_KEY, False)
+    if isinstance(error, str):
+        error = error.lower() == 'true'
+    span_tags[tags_def.ERROR_KEY] = bool(error) or status_code == STATUS_ERROR
+    return {span_def.SERVICE_NAME: service, span_def.TAGS: span_tags}
+
+def add_span(result, batch, trace_id, span_id, span_data):
+    """Adds a span to its trace in the result. Spans without logs get them from the status."""
+    if span_data[span_def.TAGS][tags_def.ERROR_KEY] and not span_data[span_def.LOGS]:
+        span_data[span_def.LOGS] = extract_error_logs_from_tags(span_data)
+    trace = result.get(trace_id)
+    if trace is None:
+        trace = result[trace_id] = {}
+    trace[span_id] = span_data
+    batch.append(span_data)
+
+def parse_spans(resource_spans, result=None):
+    """
+    Parses a list of OTLP/JSON ResourceSpans and transforms them into the expected format.
+    If a result is given, the spans are grouped into its traces.
+    """
+    if result is None:
+        result = {}
+    batch = []
+    for resource_span in resource_spans:
+        service = get_service(
+            get_attributes(resource_span.get('resource', {}).get('attributes', []))
+        )
+        # instrumentationLibrarySpans were renamed to scopeSpans
+        scope_spans = resource_span.get('scopeSpans',
+                                        resource_span.get('instrumentationLibrarySpans', []))
+        for scope_span in scope_spans:
+            scope = scope_span.get('scope', scope_span.get('instrumentationLibrary', {}))
+            scope_tags = get_scope_tags(scope.get('name'), scope.get('version'))
+            for span in scope_span.get('spans', []):
+                trace_id = get_id(span['traceId'])
+                status = span.get('status', {})
+                span_tags = get_attributes(span.get('attributes', []))
+                span_tags.update(scope_tags)
+                span_data = make_span_data(
+                    service, span_tags, get_enum(span.get('kind'), SPAN_KIND_NAMES),
+                    get_enum(status.get('code'), STATUS_CODE_NAMES), status.get('message')
+                )
+                start_time = int(span['startTimeUnixNano'])
+                span_data[span_def.OPERATION_NAME] = sys.intern(span['name'])
+                span_data[span_def.START_TIME] = start_time // 1000
+                span_data[span_def.DURATION] = (int(span['endTimeUnixNano']) - start_time) // 1000
+                span_data[span_def.REFERENCES] = get_references(
+                    trace_id, get_id(span.get('parentSpanId')),
+                    ((get_id(link.get('traceId')), get_id(link.get('spanId')))
+                     for link in span.get('links', []))
+                )
+                span_data[span_def.LOGS] = [
+                    get_log(int(event['timeUnixNano']), event.get('name'),
+                            get_attributes(event.get('attributes', [])))
+                    for event in span.get('events', [])
+                ]
+                add_span(result, batch, trace_id, get_id(span['spanId']), span_data)
+    validate_spans(batch)
+    return result
+
+def parse_request(request, result=None):
+    """Parses an OTLP/JSON export request (or TracesData) into the expected format."""
+    return parse_spans(request.get('resourceSpans', []), result)
+
+def parse_protobuf(data, result=None):
+    """
+    Parses an OTLP export request (or TracesData) in the protobuf encoding
+    into the expected format. Requires the package opentelemetry-proto.
+    """
+    if TracesData is None:
+        raise ImportError('The protobuf encoding of OTLP requires opentelemetry-proto')
+    if result is None:
+        result = {}
+    batch = []
+    for resource_span in TracesData.FromString(data).resource_spans:
+        service = get_service(get_proto_attributes(resource_span.resource.attributes))
+        for scope_span in resource_span.scope_spans:
+            scope_tags = get_scope_tags(scope_span.scope.name, scope_span.scope.version)
+            for span in scope_span.spans:
+                trace_id = span.trace_id.hex()
+                span_tags = get_proto_attributes(span.attributes)
+                span_tags.update(scope_tags)
+                span_data = make_span_data(
+                    service, span_tags, span.kind, span.status.code, span.status.message
+                )
+                span_data[span_def.OPERATION_NAME] = sys.intern(span.name)
+                span_data[span_def.START_TIME] = span.start_time_unix_nano // 1000
+                span_data[span_def.DURATION] = \
+                    (span.end_time_unix_nano - span.start_time_unix_nano) // 1000
+                span_data[span_def.REFERENCES] = get_references(
+                    trace_id, span.parent_span_id.hex(),
+                    ((link.trace_id.hex(), link.span_id.hex()) for link in span.links)
+                )
+                span_data[span_def.LOGS] = [
+                    get_log(event.time_unix_nano, event.name,
+                            get_proto_attributes(event.attributes))
+                    for event in span.events
+                ]
+                add_span(result, batch, trace_id, span.span_id.hex(), span_data)
+    validate_spans(batch)
+    return result
+
+def iter_requests(text):
+    """
+    Yields all JSON requests of a text. Files of the OpenTelemetry Collector
+    contain one request per line.
+    """
+    decoder = json.JSONDecoder()
+    position = 0
+    while True:
+        while position < len(text) and text[position].isspace():
+            position += 1
+        if position == len(text):
+            return
+        request, position = decoder.raw_decode(text, position)
+        yield request
+
+def read_file(path, result=None):
+    """
+    Parses the OTLP data of a file ('-' for stdin) in the JSON or the protobuf encoding.
+    Gzip compressed data is decompressed.
+    """
+    if path == '-':
+        data = sys.stdin.buffer.read()
+    else:
+        with open(path, 'rb') as file:
+            data = file.read()
+    if data[:len(GZIP_MAGIC)] == GZIP_MAGIC:
+        data = gzip.decompress(data)
+    if result is None:
+        result = {}
+    # a protobuf message never starts with '{', its first byte is a field tag
+    if data.lstrip()[:1] == b'{':
+        for request in iter_requests(data.decode('utf-8')):
+            parse_request(request, result)
+    else:
+        parse_protobuf(data, result)
+    return result
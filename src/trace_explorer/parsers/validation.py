@@ -0,0 +1,51 @@
+"""
+This module implements the JSON-Schema validation shared by all parsers.
+The schema is loaded and compiled only once per process.
+"""
+
+import json
+from functools import lru_cache
+from jsonschema.validators import validator_for
+
+from trace_explorer import config
+
+VALIDATION_FULL = 'full'
+VALIDATION_SAMPLED = 'sampled'
+VALIDATION_OFF = 'off'
+
+
+@lru_cache(maxsize=None)
+def get_validator(schema_path=None):
+    """Returns a compiled validator for the JSON-Schema (config)."""
+    with open(schema_path or config.JSON_SCHEMA_PATH, 'r', encoding="utf-8") as file:
+        schema = json.loads(file.read())
+    cls = validator_for(schema)
+    cls.check_schema(schema)
+    return cls(schema)
+
+def get_sample_stride(sample_rate):
+    """Returns the distance between two validated spans for the given sample rate."""
+    if sample_rate <= 0:
+        raise ValueError(f"Sample rate must be greater than 0, not {sample_rate}")
+    return max(1, round(1 / sample_rate))
+
+def validate(span_data):
+    """Validates a single span representation with the JSON-Schema."""
+    get_validator().validate(span_data)
+
+def validate_spans(spans):
+    """
+    Validates a batch of span representations depending on the validation mode (config).
+    In sampled mode only every n-th span of the batch is validated.
+    """
+    mode = config.SCHEMA_VALIDATION
+    if mode == VALIDATION_OFF:
+        return
+    if mode == VALIDATION_SAMPLED:
+        spans = spans[::get_sample_stride(config.SCHEMA_SAMPLE_RATE)]
+    elif mode != VALIDATION_FULL:
+        raise ValueError(f"Unknown schema validation mode: '{mode}'")
+
+    validator = get_validator()
+    for span_data in spans:
+        validator.validate(span_data)
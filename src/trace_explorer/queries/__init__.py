@@ -1,13 +1,20 @@
 """
 This module helps to import the correct query module for the Storage-Backend.
 """
+from elasticsearch.exceptions import TransportError
+
 from trace_explorer.config import DB_SETTINGS
-from . import elasticsearch_helper
+from . import async_elasticsearch_helper, elasticsearch_helper, file_helper
 
 DB_ENGINE = DB_SETTINGS.get('ENGINE')
 
+# Errors of the Storage-Backends which can be transient, like a lost connection
+QUERY_ERRORS = (TransportError, OSError)
+
 queries = {
-    'Elasticsearch': elasticsearch_helper
+    'Elasticsearch': elasticsearch_helper,
+    'AsyncElasticsearch': async_elasticsearch_helper,
+    'File': file_helper
 }
 
 def get_query():
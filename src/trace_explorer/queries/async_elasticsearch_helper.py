@@ -0,0 +1,276 @@
+"""
+This module queries Elasticsearch like elasticsearch_helper, but sends the requests for
+spans concurrently with an AsyncElasticsearch client: a time range is split into sub-ranges
+(RANGE_SHARDS) and the chunks of SpanIDs/ TraceIDs are requested at the same time, with at
+most CONCURRENCY requests. The requests run in an event loop in a background thread,
+the pages are passed through a bounded queue and parsed by the caller in the meantime.
+Requires the optional package aiohttp.
+"""
+import asyncio
+import logging
+import threading
+
+from elasticsearch.exceptions import TransportError
+
+try:
+    from elasticsearch import AsyncElasticsearch
+except ImportError: # aiohttp is optional, the synchronous client works without it
+    AsyncElasticsearch = None
+
+from trace_explorer.config import DB_SETTINGS
+
+from . import elasticsearch_helper
+from .elasticsearch_helper import ( # pylint: disable=unused-import
+    Serializer, get_indices, get_multi_span_query, get_multi_trace_query, get_span_query,
+    strip_page_metadata, get_span_from_storage, iter_error_trace_ids, get_szenario_stats
+)
+
+logger = logging.getLogger(__name__)
+logger.setLevel(logging.DEBUG)
+
+CONCURRENCY = DB_SETTINGS.get('CONCURRENCY')
+RANGE_SHARDS = DB_SETTINGS.get('RANGE_SHARDS')
+
+# Marks the end of the pages in the queue
+DONE = object()
+
+
+def split_range(start: int, end: int, count: int):
+    """
+    Returns the boundaries of (at most) count sub-ranges of equal length of the time range.
+    Every sub-range includes its start, only the last one includes its end.
+    """
+    bounds = {int(start + (end - start) * i / count) for i in range(1, count)}
+    return [start] + sorted(bound for bound in bounds if start < bound < end) + [end]
+
+def get_shard_queries(start: int, end: int):
+    """Return es-queries for all spans in the sub-ranges of the time range."""
+    bounds = split_range(start, end, RANGE_SHARDS)
+    queries = [
+        {
+            "range": {
+                "startTime": {
+                    "gte": gte,
+                    "lt": lt
+                }
+            }
+        }
+        for gte, lt in zip(bounds[:-2], bounds[1:-1])
+    ]
+    queries.append(get_span_query(bounds[-2], bounds[-1]))
+    return queries
+
+async def open_context(request, release):
+    """
+    Awaits a request which opens a context on the cluster (a point in time or a scroll)
+    and returns its response. If the caller is cancelled meanwhile, the request is still
+    completed and the opened context is released, instead of being left open until it expires.
+    """
+    task = asyncio.ensure_future(request)
+    try:
+        return await asyncio.shield(task)
+    except asyncio.CancelledError:
+        try:
+            await release(await task)
+        except Exception as error: # pylint: disable=broad-except
+            logger.warning('Could not release the context of a cancelled request: %s', error)
+        raise
+
+async def open_point_in_time(es, index):
+    """
+    Opens a point in time on the index and returns its ID.
+    Returns None if the cluster does not support points in time.
+    """
+    async def release(response):
+        await es.close_point_in_time(body={"id": response['id']})
+
+    try:
+        response = await open_context(
+            es.open_point_in_time(
+                index=index,
+                keep_alive=elasticsearch_helper.KEEP_ALIVE,
+                ignore_unavailable=True
+            ),
+            release
+        )
+        return response['id']
+    except TransportError as error:
+        logger.warning('Could not open a point in time, falling back to scroll: %s', error)
+        return None
+
+async def put_pages_with_pit(es, pages, query, pit_id):
+    """Puts all spans matching the query page by page with search_after into the queue."""
+    search_after = None
+    while True:
+        body = elasticsearch_helper.get_search_body(query, pit_id, search_after)
+        page = await es.search(body=body)
+        pit_id = page.get('pit_id', pit_id)
+        hits = page['hits']['hits']
+        if hits:
+            await pages.put(strip_page_metadata(page))
+        if len(hits) < elasticsearch_helper.PAGE_SIZE:
+            break
+        search_after = hits[-1]['sort']
+
+async def put_pages_with_scroll(es, pages, index, query):
+    """
+    Puts all spans matching the query page by page with a scroll into the queue.
+    The scroll context is cleared when the requests stop.
+    """
+    async def release(page):
+        if page.get('_scroll_id'):
+            await es.clear_scroll(scroll_id=page['_scroll_id'])
+
+    page = await open_context(
+        es.search(
+            index=index,
+            scroll=elasticsearch_helper.KEEP_ALIVE,
+            ignore_unavailable=True,
+            body=elasticsearch_helper.get_search_body(query)
+        ),
+        release
+    )
+    sid = page.get('_scroll_id')
+    try:
+        while True:
+            hits = page['hits']['hits']
+            if hits:
+                await pages.put(strip_page_metadata(page))
+            if len(hits) < elasticsearch_helper.PAGE_SIZE:
+                break
+            page = await es.scroll(scroll_id=sid, scroll=elasticsearch_helper.KEEP_ALIVE)
+            sid = page.get('_scroll_id', sid)
+    finally:
+        if sid:
+            await es.clear_scroll(scroll_id=sid)
+
+async def put_query_pages(es, semaphore, pages, index, query, pit_id):
+    """Puts all spans matching the query into the queue, if a request slot is free."""
+    async with semaphore:
+        if pit_id:
+            await put_pages_with_pit(es, pages, query, pit_id)
+        else:
+            await put_pages_with_scroll(es, pages, index, query)
+
+async def put_pages(indices, queries, pages):
+    """
+    Puts all spans matching any of the queries page by page into the queue, the queries
+    are paged concurrently. All queries share a single point in time, if it is supported.
+    """
+    es = AsyncElasticsearch(elasticsearch_helper.BASE_URL, serializer=Serializer(),
+                            maxsize=CONCURRENCY)
+    index = ','.join(indices)
+    pit_id = None
+    try:
+        if elasticsearch_helper.PAGING == elasticsearch_helper.PAGING_PIT:
+            pit_id = await open_point_in_time(es, index)
+        elif elasticsearch_helper.PAGING != elasticsearch_helper.PAGING_SCROLL:
+            raise ValueError(f"Unknown paging mode: '{elasticsearch_helper.PAGING}'")
+        semaphore = asyncio.Semaphore(CONCURRENCY)
+        tasks = [
+            asyncio.ensure_future(put_query_pages(es, semaphore, pages, index, query, pit_id))
+            for query in queries
+        ]
+        try:
+            await asyncio.gather(*tasks)
+        except Exception:
+            # stop the other queries if one of them failed
+            for task in tasks:
+                task.cancel()
+            raise
+        finally:
+            # wait until all queries cleared their scroll, also if they were cancelled
+            await asyncio.gather(*tasks, return_exceptions=True)
+    finally:
+        if pit_id:
+            await es.close_point_in_time(body={"id": pit_id})
+        await es.close()
+
+async def fetch(indices, queries, pages):
+    """Puts all pages into the queue, followed by DONE or the error which stopped the requests."""
+    try:
+        await put_pages(indices, queries, pages)
+    except Exception as error: # pylint: disable=broad-except
+        await pages.put(error)
+    else:
+        await pages.put(DONE)
+
+async def start_fetch(indices, queries):
+    """Returns the queue of the pages and the task which fetches them."""
+    # the queue has to be created in the event loop which uses it
+    pages = asyncio.Queue(2 * CONCURRENCY)
+    return pages, asyncio.ensure_future(fetch(indices, queries, pages))
+
+async def cancel(task):
+    """Cancels the task and waits until it stopped."""
+    task.cancel()
+    await asyncio.gather(task, return_exceptions=True)
+
+def run(loop, coroutine):
+    """Runs the coroutine in the event loop of another thread and returns its result."""
+    return asyncio.run_coroutine_threadsafe(coroutine, loop).result()
+
+def iter_pages(indices, queries):
+    """
+    Yields all spans matching any of the queries page by page, as soon as they arrive.
+    The queries are paged concurrently in an event loop in a background thread, which
+    pauses when the pages are not taken from the queue. Indices which do not exist
+    (e.g. days without spans) are ignored.
+    """
+    if AsyncElasticsearch is None:
+        raise ImportError('The AsyncElasticsearch-Storage-Backend requires aiohttp')
+    loop = asyncio.new_event_loop()
+    thread = threading.Thread(target=loop.run_forever, daemon=True)
+    thread.start()
+    try:
+        pages, task = run(loop, start_fetch(indices, queries))
+        try:
+            while True:
+                page = run(loop, pages.get())
+                if page is DONE:
+                    break
+                if isinstance(page, Exception):
+                    raise page
+                yield page
+        finally:
+            run(loop, cancel(task))
+    finally:
+        loop.call_soon_threadsafe(loop.stop)
+        thread.join()
+        loop.close()
+
+def iter_spans_in_range(start: int, end: int):
+    """Yields all spans in the specified time range page by page."""
+    yield from iter_pages(get_indices(start, end), get_shard_queries(start, end))
+
+def get_spans_in_range(start: int, end: int):
+    """Returns all spans in the specified time range."""
+    return [span for page in iter_spans_in_range(start, end) for span in page]
+
+def iter_spans_by_ids(span_ids, start: int, end: int):
+    """
+    Yields the spans with the given SpanIDs within the time range page by page.
+    The SpanIDs are requested in chunks to keep the terms queries small.
+    """
+    span_ids = list(span_ids)
+    chunk_size = elasticsearch_helper.TERMS_CHUNK_SIZE
+    queries = [get_multi_span_query(span_ids[i:i + chunk_size])
+               for i in range(0, len(span_ids), chunk_size)]
+    if queries:
+        yield from iter_pages(get_indices(start, end), queries)
+
+def get_spans_by_ids(span_ids, start: int, end: int):
+    """Returns all spans with the given SpanIDs within the time range."""
+    return [span for page in iter_spans_by_ids(span_ids, start, end) for span in page]
+
+def iter_spans_by_trace_ids(trace_ids, start: int, end: int):
+    """
+    Yields all spans of the given traces within the time range page by page.
+    The TraceIDs are requested in chunks to keep the terms queries small.
+    """
+    trace_ids = list(trace_ids)
+    chunk_size = elasticsearch_helper.TERMS_CHUNK_SIZE
+    queries = [get_multi_trace_query(trace_ids[i:i + chunk_size], start, end)
+               for i in range(0, len(trace_ids), chunk_size)]
+    if queries:
+        yield from iter_pages(get_indices(start, end), queries)
@@ -3,20 +3,76 @@ This module helps to connect to any Elasticsearch instance specified in the conf
 Performs queries and return corresponding output as formatted in the ES-Storage-Backend.
 """
 import logging
+import time
 
-from datetime import datetime
-from elasticsearch import Elasticsearch
+from datetime import datetime, timedelta, timezone
+from elasticsearch import Elasticsearch, JSONSerializer
+from elasticsearch.exceptions import SerializationError, TransportError
 
-from trace_explorer.config import DB_SETTINGS
-from trace_explorer.definitions import span
+from trace_explorer.config import DB_SETTINGS, REFERENCE_LOOKBACK
+from trace_explorer.definitions import http, span, tags
+from trace_explorer.parsers.common import loads
+from trace_explorer.parsers.opentracing import RELEVANT_KEYS
+
+from .stats import DURATION_PERCENTS
 
 logger = logging.getLogger(__name__)
 logger.setLevel(logging.DEBUG)
 
 
+class Serializer(JSONSerializer):
+    """Decodes the responses with orjson if it is installed."""
+
+    def loads(self, s):
+        try:
+            return loads(s)
+        except (ValueError, TypeError) as e:
+            raise SerializationError(s, e) from e
+
+
 BASE_URL = f"http://{DB_SETTINGS.get('URL')}:{DB_SETTINGS.get('PORT')}"
-es = Elasticsearch(BASE_URL)
+es = Elasticsearch(BASE_URL, serializer=Serializer())
+
+TERMS_CHUNK_SIZE = DB_SETTINGS.get('TERMS_CHUNK_SIZE')
+PAGING = DB_SETTINGS.get('PAGING')
+PAGE_SIZE = DB_SETTINGS.get('PAGE_SIZE')
+KEEP_ALIVE = '2m'
+
+INDEX_PREFIX = DB_SETTINGS.get('INDEX_PREFIX')
+INDEX_MODE = DB_SETTINGS.get('INDEX_MODE')
+INDEX_DATE_FORMAT = DB_SETTINGS.get('INDEX_DATE_FORMAT')
+
+INDEX_MODE_DAILY = 'daily'
+INDEX_MODE_ROLLOVER = 'rollover'
+ROLLOVER_READ_ALIAS = 'read'
+
+PAGING_PIT = 'pit'
+PAGING_SCROLL = 'scroll'
+
+# Maximum number of services in the statistics of a szenario
+STATS_SERVICES_SIZE = 1000
+
+# Only these fields of the stored spans are used by the parsers
+SOURCE_FIELDS = RELEVANT_KEYS + ['traceID', 'spanID', 'process', 'tags', 'logs']
+
+
+def get_indices(start: int, end: int):
+    """
+    Returns the names of all indices which can contain spans of the time range.
+    Jaeger writes spans into one index per day (UTC) or into rollover indices
+    which are read through a single alias.
+    """
+    if INDEX_MODE == INDEX_MODE_ROLLOVER:
+        return [INDEX_PREFIX + ROLLOVER_READ_ALIAS]
+    if INDEX_MODE != INDEX_MODE_DAILY:
+        raise ValueError(f"Unknown index mode: '{INDEX_MODE}'")
 
+    first_day = datetime.fromtimestamp(start / 1e6, tz=timezone.utc).date()
+    last_day = datetime.fromtimestamp(end / 1e6, tz=timezone.utc).date()
+    return [
+        INDEX_PREFIX + (first_day + timedelta(days=i)).strftime(INDEX_DATE_FORMAT)
+        for i in range((last_day - first_day).days + 1)
+    ]
 
 def get_span_query(gte: int, lte: int):
     """Return an es-query for all spans in the time range."""
@@ -30,8 +86,50 @@ def get_span_query(gte: int, lte: int):
     }
     return query
 
+def get_tag_query(key, value):
+    """Return an es-query for all spans with the tag (nested key-value-pairs)."""
+    query = {
+        "nested": {
+            "path": "tags",
+            "score_mode": "avg",
+            "query": {
+                "bool": {
+                    "must": [
+                        {
+                            "match": {
+                                "tags.key": key
+                            }
+                        },
+                        {
+                            "match": {
+                                "tags.value": value
+                            }
+                        }
+                    ]
+                }
+            }
+        }
+    }
+    return query
+
+def get_error_tag_query():
+    """
+    Return an es-query for all spans containing the error tag or the HTTP status code 500,
+    like the errors detected by the analysis (Span.has_error).
+    """
+    query = {
+        "bool": {
+            "should": [
+                get_tag_query(tags.ERROR_KEY, True),
+                get_tag_query(tags.HTTP_STATUS_CODE_KEY, str(http.STATUS_500))
+            ],
+            "minimum_should_match": 1
+        }
+    }
+    return query
+
 def get_error_query(gte: int, lte: int):
-    """Return an es-query for all spans containing the error tag."""
+    """Return an es-query for all erroneous spans (see get_error_tag_query) in the time range."""
     query = {
         "bool": {
             "must": [
@@ -43,41 +141,37 @@ def get_error_query(gte: int, lte: int):
                         }
                     }
                 },
-                {
-                    "nested": {
-                        "path": "tags",
-                        "score_mode": "avg",
-                        "query": {
-                            "bool": {
-                                "must": [
-                                    {
-                                        "match": {
-                                            "tags.key": "error"
-                                        }
-                                    },
-                                    {
-                                        "match": {
-                                            "tags.value": True
-                                        }
-                                    }
-                                ]
-                            }
-                        }
-                    }
-                }
+                get_error_tag_query()
             ]
         }
     }
     return query
 
-def get_single_span_query(span_id):
-    """Returns an es-query for the given SpanID."""
+def get_multi_span_query(span_ids):
+    """Return an es-query for all spans with the given SpanIDs."""
+    query = {
+        "terms": {
+            "spanID": list(span_ids)
+        }
+    }
+    return query
+
+def get_multi_trace_query(trace_ids, gte: int, lte: int):
+    """Return an es-query for all spans of the given traces in the time range."""
     query = {
         "bool": {
-            "must": [
+            "filter": [
+                {
+                    "range": {
+                        "startTime": {
+                            "gte": gte,
+                            "lte": lte
+                        }
+                    }
+                },
                 {
-                    "match": {
-                        "spanID": span_id
+                    "terms": {
+                        "traceID": list(trace_ids)
                     }
                 }
             ]
@@ -85,6 +179,96 @@ def get_single_span_query(span_id):
     }
     return query
 
+def get_trace_ids_body(query, after=None):
+    """
+    Returns the body of a search request for a single page of the TraceIDs
+    of all spans matching the query, as composite aggregation.
+    """
+    body = {
+        "query": query,
+        "size": 0,
+        "aggs": {
+            "traces": {
+                "composite": {
+                    "size": PAGE_SIZE,
+                    "sources": [{"traceID": {"terms": {"field": "traceID"}}}]
+                }
+            }
+        }
+    }
+    if after:
+        body["aggs"]["traces"]["composite"]["after"] = after
+    return body
+
+def get_stats_body(query):
+    """
+    Returns the body of a search request for the statistics of all spans matching the query:
+    the approximate number of traces, the number of spans and per service the number of
+    spans and errors and the durations.
+    """
+    body = {
+        "query": query,
+        "size": 0,
+        "track_total_hits": True,
+        "aggs": {
+            "traces": {
+                "cardinality": {
+                    "field": "traceID",
+                    # maximum precision, counts are exact up to this number
+                    "precision_threshold": 40000
+                }
+            },
+            "services": {
+                "terms": {
+                    "field": "process.serviceName",
+                    "size": STATS_SERVICES_SIZE
+                },
+                "aggs": {
+                    "errors": {"filter": get_error_tag_query()},
+                    "durations": {"stats": {"field": "duration"}},
+                    "percentiles": {
+                        "percentiles": {"field": "duration", "percents": DURATION_PERCENTS}
+                    }
+                }
+            }
+        }
+    }
+    return body
+
+def strip_page_metadata(page):
+    """
+    Takes a single page queried from Elasticsearch and returns the contained spans without
+    the metadata which where produced by Elasticsearch/ Indexing.
+    """
+    result = []
+    for span in page.get('hits').get('hits', []):
+        if span.get('_type') not in ['span', '_doc']:
+            raise Exception('Dataset is of type: "' + span.get('_type') + '", not "span"')
+        result.append(span.get('_source'))
+    return result
+
+def get_search_body(query, pit_id=None, search_after=None):
+    """Returns the body of a search request for a single page of spans."""
+    body = {
+        "query": query,
+        "size": PAGE_SIZE,
+        "_source": SOURCE_FIELDS
+    }
+    if pit_id:
+        body["pit"] = {
+            "id": pit_id,
+            "keep_alive": KEEP_ALIVE
+        }
+        # _shard_doc is a cheap and unique tiebreaker within a point in time
+        body["sort"] = [{"startTime": "asc"}, {"_shard_doc": "asc"}]
+        body["track_total_hits"] = False
+        if search_after:
+            body["search_after"] = search_after
+    else:
+        # scrolling in index order is the most efficient
+        body["sort"] = ["_doc"]
+    return body
+
 def remove_elasticsearch_metadata(data):
     """
     Takes data queried from Elasticsearch and removes all unnecessary metadata which where
@@ -92,64 +276,184 @@ def remove_elasticsearch_metadata(data):
     """
     result = []
     for entry in data:
-        hits = entry.get('hits')
-        if not hits.get('total'):
-            return []
-
-        spans = hits.get('hits')
-        for span in spans:
-            if span.get('_type') not in ['span', '_doc']:
-                raise Exception('Dataset is of type: "' + span.get('_type') + '", not "span"')
-            source = span.get('_source')
-            result.append(source)
-
+        result.extend(strip_page_metadata(entry))
     return result
 
-def get_spans_in_range(start: int, end: int):
-    """Returns all spans in the specified time range."""
-    index = 'jaeger-span-' + datetime.now().strftime('%Y-%m-%d')
-    query = get_span_query(start, end)
+def open_point_in_time(index):
+    """
+    Opens a point in time on the index and returns its ID.
+    Returns None if the cluster does not support points in time.
+    """
+    try:
+        return es.open_point_in_time(
+            index=index,
+            keep_alive=KEEP_ALIVE,
+            ignore_unavailable=True
+        )['id']
+    except TransportError as error:
+        logger.warning('Could not open a point in time, falling back to scroll: %s', error)
+        return None
 
-    # Initialize the scroll
+def iter_pages_with_pit(query, pit_id):
+    """
+    Yields all spans matching the query page by page with search_after.
+    The point in time is closed when the iteration stops.
+    """
+    search_after = None
+    try:
+        while True:
+            page = es.search(body=get_search_body(query, pit_id, search_after))
+            # the ID of the point in time can change between requests
+            pit_id = page.get('pit_id', pit_id)
+            hits = page['hits']['hits']
+            if hits:
+                yield strip_page_metadata(page)
+            if len(hits) < PAGE_SIZE:
+                break
+            search_after = hits[-1]['sort']
+    finally:
+        es.close_point_in_time(body={"id": pit_id})
+
+def iter_pages_with_scroll(index, query):
+    """
+    Yields all spans matching the query page by page with a scroll.
+    The scroll context is cleared when the iteration stops.
+    """
     page = es.search(
         index=index,
-        scroll = '2m',
-        size = 1000,
-        query = query
+        scroll=KEEP_ALIVE,
+        ignore_unavailable=True,
+        body=get_search_body(query)
     )
-    sid = page['_scroll_id']
-    scroll_size = page['hits']['total']
-    if isinstance(scroll_size, dict):
-        scroll_size = scroll_size['value']
-
-    result = [page]
-    # Start scrolling
-    while scroll_size > 0:
-        page = es.scroll(scroll_id = sid, scroll = '2m')
-        # Update the scroll ID
-        sid = page['_scroll_id']
-        # Get the number of results that we returned in the last scroll
-        scroll_size = len(page['hits']['hits'])
-        # Do something with the obtained page
-        result.append(page)
-
-    return remove_elasticsearch_metadata(result)
-
-def get_span_from_storage(span_id):
+    sid = page.get('_scroll_id')
+    try:
+        while True:
+            hits = page['hits']['hits']
+            if hits:
+                yield strip_page_metadata(page)
+            # a partial page is the last one, no need for another request
+            if len(hits) < PAGE_SIZE:
+                break
+            page = es.scroll(scroll_id=sid, scroll=KEEP_ALIVE)
+            # Update the scroll ID
+            sid = page.get('_scroll_id', sid)
+    finally:
+        if sid:
+            es.clear_scroll(scroll_id=sid)
+
+def iter_pages(indices, query):
+    """
+    Yields all spans matching the query page by page, as soon as they arrive.
+    Uses a point in time with search_after or a scroll depending on the config.
+    Indices which do not exist (e.g. days without spans) are ignored.
+    """
+    index = ','.join(indices)
+    if PAGING == PAGING_PIT:
+        pit_id = open_point_in_time(index)
+        if pit_id:
+            yield from iter_pages_with_pit(query, pit_id)
+            return
+    elif PAGING != PAGING_SCROLL:
+        raise ValueError(f"Unknown paging mode: '{PAGING}'")
+    yield from iter_pages_with_scroll(index, query)
+
+def iter_spans_in_range(start: int, end: int):
+    """Yields all spans in the specified time range page by page."""
+    query = get_span_query(start, end)
+    yield from iter_pages(get_indices(start, end), query)
+
+def get_spans_in_range(start: int, end: int):
+    """Returns all spans in the specified time range."""
+    return [span for page in iter_spans_in_range(start, end) for span in page]
+
+def iter_spans_by_ids(span_ids, start: int, end: int):
+    """
+    Yields the spans with the given SpanIDs within the time range page by page.
+    The SpanIDs are requested in chunks to keep the terms queries small.
+    """
+    indices = get_indices(start, end)
+    span_ids = list(span_ids)
+    for i in range(0, len(span_ids), TERMS_CHUNK_SIZE):
+        query = get_multi_span_query(span_ids[i:i + TERMS_CHUNK_SIZE])
+        yield from iter_pages(indices, query)
+
+def get_spans_by_ids(span_ids, start: int, end: int):
+    """Returns all spans with the given SpanIDs within the time range."""
+    return [span for page in iter_spans_by_ids(span_ids, start, end) for span in page]
+
+def get_span_from_storage(span_id, start: int = None, end: int = None):
     """
     Returns a single span representation by its SpanID.
+    Without a time range, the span is searched in the recent past.
     """
     logger.info('Trying to retrieve span-data for unresolved reference: %s', span_id)
-    index = 'jaeger-span-' + datetime.now().strftime('%Y-%m-%d')
-    query = get_single_span_query(span_id)
+    if end is None:
+        end = time.time_ns() // 1000
+    if start is None:
+        start = end - REFERENCE_LOOKBACK
+    return get_spans_by_ids([span_id], start, end)
 
-    # Initialize the scroll
+def iter_error_trace_ids(start: int, end: int):
+    """
+    Yields the TraceIDs of all traces with an erroneous span in the time range page by page.
+    Only the TraceIDs are transferred, they are aggregated by Elasticsearch.
+    """
+    index = ','.join(get_indices(start, end))
+    query = get_error_query(start, end)
+    after = None
+    while True:
+        page = es.search(
+            index=index,
+            ignore_unavailable=True,
+            body=get_trace_ids_body(query, after)
+        )
+        # there are no aggregations if none of the indices exists
+        traces = page.get('aggregations', {}).get('traces', {})
+        buckets = traces.get('buckets', [])
+        if buckets:
+            yield [bucket['key']['traceID'] for bucket in buckets]
+        after = traces.get('after_key')
+        if len(buckets) < PAGE_SIZE or not after:
+            break
+
+def get_szenario_stats(start: int, end: int):
+    """
+    Returns the statistics of all spans in the time range, computed by Elasticsearch
+    with aggregations: the number of traces (approximate for many traces) and spans and
+    per service the number of spans and erroneous spans and their durations.
+    """
     page = es.search(
-        index=index,
-        scroll = '2m',
-        size = 1000,
-        query = query
+        index=','.join(get_indices(start, end)),
+        ignore_unavailable=True,
+        body=get_stats_body(get_span_query(start, end))
     )
+    # there are no aggregations if none of the indices exists
+    aggregations = page.get('aggregations', {})
+    services = {}
+    for bucket in aggregations.get('services', {}).get('buckets', []):
+        durations = bucket['durations']
+        percentiles = bucket['percentiles']['values']
+        services[bucket['key']] = {
+            'spanCount': bucket['doc_count'],
+            'errorCount': bucket['errors']['doc_count'],
+            'min': durations['min'],
+            'max': durations['max'],
+            'mean': durations['avg'],
+            **{f'p{p}': percentiles[f'{float(p)}'] for p in DURATION_PERCENTS}
+        }
+    return {
+        'traceCount': aggregations.get('traces', {}).get('value', 0),
+        'spanCount': page['hits']['total']['value'],
+        'services': services
+    }
 
-    result = [page]
-    return remove_elasticsearch_metadata(result)
\ No newline at end of file
+def iter_spans_by_trace_ids(trace_ids, start: int, end: int):
+    """
+    Yields all spans of the given traces within the time range page by page.
+    The TraceIDs are requested in chunks to keep the terms queries small.
+    """
+    indices = get_indices(start, end)
+    trace_ids = list(trace_ids)
+    for i in range(0, len(trace_ids), TERMS_CHUNK_SIZE):
+        query = get_multi_trace_query(trace_ids[i:i + TERMS_CHUNK_SIZE], start, end)
+        yield from iter_pages(indices, query)
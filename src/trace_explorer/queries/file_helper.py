@@ -0,0 +1,374 @@
+"""
+This module implements a Storage-Backend for spans in local files (config: RCA_DB_PATH),
+e.g. exported from Jaeger or dumped from Elasticsearch. Supported are Jaeger JSON exports
+({"data": [traces]}), Elasticsearch search responses, JSON arrays of spans, traces or hits
+and NDJSON files with one span or hit per line. Files can be compressed with gzip.
+Every file is read once to build an in-memory index of the start times of its spans,
+so queries only read the documents which contain matching spans.
+"""
+import gzip
+import json
+import logging
+import os
+import re
+import sys
+import time
+from bisect import bisect_left, bisect_right
+
+import numpy as np
+
+from trace_explorer.config import DB_SETTINGS, REFERENCE_LOOKBACK
+from trace_explorer.definitions import http, span as span_def, tags as tags_def
+from trace_explorer.parsers.common import loads
+
+from .stats import get_span_stats
+
+logger = logging.getLogger(__name__)
+logger.setLevel(logging.DEBUG)
+
+
+PATH = DB_SETTINGS.get('PATH')
+PAGE_SIZE = DB_SETTINGS.get('PAGE_SIZE')
+
+
+CHUNK_SIZE = 1 << 20 # bytes
+GZIP_MAGIC = b'\x1f\x8b'
+UTF8_BOM = '\xef\xbb\xbf' # decoded as latin-1
+
+# Keys of objects which contain the documents (Jaeger export and Elasticsearch response)
+CONTAINER_KEYS = ('data', 'hits')
+# Keys which appear before the documents in such objects
+CONTAINER_PREFIX_KEYS = CONTAINER_KEYS + (
+    'total', 'limit', 'offset', 'errors', 'took', 'timed_out', '_shards', '_scroll_id', 'pit_id'
+)
+
+WHITESPACE = re.compile(r'[ \t\n\r]*')
+FIRST_KEY = re.compile(r'\{[ \t\n\r]*"((?:[^"\\]|\\.)*)"')
+
+decoder = json.JSONDecoder()
+indices = {} # paths and modification times -> FileIndex, only the latest one is kept
+
+
+class DocumentReader:
+    """
+    Reads the JSON documents (spans, hits or traces) of a file one by one, without
+    reading the whole file at once. The file is decoded as latin-1, so the offset of
+    a character is equal to the offset of its byte. Non-ASCII strings of the documents
+    are garbled, which does not matter for the start times and the SpanIDs.
+    """
+
+    def __init__(self, file):
+        self.file = file
+        self.buffer = ''
+        self.position = 0
+        self.offset = 0 # offset of the buffer in the file
+
+    def fill(self, size=CHUNK_SIZE):
+        """Reads the next chunk of the file into the buffer. Return False at the end."""
+        chunk = self.file.read(size)
+        if not chunk:
+            return False
+        self.offset += self.position
+        self.buffer = self.buffer[self.position:] + chunk.decode('latin-1')
+        self.position = 0
+        return True
+
+    def peek(self):
+        """Return the next character which is not a whitespace ('' at the end)."""
+        while True:
+            self.position = WHITESPACE.match(self.buffer, self.position).end()
+            if self.position < len(self.buffer):
+                return self.buffer[self.position]
+            if not self.fill():
+                return ''
+
+    def next(self):
+        """Return and consume the next character which is not a whitespace."""
+        char = self.peek()
+        self.position += 1
+        return char
+
+    def decode(self):
+        """Decodes the next value. Returns the value with its offset and length in bytes."""
+        self.peek()
+        while True:
+            try:
+                value, end = decoder.raw_decode(self.buffer, self.position)
+            except json.JSONDecodeError as error:
+                # read larger chunks for large values to stay linear
+                if self.fill(max(CHUNK_SIZE, len(self.buffer))):
+                    continue
+                raise ValueError(f'Invalid JSON at offset {self.offset + error.pos}') from error
+            # a number at the end of the buffer could be incomplete
+            if end == len(self.buffer) and self.fill():
+                continue
+            offset = self.offset + self.position
+            length = end - self.position
+            self.position = end
+            return value, offset, length
+
+    def iter_documents(self):
+        """Yields all documents of the file with their offset and length."""
+        self.peek()
+        if self.buffer.startswith(UTF8_BOM):
+            self.position = len(UTF8_BOM)
+        while True:
+            char = self.peek()
+            if not char:
+                return
+            if char == '[':
+                yield from self.iter_array()
+            elif char == '{' and self.get_first_key() in CONTAINER_PREFIX_KEYS:
+                yield from self.iter_container()
+            elif char == '{':
+                yield self.decode()
+            else:
+                raise ValueError(f"Unexpected '{char}' at offset {self.offset + self.position}")
+
+    def get_first_key(self):
+        """Return the first key of the object at the current position."""
+        while True:
+            match = FIRST_KEY.match(self.buffer, self.position)
+            # keys are short, no need to read further if there is enough data
+            if match or len(self.buffer) - self.position > CHUNK_SIZE or not self.fill():
+                return match.group(1) if match else None
+
+    def iter_array(self):
+        """Yields the elements of an array as documents."""
+        self.next()
+        if self.peek() == ']':
+            self.next()
+            return
+        while True:
+            yield self.decode()
+            char = self.next()
+            if char == ']':
+                return
+            if char != ',':
+                raise ValueError(f"Expected ',' at offset {self.offset + self.position - 1}")
+
+    def iter_container(self):
+        """
+        Yields the documents of an object which contains them in an array.
+        The array can be nested in another object ({"hits": {"hits": [...]}}).
+        """
+        self.next()
+        while True:
+            char = self.next()
+            if char == '}':
+                return
+            if char == ',':
+                continue
+            self.position -= 1
+            key = self.decode()[0]
+            if self.next() != ':':
+                raise ValueError(f"Expected ':' at offset {self.offset + self.position - 1}")
+            if key in CONTAINER_KEYS and self.peek() == '[':
+                yield from self.iter_array()
+            elif key in CONTAINER_KEYS and self.peek() == '{':
+                yield from self.iter_container()
+            else:
+                self.decode()
+
+
+def get_spans(document):
+    """Return the spans of a document: a span, an Elasticsearch hit or a Jaeger trace."""
+    if '_source' in document:
+        return [document['_source']]
+    if 'spans' in document:
+        processes = document.get('processes', {})
+        for span_data in document['spans']:
+            if 'process' not in span_data:
+                span_data['process'] = processes.get(span_data.get('processID'))
+        return document['spans']
+    return [document]
+
+def has_error(span_data):
+    """
+    Checks whether a span contains the error tag or the HTTP status code 500,
+    like the error query of the Elasticsearch-Storage-Backend.
+    """
+    for tag in span_data.get(span_def.TAGS, []):
+        key = tag.get('key')
+        if key == tags_def.ERROR_KEY and str(tag.get('value')).lower() == 'true':
+            return True
+        if key == tags_def.HTTP_STATUS_CODE_KEY and str(tag.get('value')) == str(http.STATUS_500):
+            return True
+    return False
+
+def open_file(path):
+    """Opens a file for binary reading, gzip compressed files are decompressed."""
+    with open(path, 'rb') as file:
+        magic = file.read(len(GZIP_MAGIC))
+    if magic == GZIP_MAGIC:
+        return gzip.open(path, 'rb')
+    return open(path, 'rb')
+
+def get_paths():
+    """Return the configured file or all files of the configured directory."""
+    if not PATH:
+        raise ValueError('No path configured for the file Storage-Backend (RCA_DB_PATH)')
+    if not os.path.isdir(PATH):
+        return [PATH]
+    return [
+        os.path.join(PATH, name) for name in sorted(os.listdir(PATH))
+        if not name.startswith('.') and os.path.isfile(os.path.join(PATH, name))
+    ]
+
+
+class FileIndex:
+    """
+    Index of the start times of the spans in a list of files.
+    Every span is located by its file, the offset and length of its document
+    and its position in the document. The TraceIDs, errors, services and durations
+    of the spans are indexed, too, so traces with errors and the statistics of a
+    time range can be computed without reading the files again.
+    """
+
+    def __init__(self, paths):
+        self.paths = paths
+        entries = []
+        for file_number, path in enumerate(paths):
+            with open_file(path) as file:
+                for document, offset, length in DocumentReader(file).iter_documents():
+                    for position, span_data in enumerate(get_spans(document)):
+                        entries.append((
+                            span_data[span_def.START_TIME], span_data[span_def.SPAN_ID],
+                            file_number, offset, length, position,
+                            sys.intern(span_data['traceID']), has_error(span_data),
+                            sys.intern(span_data['process']['serviceName']),
+                            span_data[span_def.DURATION]
+                        ))
+        entries.sort()
+        self.start_times = [entry[0] for entry in entries]
+        self.locations = [entry[2:6] for entry in entries]
+        self.trace_ids = [entry[6] for entry in entries]
+        self.errors = [entry[7] for entry in entries]
+        self.services = [entry[8] for entry in entries]
+        self.durations = np.array([entry[9] for entry in entries], dtype=np.int64)
+        self.span_ids = {} # SpanID -> positions in the index
+        for i, entry in enumerate(entries):
+            self.span_ids.setdefault(entry[1], []).append(i)
+        logger.info('Indexed %r spans in %r files.', len(entries), len(paths))
+
+    def get_range(self, start: int, end: int):
+        """Return the positions in the index of all spans in the time range."""
+        return range(bisect_left(self.start_times, start), bisect_right(self.start_times, end))
+
+    def get_by_ids(self, span_ids, start: int, end: int):
+        """Return the positions in the index of the spans with the given IDs in the time range."""
+        return [
+            i for span_id in span_ids for i in self.span_ids.get(span_id, [])
+            if start <= self.start_times[i] <= end
+        ]
+
+    def get_error_trace_ids(self, start: int, end: int):
+        """Return the TraceIDs of all traces with an erroneous span in the time range."""
+        return {self.trace_ids[i] for i in self.get_range(start, end) if self.errors[i]}
+
+    def get_stats(self, start: int, end: int):
+        """
+        Return the number of traces and spans in the time range and per service
+        the number of spans and errors and the statistics of their durations.
+        """
+        positions = self.get_range(start, end)
+        return get_span_stats([self.trace_ids[i] for i in positions],
+                              [self.services[i] for i in positions],
+                              self.durations[positions],
+                              [self.errors[i] for i in positions])
+
+    def get_by_trace_ids(self, trace_ids, start: int, end: int):
+        """Return the positions in the index of the spans of the given traces in the time range."""
+        trace_ids = set(trace_ids)
+        return [i for i in self.get_range(start, end) if self.trace_ids[i] in trace_ids]
+
+    def iter_pages(self, positions):
+        """
+        Yields the spans at the positions in the index page by page.
+        The documents are read in the order of the files, every document only once.
+        """
+        page = []
+        file = None
+        file_number = None
+        document = None
+        try:
+            for number, offset, length, position in sorted(self.locations[i] for i in positions):
+                if number != file_number:
+                    if file:
+                        file.close()
+                    file = open_file(self.paths[number])
+                    file_number = number
+                    document = None
+                if document is None or document[0] != offset:
+                    file.seek(offset)
+                    document = (offset, get_spans(loads(file.read(length))))
+                page.append(document[1][position])
+                if len(page) == PAGE_SIZE:
+                    yield page
+                    page = []
+        finally:
+            if file:
+                file.close()
+        if page:
+            yield page
+
+
+def get_index():
+    """
+    Return the index of the configured files, which is built on first use.
+    The index is rebuilt if the files were changed, e.g. by appended spans in follow mode.
+    """
+    paths = get_paths()
+    key = tuple((path, os.path.getmtime(path)) for path in paths)
+    if key not in indices:
+        indices.clear()
+        indices[key] = FileIndex(paths)
+    return indices[key]
+
+def iter_spans_in_range(start: int, end: int):
+    """Yields all spans in the specified time range page by page."""
+    index = get_index()
+    yield from index.iter_pages(index.get_range(start, end))
+
+def get_spans_in_range(start: int, end: int):
+    """Returns all spans in the specified time range."""
+    return [span for page in iter_spans_in_range(start, end) for span in page]
+
+def iter_spans_by_ids(span_ids, start: int, end: int):
+    """Yields the spans with the given SpanIDs within the time range page by page."""
+    index = get_index()
+    yield from index.iter_pages(index.get_by_ids(span_ids, start, end))
+
+def get_spans_by_ids(span_ids, start: int, end: int):
+    """Returns all spans with the given SpanIDs within the time range."""
+    return [span for page in iter_spans_by_ids(span_ids, start, end) for span in page]
+
+def get_span_from_storage(span_id, start: int = None, end: int = None):
+    """
+    Returns a single span representation by its SpanID.
+    Without a time range, the span is searched in the recent past.
+    """
+    logger.info('Trying to retrieve span-data for unresolved reference: %s', span_id)
+    if end is None:
+        end = time.time_ns() // 1000
+    if start is None:
+        start = end - REFERENCE_LOOKBACK
+    return get_spans_by_ids([span_id], start, end)
+
+def iter_error_trace_ids(start: int, end: int):
+    """Yields the TraceIDs of all traces with an erroneous span in the time range."""
+    trace_ids = get_index().get_error_trace_ids(start, end)
+    if trace_ids:
+        yield sorted(trace_ids)
+
+def get_szenario_stats(start: int, end: int):
+    """
+    Returns the statistics of all spans in the time range: the number of traces and spans
+    and per service the number of spans and erroneous spans and their durations.
+    """
+    return get_index().get_stats(start, end)
+
+def iter_spans_by_trace_ids(trace_ids, start: int, end: int):
+    """Yields all spans of the given traces within the time range page by page."""
+    index = get_index()
+    yield from index.iter_pages(index.get_by_trace_ids(trace_ids, start, end))
@@ -0,0 +1,40 @@
+"""
+This module computes the statistics of the spans of a szenario locally,
+in the format of the aggregations of Elasticsearch (see elasticsearch_helper.get_stats_body).
+"""
+import numpy as np
+
+DURATION_PERCENTS = [50, 95, 99]
+
+
+def get_span_stats(trace_ids, services, durations, errors):
+    """
+    Return the number of traces and spans and per service the number of spans and errors
+    and the statistics of their durations. Takes one entry per span: the TraceID,
+    the name of the service, the duration and if the span contains an error.
+    """
+    services = np.asarray(services, dtype=str)
+    durations = np.asarray(durations, dtype=np.int64)
+    errors = np.asarray(errors, dtype=bool)
+    names, codes = np.unique(services, return_inverse=True)
+    order = np.lexsort((durations, codes))
+    bounds = np.flatnonzero(np.diff(codes[order])) + 1
+    result = {}
+    for positions in np.split(order, bounds):
+        if len(positions) == 0:
+            continue
+        service_durations = durations[positions] # sorted
+        percentiles = np.percentile(service_durations, DURATION_PERCENTS)
+        result[str(names[codes[positions[0]]])] = {
+            'spanCount': len(positions),
+            'errorCount': int(np.count_nonzero(errors[positions])),
+            'min': int(service_durations[0]),
+            'max': int(service_durations[-1]),
+            'mean': float(service_durations.mean()),
+            **{f'p{p}': float(value) for p, value in zip(DURATION_PERCENTS, percentiles)}
+        }
+    return {
+        'traceCount': len(set(trace_ids)),
+        'spanCount': len(durations),
+        'services': result
+    }
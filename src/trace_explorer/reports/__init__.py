@@ -0,0 +1,7 @@
+"""
+This package creates the reports of the analysis.
+"""
+
+# Output formats (config.OUTPUTS)
+OUTPUT_HTML = 'html'
+OUTPUT_JSON = 'json'
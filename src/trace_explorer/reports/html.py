@@ -1,62 +1,131 @@
 """
 This module helps to create a graphical representation
-of the hierarchical span structure in html.
+of the hierarchical span structure in html. The span tree is embedded as compact JSON
+and rendered by the browser, only showing the expanded spans which are scrolled to.
+Templates are compiled once per process (and cached on disk as bytecode) and
+rendered as a stream into the report files. A report is only rendered again
+if its content changed since the last run.
 """
 
+import hashlib
+import json
 import os
-from jinja2 import Environment, FileSystemLoader
+from functools import lru_cache
+from jinja2 import Environment, FileSystemBytecodeCache, FileSystemLoader
 
-from trace_explorer.config import REPORT_DIR
+from trace_explorer import config
 
 root = os.path.dirname(os.path.abspath(__file__))
 templates_dir = os.path.join(root, 'templates')
-env = Environment( loader = FileSystemLoader(templates_dir) )
+# the templates do not change while running, so they are never checked for updates
+env = Environment(
+    loader=FileSystemLoader(templates_dir),
+    bytecode_cache=FileSystemBytecodeCache(),
+    auto_reload=False
+)
+
+HASH_PREFIX = '<!-- content-hash: '
+HASH_SUFFIX = ' -->\n'
+
+
+@lru_cache(maxsize=None)
+def get_templates_hash():
+    """Return the hash of the sources of all templates, which can extend each other."""
+    digest = hashlib.sha1()
+    for name in env.list_templates(extensions=['html']):
+        digest.update(env.loader.get_source(env, name)[0].encode('utf-8'))
+    return digest.hexdigest()
+
+def get_content_hash(name, context):
+    """Return the hash of the templates and the data which is rendered."""
+    digest = hashlib.sha1(f'{name}:{get_templates_hash()}'.encode('utf-8'))
+    digest.update(json.dumps(context, sort_keys=True, default=str).encode('utf-8'))
+    return digest.hexdigest()
+
+def read_content_hash(filename):
+    """Return the content hash in the first line of an existing report or None."""
+    try:
+        with open(filename, 'r', encoding='utf-8') as file:
+            line = file.readline()
+    except (OSError, UnicodeDecodeError):
+        return None
+    if line.startswith(HASH_PREFIX) and line.endswith(HASH_SUFFIX):
+        return line[len(HASH_PREFIX):-len(HASH_SUFFIX)]
+    return None
+
+def write_report(filename, name, context):
+    """
+    Renders the template into the file. The output is streamed into a temporary
+    file which replaces the report at the end. Returns False if the report was
+    not rendered, because it already contains the same content.
+    """
+    content_hash = get_content_hash(name, context)
+    if read_content_hash(filename) == content_hash:
+        return False
+    template = env.get_template(name)
+    temporary = f'{filename}.{os.getpid()}.tmp'
+    with open(temporary, 'w', encoding='utf-8') as file:
+        file.write(f'{HASH_PREFIX}{content_hash}{HASH_SUFFIX}')
+        file.writelines(template.generate(**context))
+    os.replace(temporary, filename)
+    return True
+
+def get_trace_context(trace):
+    """Return the data of the report of a trace."""
+    spans = sorted(trace.spans, key=lambda span: span.rating, reverse=True)
+    return {
+        # the fields of the spans are enough, the report does not show their children
+        'spans': [span.get_fields() for span in spans if span.cause],
+        'trace': trace.__dict__(),
+        'tree': get_tree_data(trace.root_span),
+        'strands': [[span.cause for span in strand] for strand in trace.get_error_strands()]
+    }
 
 def create_trace_html(traces):
-    """Creates a HTML report for each Trace in the list."""
+    """
+    Creates a HTML report for each Trace in the list with errors.
+    Traces are rendered in the worker processes of the analysis (config.WORKERS).
+    """
     for trace in traces:
         if trace.error_count == 0:
             continue
-        filename = os.path.join(REPORT_DIR, trace.filename)
-        spans = sorted(trace.spans, key=lambda span: span.rating, reverse=True)
-        spans = [span.__dict__() for span in spans if span.cause]
-        graph = html_graph(trace.root_span)
-        strands = [[span.cause for span in strand] for strand in trace.get_error_strands()]
-        template = env.get_template('spans.html')
-        output = template.render(spans=spans, trace=trace.__dict__(), graph=graph, strands=strands)
-        with open(filename, 'w', encoding='utf-8') as file:
-            file.write(output)
+        filename = os.path.join(config.REPORT_DIR, trace.filename)
+        write_report(filename, 'spans.html', get_trace_context(trace))
 
 def create_szenario_html(szenarios):
     """Creates a file with szenarios details."""
     result = [szenario.__dict__() for szenario in szenarios]
-    filename = os.path.join(REPORT_DIR, 'index.html')
-    template = env.get_template('szenarios.html')
-    output = template.render(szenarios=result)
-    with open(filename, 'w', encoding='utf-8') as file:
-        file.write(output)
-
-def walk_tree(span):
-    """Recursive function to create html objects of the spans children."""
-    result = []
-    if span.children:
-        result.append('<ul>\n')
-        children = sorted(span.children, key=lambda child: child.start_time)
-        for child in children:
-            if child.error:
-                result.append(
-                    f'<li> <span style="color:red">{child.operation_name}: {child.cause}</span>\n')
-            else:
-                result.append(f'<li> <span>{child.operation_name}</span>\n')
-            result.extend(walk_tree(child))
-            result.append('</li>\n')
-        result.append('</ul>\n')
-    return result
-
-def html_graph(root_span):
-    """Return a string which defines a graph representation in html."""
-    result = ['<ul class="tree">\n']
-    result.append(f'<li> <span>{root_span.operation_name}</span>\n')
-    result.extend(walk_tree(root_span))
-    result.append('</li>\n</ul>\n')
-    return ''.join(result)
+    filename = os.path.join(config.REPORT_DIR, 'index.html')
+    write_report(filename, 'szenarios.html', {'szenarios': result})
+
+def get_tree_data(root_span):
+    """
+    Return a compact JSON encoding of the span tree, which is rendered by the browser.
+    The spans are listed depth-first with the children ordered by their start time.
+    Every span is encoded by the position of its parent and the code of its operation
+    name, the causes of the erroneous spans are mapped by their positions.
+    """
+    names = {}
+    parents = []
+    codes = []
+    errors = {}
+    stack = [(root_span, -1)]
+    while stack:
+        span, parent = stack.pop()
+        position = len(parents)
+        parents.append(parent)
+        code = names.get(span.operation_name)
+        if code is None:
+            code = names[span.operation_name] = len(names)
+        codes.append(code)
+        if span.error:
+            errors[position] = span.cause
+        if span.children:
+            children = sorted(span.children, key=lambda child: child.start_time)
+            stack += [(child, position) for child in reversed(children)]
+    data = json.dumps(
+        {'names': list(names), 'name': codes, 'parent': parents, 'errors': errors},
+        separators=(',', ':')
+    )
+    # the JSON is embedded in a script element, which must not be closed by any string
+    return data.replace('<', '\\u003c')
@@ -0,0 +1,84 @@
+"""
+This module writes the results of the analysis in a machine-readable format.
+The results of the traces are streamed as NDJSON (one JSON object per line)
+while the analysis runs, the summaries of the szenarios are written as JSON at the end.
+"""
+
+import json
+import os
+
+from trace_explorer import config
+
+from . import OUTPUT_JSON
+
+RESULTS_FILENAME = 'results.ndjson'
+SZENARIOS_FILENAME = 'szenarios.json'
+
+
+def get_span_result(span):
+    """Return the result of the analysis of a span without its children."""
+    return {
+        'spanID': span.span_id,
+        'operationName': span.operation_name,
+        'service': span.service.get('name'),
+        'error': span.error,
+        'rating': span.rating,
+        'cause': span.cause,
+        'causedBy': span.caused_by.span_id if span.caused_by else None
+    }
+
+def get_trace_result(trace):
+    """
+    Return the result of the analysis of a trace: the most likely root cause, the error
+    strands (SpanIDs starting from their root cause) and the rated spans with a cause.
+    """
+    spans = sorted(
+        (span for span in trace.spans if span.cause), key=lambda span: span.rating, reverse=True
+    )
+    errors = [span for span in spans if span.error]
+    return {
+        'traceID': trace.trace_id,
+        'startTime': trace.start_time,
+        'errorCount': trace.error_count,
+        'rootCause': errors[0].span_id if errors else None,
+        'strands': [[span.span_id for span in strand] for strand in trace.get_error_strands()],
+        'spans': [get_span_result(span) for span in spans]
+    }
+
+
+class ResultWriter:
+    """Appends the results of traces to a NDJSON file as soon as they are available."""
+
+    def __init__(self, filename):
+        self.file = open(filename, 'w', encoding='utf-8')
+
+    def write(self, summary, szenario_names):
+        """
+        Writes the result of a trace (attached to its summary) with the names of its
+        szenarios. The result is removed from the summary, it is not needed anymore.
+        """
+        if summary.result is None:
+            return
+        result = summary.result
+        result['szenarios'] = szenario_names
+        summary.result = None
+        self.file.write(json.dumps(result, separators=(',', ':'), default=str) + '\n')
+        self.file.flush()
+
+    def close(self):
+        """Closes the file."""
+        self.file.close()
+
+
+def open_results():
+    """Return a writer for the results of the traces or None if no JSON output is configured."""
+    if OUTPUT_JSON not in config.OUTPUTS:
+        return None
+    return ResultWriter(os.path.join(config.REPORT_DIR, RESULTS_FILENAME))
+
+def create_szenario_json(szenarios):
+    """Creates a file with the summaries of the szenarios."""
+    result = [szenario.__dict__() for szenario in szenarios]
+    filename = os.path.join(config.REPORT_DIR, SZENARIOS_FILENAME)
+    with open(filename, 'w', encoding='utf-8') as file:
+        json.dump(result, file, indent=2, default=str)
@@ -2,6 +2,20 @@
 
 import re
 
+from trace_explorer.definitions import logs
+
+# placeholders for span fields in causes, e.g. {tags:http.url}
+FIELDS_REGEX = re.compile(r"{([^}]+)}")
+
+LOCATION_TAGS = 'tags'
+LOCATION_LOGS = 'logs'
+
+ACTION_CHILDREN = 'children'
+ACTION_PARENT = 'parent'
+ACTION_SELF = 'self'
+ACTION_NO_CHILDREN = 'no-children'
+
+
 class Rule:
     """Rule for usage on a span."""
     def __init__(self, name, category, conditions, actions):
@@ -10,14 +24,147 @@ class Rule:
         self.conditions = conditions
         self.actions = actions
 
-    def perform(self, span):
-        """Execute the rule."""
+    def matches(self, span):
+        """Check if all conditions of the rule match on the span."""
         for condition in self.conditions:
             if not condition.check(span):
-                return
+                return False
+        return True
+
+    def perform(self, span):
+        """Execute the rule."""
+        if not self.matches(span):
+            return
         for action in self.actions:
             action.execute(span)
 
+    def get_index_key(self):
+        """
+        Return the location and field of a condition which can only match if the
+        span contains this field. Tags are preferred, as they are cheaper to check.
+        Return None if the rule can match on any span.
+        """
+        required = [condition for condition in self.conditions if condition.requires_field()]
+        required.sort(key=lambda condition: condition.location != LOCATION_TAGS)
+        if required:
+            return (required[0].location, required[0].field)
+        return None
+
+
+class RuleSet:
+    """
+    A compiled set of rules. The rules are indexed by the fields they require,
+    so a span is only checked against rules which can match on it.
+    """
+    def __init__(self, rules):
+        self.rules = list(rules)
+        self.unindexed = [] # positions of rules which can match on any span
+        self.index = {} # (location, field) -> positions of rules requiring the field
+        for position, rule in enumerate(self.rules):
+            key = rule.get_index_key()
+            if key is None:
+                self.unindexed.append(position)
+            else:
+                self.index.setdefault(key, []).append(position)
+
+    def __iter__(self):
+        return iter(self.rules)
+
+    def __len__(self):
+        return len(self.rules)
+
+    def get_candidate_positions(self, span):
+        """Return the positions of the rules which can match on the span in order."""
+        positions = list(self.unindexed)
+        for (location, field), indexed in self.index.items():
+            if location == LOCATION_TAGS:
+                if field in span.tags:
+                    positions.extend(indexed)
+            elif any(field in log[logs.FIELDS] for log in span.logs):
+                positions.extend(indexed)
+        return sorted(positions)
+
+    def get_candidates(self, span):
+        """Return the rules which can match on the span in their original order."""
+        return [self.rules[position] for position in self.get_candidate_positions(span)]
+
+    def perform(self, span):
+        """Execute all rules which can match on the span."""
+        for rule in self.get_candidates(span):
+            rule.perform(span)
+
+    def apply(self, spans):
+        """
+        Execute all rules on all spans of a trace with the same result as performing
+        the rules on each span in the given order, but with a single traversal of the
+        span tree instead of walking the subtree of every matching span again.
+        Actions only write the cause and error of spans, which no condition reads.
+        So the result on a span is determined by the last action writing it, keyed by
+        (position of the matching span, position of the rule, position of the action).
+        """
+        order = {id(span): position for position, span in enumerate(spans)}
+        matched = {} # id(span) -> positions of the rules matching on the span
+        results = {} # id(span) -> [span, key, action, any error]
+
+        for position, span in enumerate(spans):
+            matched[id(span)] = [
+                rule_position for rule_position in self.get_candidate_positions(span)
+                if self.rules[rule_position].matches(span)
+            ]
+            for rule_position in matched[id(span)]:
+                for action_position, action in enumerate(self.rules[rule_position].actions):
+                    key = (position, rule_position, action_position)
+                    if action.type == ACTION_SELF and action.matches(span.parent):
+                        self.record(results, span, key, action)
+                    elif action.type == ACTION_NO_CHILDREN and not span.children:
+                        self.record(results, span, key, action)
+                    elif action.type == ACTION_PARENT and span.parent \
+                            and action.matches(span.parent):
+                        self.record(results, span.parent, key, action)
+
+        children_actions = [
+            (rule_position, action_position, action)
+            for rule_position, rule in enumerate(self.rules)
+            for action_position, action in enumerate(rule.actions)
+            if action.type == ACTION_CHILDREN
+        ]
+        if children_actions:
+            # latest matching ancestor per children action, passed down the tree
+            stack = [(span, [-1] * len(children_actions)) for span in spans if span.parent is None]
+            while stack:
+                span, ancestors = stack.pop()
+                for slot, (rule_position, action_position, action) in enumerate(children_actions):
+                    if ancestors[slot] >= 0 and action.matches(span):
+                        key = (ancestors[slot], rule_position, action_position)
+                        self.record(results, span, key, action)
+
+                inherited = ancestors
+                for slot, (rule_position, _, _) in enumerate(children_actions):
+                    if rule_position in matched[id(span)]:
+                        if inherited is ancestors:
+                            inherited = list(ancestors)
+                        inherited[slot] = max(inherited[slot], order[id(span)])
+                for child in span.children:
+                    stack.append((child, inherited))
+
+        for span, _, action, error in results.values():
+            span.cause = action.prepare_cause(span)
+            span.error = action.error
+            if error:
+                span.cause_timestamp = span.start_time + span.duration
+
+    @staticmethod
+    def record(results, span, key, action):
+        """Remember the action for the span, if it is executed after the previous one."""
+        result = results.get(id(span))
+        if result is None:
+            results[id(span)] = [span, key, action, action.error]
+            return
+        if key > result[1]:
+            result[1] = key
+            result[2] = action
+        result[3] = result[3] or action.error
+
 
 class Condition:
     """A condition to match on a span."""
@@ -25,23 +172,31 @@ class Condition:
         self.location = data["location"] # either tags or logs
         self.field = data["field"]
         self.match = data["match"] # regular expression
+        self.pattern = re.compile(self.match)
 
     def check(self, span):
         """Check if the condition matches on the span."""
         result = None
         field_value = ''
-        if self.location == 'tags':
+        if self.location == LOCATION_TAGS:
             field_value = span.tags.get(self.field, '')
-            result = re.match(self.match, str(field_value))
-        elif self.location == 'logs':
+            result = self.pattern.match(str(field_value))
+        elif self.location == LOCATION_LOGS:
             for log in span.logs:
-                field_value = log['fields'].get(self.field, '')
-                result = re.match(self.match, str(field_value))
+                field_value = log[logs.FIELDS].get(self.field, '')
+                result = self.pattern.match(str(field_value))
                 if result:
                     break
 
         return bool(result)
 
+    def requires_field(self):
+        """
+        Check if the condition can only match on spans containing the field.
+        Missing fields are checked as empty strings.
+        """
+        return self.location in (LOCATION_TAGS, LOCATION_LOGS) and not self.pattern.match('')
+
 
 class Action:
     """Defines an action to be performed on a span."""
@@ -52,29 +207,40 @@ class Action:
             self.match.append(Condition(raw_condition))
         self.cause = data["cause"]
         self.error = data.get("error", False)
+        # the cause template is parsed only once
+        self.cause_fields = [field.split(':') for field in FIELDS_REGEX.findall(self.cause)]
+        self.cause_format = FIELDS_REGEX.sub('{}', self.cause)
 
     def prepare_cause(self, span):
         """Return a formatted cause for the failure."""
-        fields_regex = r"{([^}]+)}"
         results = []
-        fields = re.findall(fields_regex, self.cause)
-        for field in fields:
-            f_type, f_field = field.split(':')
-            if f_type == 'tags':
+        for f_type, f_field in self.cause_fields:
+            if f_type == LOCATION_TAGS:
                 results.append(span.tags.get(f_field, ''))
-            elif f_type == 'logs':
-                results.append(span.logs.get(f_field, ''))
-        return re.sub(fields_regex, '{}', self.cause).format(*results)
+            elif f_type == LOCATION_LOGS:
+                # the first log containing the field is used
+                results.append(next(
+                    (log[logs.FIELDS][f_field] for log in span.logs if f_field in log[logs.FIELDS]),
+                    ''
+                ))
+        return self.cause_format.format(*results)
+
+    def matches(self, span):
+        """Check if all conditions of the action match on the span."""
+        for condition in self.match:
+            if not condition.check(span):
+                return False
+        return True
 
     def execute(self, span):
         """Perform an action depending on the type."""
-        if self.type == 'children':
+        if self.type == ACTION_CHILDREN:
             self.check_children(span)
-        elif self.type == 'parent':
+        elif self.type == ACTION_PARENT:
             self.check_parent(span)
-        elif self.type == 'self':
+        elif self.type == ACTION_SELF:
             self.check_self(span)
-        elif self.type == 'no-children':
+        elif self.type == ACTION_NO_CHILDREN:
             self.check_no_children(span)
 
     def check_no_children(self, span):
@@ -84,38 +250,25 @@ class Action:
             span.cause = self.prepare_cause(span)
 
     def check_children(self, span):
-        """Perform a condition check on the spans children."""
-        for child in span.children:
-            matched = True
-            for condition in self.match:
-                if not condition.check(child):
-                    matched = False
-                    break
-            if matched:
+        """Perform a condition check on the spans children and all of their descendants."""
+        stack = list(reversed(span.children))
+        while stack:
+            child = stack.pop()
+            if self.matches(child):
                 child.cause = self.prepare_cause(child)
                 self.set_error(child)
-            self.check_children(child)
+            stack.extend(reversed(child.children))
 
     def check_parent(self, span):
         """Perform a condition check on the spans parent."""
         if span.parent:
-            matched = True
-            for condition in self.match:
-                if not condition.check(span.parent):
-                    matched = False
-                    break
-            if matched:
+            if self.matches(span.parent):
                 span.parent.cause = self.prepare_cause(span.parent)
                 self.set_error(span.parent)
 
     def check_self(self, span):
         """Perform a condition check on the span itself."""
-        matched = True
-        for condition in self.match:
-            if not condition.check(span.parent):
-                matched = False
-                break
-        if matched:
+        if self.matches(span.parent):
             span.cause = self.prepare_cause(span)
             self.set_error(span)
 
@@ -6,7 +6,7 @@ import logging
 import json
 import os
 from trace_explorer.config import RULE_BASE_DIR
-from .models import Rule, Condition, Action
+from .models import Rule, RuleSet, Condition, Action
 
 logger = logging.getLogger(__name__)
 logger.setLevel(logging.DEBUG)
@@ -27,11 +27,11 @@ def parse(data):
     return rules
 
 def get_rules():
-    """Returns a list of all rules in the rule directory."""
+    """Returns a compiled set of all rules in the rule directory."""
     rules = []
     for filename in os.listdir(RULE_BASE_DIR):
         if filename.endswith('.json'):
             with open(os.path.join(RULE_BASE_DIR, filename), 'r', encoding='utf-8') as file:
                 rules.extend(parse(file.read()))
     logger.info('Found %r rules in the specified directory.', len(rules))
-    return rules
+    return RuleSet(rules)
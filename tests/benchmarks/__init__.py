@@ -0,0 +1,4 @@
+"""
+Benchmarks for the trace analysis. They are not collected by the test runner,
+run them directly, e.g. python -m tests.benchmarks.bench_parse_spans
+"""
@@ -0,0 +1,62 @@
+"""
+Benchmark for fetching and parsing a time range of 20k spans from a local fake Elasticsearch
+with a latency of 50ms per search request and pages of 500 spans.
+Compares the synchronous client, which requests one page after the other, with
+the concurrent requests for 16 sub-ranges of the AsyncElasticsearch-Storage-Backend.
+"""
+
+import logging
+import warnings
+
+from elasticsearch import Elasticsearch
+
+from trace_explorer import config
+from trace_explorer.analysis.utils import fetch_spans_in_range
+from trace_explorer.parsers import opentracing
+from trace_explorer.queries import async_elasticsearch_helper, elasticsearch_helper
+
+from ..fake_elasticsearch import FakeElasticsearch
+from .synthetic import BASE_TIME, make_raw_spans, measure
+
+SPAN_COUNT = 20000
+DELAY = 0.05 # seconds
+PAGE_SIZE = 500
+CONCURRENCIES = [1, 4, 8]
+
+
+def fetch(query):
+    """Fetches and parses all spans and returns the number of spans."""
+    result = {}
+    fetch_spans_in_range(query, opentracing, BASE_TIME, BASE_TIME + SPAN_COUNT * 1000, result)
+    return sum(len(spans) for spans in result.values())
+
+def main():
+    """Prints the duration of the time range for both Storage-Backends."""
+    logging.disable(logging.WARNING)
+    warnings.simplefilter('ignore', DeprecationWarning)
+    config.SCHEMA_VALIDATION = 'off'
+    spans = make_raw_spans(SPAN_COUNT)
+    for i, span in enumerate(spans):
+        span['startTime'] = BASE_TIME + i * 1000 # one span per millisecond
+    elasticsearch_helper.PAGE_SIZE = PAGE_SIZE
+
+    with FakeElasticsearch(spans, delay=DELAY) as server:
+        elasticsearch_helper.BASE_URL = server.url
+        elasticsearch_helper.es = Elasticsearch(server.url,
+                                                serializer=elasticsearch_helper.Serializer())
+        assert fetch(elasticsearch_helper) == SPAN_COUNT
+        results = [('synchronous', measure(lambda: fetch(elasticsearch_helper), repeat=1))]
+        for concurrency in CONCURRENCIES:
+            async_elasticsearch_helper.CONCURRENCY = concurrency
+            assert fetch(async_elasticsearch_helper) == SPAN_COUNT
+            duration = measure(lambda: fetch(async_elasticsearch_helper), repeat=1)
+            results.append((f'concurrency {concurrency}', duration))
+
+    print(f"{SPAN_COUNT} spans, {DELAY * 1000:.0f}ms per request, "
+          f"{async_elasticsearch_helper.RANGE_SHARDS} sub-ranges")
+    for name, duration in results:
+        print(f"{name + ':':18} {duration:6.3f}s")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,69 @@
+"""
+Benchmark for the clock skew adjustment of a trace with 50k spans, in which the spans
+of some services start before their parents. Compares adjusting one child at a time
+while the references are resolved with the adjustment of the whole tree.
+"""
+
+import logging
+import time
+
+from trace_explorer.analysis import clock_skew
+from trace_explorer.analysis.models import Span
+
+from .synthetic import make_span_data
+
+SPAN_COUNT = 50000
+
+# start of the spans relative to their parent, every third span starts before its parent
+OFFSETS = [10, 20, -3000]
+
+
+def legacy_adjust_clock_skew(parent, child):
+    """Adjustment as done before: one child at a time, while linking it to its parent."""
+    if parent.start_time < child.start_time:
+        return
+    shift = clock_skew.get_time_shift(
+        parent.start_time, parent.duration, child.start_time, child.duration
+    )
+    clock_skew.adjust_timestamps(child, shift)
+    clock_skew.logger.info(
+        'Timestamp adjusted in Trace %s: Service "%s" with Span ID "%s"',
+        child.trace_id, child.service, child.span_id
+    )
+
+def make_tree():
+    """Returns the spans of a tree in which every span has up to four children."""
+    spans = [Span('1', '0', make_span_data('0'))]
+    offsets = [0]
+    for i in range(1, SPAN_COUNT):
+        parent = (i - 1) // 4
+        offsets.append(offsets[parent] + OFFSETS[i % 3])
+        span = Span('1', str(i), make_span_data(str(i), str(parent),
+                                                start_offset=offsets[i], error=True))
+        spans[parent].add_child(span)
+        spans.append(span)
+    return spans
+
+def run(adjust):
+    """Adjusts the spans of a new tree and returns the duration in seconds."""
+    spans = make_tree()
+    start = time.perf_counter()
+    adjust(spans)
+    return time.perf_counter() - start
+
+def legacy(spans):
+    """Adjusts all spans in the order of their references."""
+    for span in reversed(spans[1:]):
+        legacy_adjust_clock_skew(span.parent, span)
+
+def main():
+    """Prints the duration of both variants."""
+    legacy_seconds = min(run(legacy) for _ in range(3))
+    seconds = min(run(lambda spans: clock_skew.adjust_clock_skew(spans[0])) for _ in range(3))
+    print(f"{SPAN_COUNT} spans")
+    print(f"per child (before): {legacy_seconds:6.3f}s")
+    print(f"whole tree:         {seconds:6.3f}s")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,48 @@
+"""
+Benchmark for computing the statistics (span, trace and error counts, durations) of a
+window of 200k spans, which have to be equal for both variants.
+Compares building Trace-objects with the columnar representation.
+"""
+
+import logging
+
+from trace_explorer import config
+from trace_explorer.analysis.columnar import SpanColumns
+from trace_explorer.analysis.models import Trace
+from trace_explorer.parsers import opentracing
+from trace_explorer.queries.stats import get_span_stats
+
+from .synthetic import make_raw_spans, measure
+
+SPAN_COUNT = 200000
+
+
+def build_traces(traces_raw):
+    """Returns the statistics computed with Trace-objects."""
+    spans = [span for trace_id, spans in traces_raw.items()
+             for span in Trace(trace_id, spans).spans]
+    return get_span_stats([span.trace_id for span in spans],
+                          [span.service['name'] for span in spans],
+                          [span.duration for span in spans],
+                          [span.error for span in spans])
+
+def build_columns(traces_raw):
+    """Returns the statistics computed with the columnar representation."""
+    columns = SpanColumns(traces_raw)
+    return columns.get_stats(0, 1 << 62)
+
+def main():
+    """Prints the duration of both variants."""
+    logging.disable(logging.INFO)
+    config.SCHEMA_VALIDATION = 'off'
+    traces_raw = opentracing.parse_spans(make_raw_spans(SPAN_COUNT))
+    assert build_traces(traces_raw) == build_columns(traces_raw)
+    objects = measure(lambda: build_traces(traces_raw))
+    columnar = measure(lambda: build_columns(traces_raw))
+    print(f"{SPAN_COUNT} spans in {len(traces_raw)} traces")
+    print(f"Trace-objects: {objects:6.3f}s ({SPAN_COUNT / objects:>10,.0f} spans/s)")
+    print(f"columnar:      {columnar:6.3f}s ({SPAN_COUNT / columnar:>10,.0f} spans/s)")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,68 @@
+"""
+Benchmark for the analysis of a healthy time range of 100k spans in 1000 traces,
+of which 2% contain an error, from the file Storage-Backend.
+Compares fetching all spans with fetching only the traces with errors (RCA_ERRORS_ONLY).
+"""
+
+import json
+import os
+import tempfile
+
+from trace_explorer import config, queries
+from trace_explorer.analysis.utils import analyze_szenarios
+from trace_explorer.queries import file_helper
+from trace_explorer.rules.parser import get_rules
+
+from .synthetic import BASE_TIME, make_raw_spans, measure
+
+SPAN_COUNT = 100000
+ERROR_RATE = 0.0002 # one erroneous span per 50 traces
+
+
+def count_transferred(func):
+    """Returns the number of spans and bytes yielded by a query function of the backend."""
+    counts = [0, 0]
+    def wrapper(*args):
+        for page in func(*args):
+            counts[0] += len(page)
+            counts[1] += len(json.dumps(page))
+            yield page
+    return wrapper, counts
+
+def run(errors_only, rules):
+    """Analyzes the time range and returns the szenario."""
+    config.ERRORS_ONLY = errors_only
+    return analyze_szenarios([(BASE_TIME, BASE_TIME + 100, 'healthy', '[]', '[]')], rules)[0]
+
+def main():
+    """Prints the transferred data and the duration of both modes."""
+    config.SCHEMA_VALIDATION = 'off'
+    config.CACHE_ENABLED = False
+    queries.DB_ENGINE = 'File'
+    rules = get_rules()
+    with tempfile.TemporaryDirectory() as directory:
+        config.REPORT_DIR = directory
+        file_helper.PATH = os.path.join(directory, 'spans.json')
+        with open(file_helper.PATH, 'w', encoding='utf-8') as file:
+            json.dump(make_raw_spans(SPAN_COUNT, error_rate=ERROR_RATE), file)
+        file_helper.get_index()
+
+        originals = (file_helper.iter_spans_in_range, file_helper.iter_spans_by_trace_ids)
+        results = []
+        for errors_only in [False, True]:
+            file_helper.iter_spans_in_range, in_range = count_transferred(originals[0])
+            file_helper.iter_spans_by_trace_ids, by_trace = count_transferred(originals[1])
+            szenario = run(errors_only, rules)
+            file_helper.iter_spans_in_range, file_helper.iter_spans_by_trace_ids = originals
+            transferred = [a + b for a, b in zip(in_range, by_trace)]
+            duration = measure(lambda errors_only=errors_only: run(errors_only, rules), repeat=1)
+            results.append((errors_only, szenario.__dict__(), transferred, duration))
+
+    for errors_only, summary, (spans, size), duration in results:
+        mode = 'errors only' if errors_only else 'all spans'
+        print(f"{mode:<12} {summary['tracesCount']:5} traces, {summary['errorsCount']:3} errors,"
+              f" {spans:7} spans ({size / 1e6:6.1f} MB) transferred, {duration:6.3f}s")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,50 @@
+"""
+Benchmark for range queries of the file Storage-Backend on a JSON array of 200k spans.
+Compares the indexed queries with loading and filtering the whole file for every query.
+"""
+
+import json
+import os
+import tempfile
+
+from trace_explorer.queries import file_helper
+
+from .synthetic import BASE_TIME, make_raw_spans, measure
+
+SPAN_COUNT = 200000
+QUERY_COUNT = 10
+
+
+def legacy_get_spans_in_range(path, start, end):
+    """Reads the whole file and filters the spans."""
+    with open(path, 'r', encoding='utf-8') as file:
+        spans = json.load(file)
+    return [span for span in spans if start <= span['startTime'] <= end]
+
+def get_ranges():
+    """Returns the time ranges of the queries, spread over the file."""
+    # the synthetic spans start at BASE_TIME + their position within a trace of 100 spans
+    return [(BASE_TIME + i * 10, BASE_TIME + i * 10 + 9) for i in range(QUERY_COUNT)]
+
+def main():
+    """Prints the duration of the queries of both variants."""
+    with tempfile.TemporaryDirectory() as directory:
+        path = os.path.join(directory, 'spans.json')
+        with open(path, 'w', encoding='utf-8') as file:
+            json.dump(make_raw_spans(SPAN_COUNT), file)
+        file_helper.PATH = path
+
+        indexing = measure(file_helper.get_index, repeat=1)
+        indexed = measure(lambda: [file_helper.get_spans_in_range(*r) for r in get_ranges()])
+        legacy = measure(lambda: [legacy_get_spans_in_range(path, *r) for r in get_ranges()],
+                         repeat=1)
+        count = len(file_helper.get_spans_in_range(*get_ranges()[0]))
+
+    print(f"{SPAN_COUNT} spans, {QUERY_COUNT} queries with {count} spans each")
+    print(f"building the index:        {indexing:6.3f}s")
+    print(f"indexed queries:           {indexed:6.3f}s")
+    print(f"loading the whole file:    {legacy:6.3f}s")
+
+
+if __name__ == '__main__':
+    main()
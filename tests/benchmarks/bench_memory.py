@@ -0,0 +1,105 @@
+"""
+Benchmark for the memory held by the spans of a large analysis window (500k spans).
+Compares span objects with an instance dict, per-span copies of all strings and a
+service dict per span with the slotted spans, interned strings and shared service dicts.
+"""
+
+import json
+import sys
+
+from trace_explorer import config
+from trace_explorer.analysis.models import Span
+from trace_explorer.parsers import opentracing
+
+from .synthetic import make_raw_spans
+
+WINDOW_SIZE = 500000
+
+# the raw spans are generated and parsed in chunks to keep only the parsed spans in memory
+CHUNK_SIZE = 10000
+
+# Span as before: without __slots__, every instance has its own dict
+# (the __dict__ method is left out to be able to measure the instance dict)
+LegacySpan = type('LegacySpan', (), {
+    key: value for key, value in vars(Span).items()
+    if key not in Span.__slots__ + ('__slots__', '__dict__')
+})
+
+
+def legacy_get_key_value_from_tags(tags):
+    """Transformation as done before: keys are not interned."""
+    return dict((tag.get('key'), tag.get('value')) for tag in tags)
+
+def legacy_extract_span_data(data):
+    """Extraction as done before: a new service dict for every span."""
+    result = dict((k, data[k]) for k in opentracing.RELEVANT_KEYS)
+    result['service'] = legacy_get_key_value_from_tags(data.get('process').get('tags'))
+    result['service']['name'] = data.get('process').get('serviceName')
+    result['tags'] = legacy_get_key_value_from_tags(data.get('tags'))
+    error = result['tags'].get('error', False)
+    if isinstance(error, str):
+        error = json.loads(error.lower())
+    result['tags']['error'] = error
+    result['logs'] = [{
+        'timestamp': log.get('timestamp'),
+        'fields': legacy_get_key_value_from_tags(log.get('fields'))
+    } for log in data.get('logs')]
+    return result
+
+def legacy_build(raw_spans):
+    """Returns the spans of a chunk as built before."""
+    return [LegacySpan(span['traceID'], span['spanID'], legacy_extract_span_data(span))
+            for span in raw_spans]
+
+def build(raw_spans):
+    """Returns the spans of a chunk as built now."""
+    result = []
+    for trace_id, spans in opentracing.parse_spans(raw_spans).items():
+        for span_id, span_data in spans.items():
+            result.append(Span(trace_id, span_id, span_data))
+    return result
+
+def get_size(spans):
+    """Returns the size of all objects reachable from the spans, counting shared objects once."""
+    seen = set()
+    size = 0
+    stack = [spans]
+    while stack:
+        obj = stack.pop()
+        if id(obj) in seen:
+            continue
+        seen.add(id(obj))
+        size += sys.getsizeof(obj)
+        if isinstance(obj, dict):
+            stack.extend(obj.keys())
+            stack.extend(obj.values())
+        elif isinstance(obj, (list, tuple)):
+            stack.extend(obj)
+        elif isinstance(obj, Span):
+            stack.extend(getattr(obj, name) for name in obj.__slots__)
+        elif isinstance(obj, LegacySpan):
+            stack.append(vars(obj))
+    return size
+
+def run(build_chunk):
+    """Builds all spans of the window and returns the memory held by them in bytes."""
+    spans = []
+    for offset in range(0, WINDOW_SIZE, CHUNK_SIZE):
+        # a JSON round trip gives every span its own strings, like a response of the storage
+        chunk = json.loads(json.dumps(make_raw_spans(CHUNK_SIZE)))
+        for span in chunk:
+            span['traceID'] = f"{offset}.{span['traceID']}"
+        spans.extend(build_chunk(chunk))
+    return get_size(spans)
+
+def main():
+    """Prints the memory per span of both variants."""
+    # the validation does not change the parsed spans
+    config.SCHEMA_VALIDATION = 'off'
+    for name, build_chunk in [('before', legacy_build), ('now', build)]:
+        size = run(build_chunk)
+        print(f"{name:<7} {size / 2**20:8.1f} MiB ({size / WINDOW_SIZE:6.0f} bytes/span)")
+
+
+if __name__ == '__main__':
+    main()
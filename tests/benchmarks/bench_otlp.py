@@ -0,0 +1,97 @@
+"""
+Benchmark for parsing 100k spans in the OTLP encodings (JSON and protobuf)
+compared with parsing the same spans in the Jaeger format with the OpenTelemetry parser.
+"""
+
+import copy
+import gc
+import json
+import time
+
+from trace_explorer import config
+from trace_explorer.parsers import opentelemetry, otlp
+
+from .synthetic import make_raw_spans
+
+SPAN_COUNT = 100000
+
+
+def to_attributes(tags):
+    """Transforms Jaeger tags into OTLP/JSON attributes."""
+    result = []
+    for tag in tags:
+        key = 'boolValue' if isinstance(tag['value'], bool) else 'stringValue'
+        result.append({"key": tag['key'], "value": {key: tag['value']}})
+    return result
+
+def to_id(value, length):
+    """Transforms the IDs of the synthetic spans into hex IDs."""
+    return value.encode().hex().rjust(length, '0')[-length:]
+
+def to_otlp(raw_spans):
+    """Transforms Jaeger spans into an OTLP/JSON request with one resource per service."""
+    resources = {}
+    for span in raw_spans:
+        resource = resources.get(span['process']['serviceName'])
+        if resource is None:
+            attributes = to_attributes(span['process']['tags'])
+            attributes.append({"key": "service.name",
+                               "value": {"stringValue": span['process']['serviceName']}})
+            resource = resources[span['process']['serviceName']] = {
+                "resource": {"attributes": attributes},
+                "scopeSpans": [{"scope": {"name": "synthetic"}, "spans": []}]
+            }
+        parents = [ref['spanID'] for ref in span['references']]
+        resource["scopeSpans"][0]["spans"].append({
+            "traceId": to_id(span['traceID'], 32),
+            "spanId": to_id(span['spanID'], 16),
+            "parentSpanId": to_id(parents[0], 16) if parents else "",
+            "name": span['operationName'],
+            "kind": 3,
+            "startTimeUnixNano": str(span['startTime'] * 1000),
+            "endTimeUnixNano": str((span['startTime'] + span['duration']) * 1000),
+            "attributes": to_attributes(span['tags']),
+            "events": [{
+                "timeUnixNano": str(log['timestamp'] * 1000),
+                "name": "exception",
+                "attributes": to_attributes(log['fields'])
+            } for log in span['logs']]
+        })
+    return {"resourceSpans": list(resources.values())}
+
+def measure_once(func, data):
+    """Returns the duration of parsing a copy of the data, the parsers modify their input."""
+    data = copy.deepcopy(data)
+    # the garbage collector should not scan the inputs of all parsers while measuring
+    gc.collect()
+    gc.freeze()
+    start = time.perf_counter()
+    func(data)
+    seconds = time.perf_counter() - start
+    gc.unfreeze()
+    return seconds
+
+def main():
+    """Prints the throughput of all parsers."""
+    config.SCHEMA_VALIDATION = 'off'
+    raw_spans = make_raw_spans(SPAN_COUNT)
+    request = to_otlp(raw_spans)
+    results = [
+        ('jaeger (opentelemetry)', min(measure_once(opentelemetry.parse_spans, raw_spans)
+                                       for _ in range(3))),
+        ('otlp json', min(measure_once(otlp.parse_request, request) for _ in range(3)))
+    ]
+    if otlp.TracesData is not None:
+        # pylint: disable=import-outside-toplevel
+        from google.protobuf.json_format import Parse
+        from .. import test_otlp
+        message = Parse(json.dumps(test_otlp.to_protobuf_json(request)), otlp.TracesData())
+        data = message.SerializeToString()
+        results.append(('otlp protobuf', min(measure_once(otlp.parse_protobuf, data)
+                                             for _ in range(3))))
+    for name, seconds in results:
+        print(f"{name:<24} {seconds:6.3f}s ({SPAN_COUNT / seconds:>10,.0f} spans/s)")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,52 @@
+"""
+Benchmark for parse_spans on a synthetic input of 100k spans.
+Compares the previous per-span schema validation with the compiled validator
+in all validation modes.
+"""
+
+import json
+import time
+
+from jsonschema import validate as validate_json
+
+from trace_explorer import config
+from trace_explorer.parsers import opentracing, opentelemetry
+
+from .synthetic import make_raw_spans
+
+SPAN_COUNT = 100000
+
+# the previous validation is too slow to run on the whole input
+LEGACY_SPAN_COUNT = 10000
+
+
+def legacy_validate(span_data):
+    """Validation as done before: reading the schema for every single span."""
+    with open(config.JSON_SCHEMA_PATH, 'r', encoding="utf-8") as file:
+        schema = file.read()
+    validate_json(instance=span_data, schema=json.loads(schema))
+
+def run(parser, mode, legacy=False):
+    """Parses the synthetic spans and returns the throughput in spans per second."""
+    count = LEGACY_SPAN_COUNT if legacy else SPAN_COUNT
+    spans = make_raw_spans(count)
+    config.SCHEMA_VALIDATION = 'off' if legacy else mode
+    start = time.perf_counter()
+    result = parser.parse_spans(spans)
+    if legacy:
+        for trace in result.values():
+            for span_data in trace.values():
+                legacy_validate(span_data)
+    return count / (time.perf_counter() - start)
+
+def main():
+    """Prints the throughput of every parser and validation mode."""
+    for parser in [opentracing, opentelemetry]:
+        name = parser.__name__.rsplit('.', maxsplit=1)[-1]
+        print(f"{name:<15} {'per-span (before)':<20} {run(parser, 'full', legacy=True):>12,.0f} spans/s")
+        for mode in ['full', 'sampled', 'off']:
+            print(f"{name:<15} {mode:<20} {run(parser, mode):>12,.0f} spans/s")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,106 @@
+"""
+Micro-benchmarks for the OpenTracing and the OpenTelemetry parser on 50k spans:
+parsing pages of spans, the steps of a single span and decoding JSON pages.
+The previous parsers, which rebuilt the span dict from the keys and mutated their
+input, are measured for comparison.
+"""
+
+import copy
+import gc
+import json
+import sys
+import timeit
+
+from trace_explorer import config
+from trace_explorer.parsers import common, opentracing, opentelemetry
+
+from .synthetic import make_raw_spans
+
+SPAN_COUNT = 50000
+PAGE_SIZE = 1000
+
+
+def legacy_get_key_value_from_tags(tags):
+    """Transformation as done before."""
+    return dict((sys.intern(tag.get('key')), tag.get('value')) for tag in tags)
+
+def legacy_extract_span_data(data, get_key_value_from_tags):
+    """Extraction as done before."""
+    result = dict((k, data[k]) for k in opentracing.RELEVANT_KEYS)
+    result['operationName'] = sys.intern(result['operationName'])
+    result['service'] = common.get_service(data.get('process'), get_key_value_from_tags)
+    result['tags'] = get_key_value_from_tags(data.get('tags'))
+    error = result['tags'].get('error', False)
+    if isinstance(error, str):
+        error = json.loads(error.lower())
+    result['tags']['error'] = error
+    result['logs'] = [{
+        'timestamp': log.get('timestamp'),
+        'fields': get_key_value_from_tags(log.get('fields'))
+    } for log in data.get('logs')]
+    return result
+
+def legacy_parse_spans(spans, get_key_value_from_tags):
+    """Parsing as done before: popping the SpanID from the input."""
+    result = {}
+    for span in spans:
+        if not span.get('traceID') in result:
+            result[span.get('traceID')] = {}
+        span_id = span.pop('spanID')
+        span_data = legacy_extract_span_data(span, get_key_value_from_tags)
+        result[span.get('traceID')][span_id] = span_data
+    return result
+
+def per_span(func, count=SPAN_COUNT, repeat=3):
+    """Returns the best duration of a function in microseconds per span."""
+    # the input would be traversed by every collection
+    gc.collect()
+    gc.freeze()
+    try:
+        return min(timeit.repeat(func, number=1, repeat=repeat)) / count * 1e6
+    finally:
+        gc.unfreeze()
+
+def main():
+    """Prints the duration per span of every benchmark."""
+    config.SCHEMA_VALIDATION = 'off'
+    spans = make_raw_spans(SPAN_COUNT)
+    pages = [json.dumps(spans[i:i + PAGE_SIZE]) for i in range(0, SPAN_COUNT, PAGE_SIZE)]
+    span = spans[1]
+
+    results = []
+    for parser in [opentracing, opentelemetry]:
+        name = parser.__name__.rsplit('.', maxsplit=1)[-1]
+        # the previous parser needs a copy of the input per run, it removes the SpanIDs
+        copies = [copy.deepcopy(spans) for _ in range(3)]
+        results += [
+            (name, 'parse_spans (before)', per_span(
+                lambda parser=parser, copies=copies: legacy_parse_spans(
+                    copies.pop(), parser.get_key_value_from_tags
+                )
+            )),
+            (name, 'parse_spans', per_span(lambda parser=parser: parser.parse_spans(spans))),
+            (name, 'extract_span_data (before)', per_span(
+                lambda parser=parser: legacy_extract_span_data(
+                    span, parser.get_key_value_from_tags
+                ), count=1, repeat=20000
+            )),
+            (name, 'extract_span_data', per_span(
+                lambda parser=parser: parser.extract_span_data(span), count=1, repeat=20000
+            )),
+            (name, 'get_key_value_from_tags', per_span(
+                lambda parser=parser: parser.get_key_value_from_tags(span['tags']),
+                count=1, repeat=20000
+            ))
+        ]
+    results += [
+        ('json', 'json.loads', per_span(lambda: [json.loads(page) for page in pages])),
+        ('json', f'loads ({common.JSON_DECODER})',
+         per_span(lambda: [common.loads(page) for page in pages]))
+    ]
+    for name, benchmark, microseconds in results:
+        print(f"{name:<15} {benchmark:<28} {microseconds:8.2f} us/span")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,49 @@
+"""
+Benchmark for the full analysis of a single trace (building the trace, rules,
+root cause analysis and report) on a 10k-deep chain and a 100k-wide trace.
+"""
+
+import logging
+import os
+import tempfile
+
+os.environ.setdefault('RCA_REPORT_DIR', tempfile.mkdtemp())
+
+# pylint: disable=wrong-import-position
+from trace_explorer.analysis.utils import analyze_trace
+from trace_explorer.reports import OUTPUT_HTML
+from trace_explorer.rules.parser import get_rules
+
+from .synthetic import make_span_data, measure
+
+ERROR_EVERY = 50
+
+
+def make_deep_trace(depth):
+    """Returns a chain of spans in which every span is the child of the previous one."""
+    spans = {'0': make_span_data('0')}
+    for i in range(1, depth):
+        spans[str(i)] = make_span_data(str(i), str(i - 1), start_offset=i,
+                                       error=i % ERROR_EVERY == 0)
+    return spans
+
+def make_wide_trace(width):
+    """Returns a root span with all other spans as its children."""
+    spans = {'0': make_span_data('0')}
+    for i in range(1, width):
+        spans[str(i)] = make_span_data(str(i), '0', start_offset=i,
+                                       error=i % ERROR_EVERY == 0)
+    return spans
+
+def main():
+    """Prints the duration of the analysis of both traces."""
+    logging.disable(logging.INFO)
+    rules = get_rules()
+    for name, spans in [('10k deep', make_deep_trace(10000)),
+                        ('100k wide', make_wide_trace(100000))]:
+        seconds = measure(lambda spans=spans: analyze_trace('1', spans, rules, [OUTPUT_HTML]), repeat=1)
+        print(f"{name:<10} {seconds:8.3f}s ({len(spans) / seconds:>10,.0f} spans/s)")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,79 @@
+"""
+Benchmark for the HTML reports of 100 erroneous traces with 1000 spans each.
+Compares the previous rendering into strings, with a template lookup and the subtree
+of every span per report, with the streamed rendering and with a second run
+in which all reports are unchanged.
+"""
+
+import logging
+import os
+import tempfile
+
+from jinja2 import Environment, FileSystemLoader
+
+from trace_explorer import config
+from trace_explorer.analysis.models import Trace
+from trace_explorer.analysis.rca import get_root_cause
+from trace_explorer.reports import html
+from trace_explorer.rules.parser import get_rules
+
+from .bench_tree import legacy_html_graph
+from .synthetic import make_span_data, measure
+
+TRACE_COUNT = 100
+SPAN_COUNT = 1000
+ERROR_EVERY = 50
+
+legacy_env = Environment(loader=FileSystemLoader(html.templates_dir))
+
+
+def legacy_create_trace_html(traces):
+    """Rendering as done before."""
+    for trace in traces:
+        if trace.error_count == 0:
+            continue
+        filename = os.path.join(config.REPORT_DIR, trace.filename)
+        spans = sorted(trace.spans, key=lambda span: span.rating, reverse=True)
+        spans = [span.__dict__() for span in spans if span.cause]
+        graph = legacy_html_graph(trace.root_span)
+        strands = [[span.cause for span in strand] for strand in trace.get_error_strands()]
+        template = legacy_env.get_template('spans.html')
+        output = template.render(spans=spans, trace=trace.__dict__(), tree=graph, strands=strands)
+        with open(filename, 'w', encoding='utf-8') as file:
+            file.write(output)
+
+def make_traces(rules):
+    """Returns analyzed traces in which every span is a child of the previous one."""
+    traces = []
+    for trace_id in range(TRACE_COUNT):
+        spans = {'0': make_span_data('0')}
+        for i in range(1, SPAN_COUNT):
+            spans[str(i)] = make_span_data(str(i), str(i - 1), start_offset=i,
+                                           error=i % ERROR_EVERY == 0)
+        trace = Trace(str(trace_id), spans)
+        rules.apply(trace.spans)
+        trace.set_error_count()
+        get_root_cause(trace.root_span)
+        traces.append(trace)
+    return traces
+
+def main():
+    """Prints the duration of the rendering of all reports."""
+    logging.disable(logging.INFO)
+    traces = make_traces(get_rules())
+    with tempfile.TemporaryDirectory() as directory:
+        config.REPORT_DIR = directory
+        legacy = measure(lambda: legacy_create_trace_html(traces), repeat=1)
+        for trace in traces:
+            os.remove(os.path.join(directory, trace.filename))
+        streamed = measure(lambda: html.create_trace_html(traces), repeat=1)
+        unchanged = measure(lambda: html.create_trace_html(traces), repeat=1)
+
+    print(f"{TRACE_COUNT} reports of {SPAN_COUNT} spans")
+    print(f"rendered into strings:     {legacy:6.3f}s")
+    print(f"streamed:                  {streamed:6.3f}s")
+    print(f"unchanged (skipped):       {unchanged:6.3f}s")
+
+
+if __name__ == '__main__':
+    main()
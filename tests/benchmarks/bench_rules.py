@@ -0,0 +1,62 @@
+"""
+Benchmark for applying the bundled rules (celery.json, connection.json and http.json)
+to the spans of a large synthetic trace. Compares the compiled and indexed rule set
+with checking every rule and its raw patterns on every span.
+"""
+
+import logging
+import re
+
+from trace_explorer.analysis.models import Span
+from trace_explorer.parsers import opentracing
+from trace_explorer.rules.parser import get_rules
+
+from .synthetic import make_raw_spans, measure
+
+SPAN_COUNT = 200000
+
+
+def legacy_check(condition, span):
+    """Condition check as done before: matching the raw pattern string."""
+    if condition.location == 'tags':
+        return bool(re.match(condition.match, str(span.tags.get(condition.field, ''))))
+    for log in span.logs:
+        if re.match(condition.match, str(log['fields'].get(condition.field, ''))):
+            return True
+    return False
+
+def legacy_perform(rules, spans):
+    """Checks every rule on every span."""
+    for span in spans:
+        for rule in rules:
+            if all(legacy_check(condition, span) for condition in rule.conditions):
+                for action in rule.actions:
+                    action.execute(span)
+
+def compiled_perform(rules, spans):
+    """Checks the candidate rules of the compiled rule set on every span."""
+    for span in spans:
+        rules.perform(span)
+
+def make_spans():
+    """Returns span objects without relations, the actions used here do not need them."""
+    result = []
+    for trace_id, spans in opentracing.parse_spans(make_raw_spans(SPAN_COUNT)).items():
+        for span_id, span_data in spans.items():
+            result.append(Span(trace_id, span_id, span_data))
+    return result
+
+def main():
+    """Prints the throughput of both variants."""
+    logging.disable(logging.INFO)
+    rules = get_rules()
+    spans = make_spans()
+    legacy = measure(lambda: legacy_perform(rules, spans))
+    compiled = measure(lambda: compiled_perform(rules, spans))
+    print(f"{len(rules)} rules on {SPAN_COUNT} spans")
+    print(f"every rule (before): {legacy:6.3f}s ({SPAN_COUNT / legacy:>10,.0f} spans/s)")
+    print(f"compiled rule set:   {compiled:6.3f}s ({SPAN_COUNT / compiled:>10,.0f} spans/s)")
+
+
+if __name__ == '__main__':
+    main()
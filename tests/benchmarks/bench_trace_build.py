@@ -0,0 +1,53 @@
+"""
+Benchmark for building a Trace (span initialization and reference resolution)
+for traces of 1k, 10k and 100k spans. The previous linear scan per reference
+is measured for comparison on the smaller traces.
+"""
+
+import logging
+
+from trace_explorer.analysis.models import Trace
+from trace_explorer.definitions import span as span_def
+
+from .synthetic import make_span_data, measure
+
+SIZES = [1000, 10000, 100000]
+
+# the linear scan is quadratic, so it is skipped for larger traces
+LEGACY_MAX_SIZE = 10000
+
+
+class LegacyTrace(Trace):
+    """Trace which resolves references with a linear scan over all spans."""
+
+    def resolve_reference(self, span, reference):
+        ref_id = reference.get(span_def.SPAN_ID)
+        parent = list(filter(lambda span: span.span_id == ref_id, self.spans))
+        if reference.get(span_def.REF_TYPE_KEY) == span_def.REF_TYPE_CHILD_OF:
+            parent[0].add_child(span)
+        else:
+            parent[0].add_follower(span)
+
+
+def make_spans(size):
+    """Returns a balanced tree of spans in which every span has up to four children."""
+    spans = {'0': make_span_data('0')}
+    for i in range(1, size):
+        spans[str(i)] = make_span_data(str(i), str((i - 1) // 4), start_offset=i)
+    return spans
+
+def main():
+    """Prints the build time per trace size."""
+    logging.disable(logging.INFO)
+    for size in SIZES:
+        spans = make_spans(size)
+        seconds = measure(lambda: Trace('1', spans))
+        line = f"{size:>7} spans: {seconds:8.3f}s ({seconds / size * 1e6:6.1f} us/span)"
+        if size <= LEGACY_MAX_SIZE:
+            legacy = measure(lambda: LegacyTrace('1', spans), repeat=1)
+            line += f" | linear scan: {legacy:8.3f}s ({legacy / size * 1e6:8.1f} us/span)"
+        print(line)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,74 @@
+"""
+Benchmark for the span tree of the HTML report of a trace with 20k spans.
+Compares the nested HTML lists, which were embedded before, with the compact
+JSON encoding which is rendered by the browser.
+"""
+
+import logging
+import random
+
+from trace_explorer.analysis.models import Trace
+from trace_explorer.reports import html
+
+from .synthetic import make_span_data, measure
+
+SPAN_COUNT = 20000
+ERROR_EVERY = 50
+
+
+def legacy_walk_tree(span):
+    """Creation of the nested lists as done before."""
+    result = []
+    stack = [span]
+    while stack:
+        item = stack.pop()
+        if isinstance(item, str):
+            result.append(item)
+            continue
+        if item.children:
+            parts = ['<ul>\n']
+            for child in sorted(item.children, key=lambda child: child.start_time):
+                if child.error:
+                    parts.append(
+                        f'<li> <span style="color:red">{child.operation_name}: {child.cause}</span>\n')
+                else:
+                    parts.append(f'<li> <span>{child.operation_name}</span>\n')
+                parts.append(child)
+                parts.append('</li>\n')
+            parts.append('</ul>\n')
+            stack.extend(reversed(parts))
+    return result
+
+def legacy_html_graph(root_span):
+    """Graph representation as done before."""
+    result = ['<ul class="tree">\n']
+    result.append(f'<li> <span>{root_span.operation_name}</span>\n')
+    result.extend(legacy_walk_tree(root_span))
+    result.append('</li>\n</ul>\n')
+    return ''.join(result)
+
+def make_trace():
+    """Returns a trace in which every span is the child of a random previous span."""
+    rng = random.Random(1)
+    spans = {'0': make_span_data('0')}
+    for i in range(1, SPAN_COUNT):
+        spans[str(i)] = make_span_data(str(i), str(rng.randrange(i)), start_offset=i,
+                                       error=i % ERROR_EVERY == 0)
+    return Trace('1', spans)
+
+def main():
+    """Prints the duration and the size of both encodings of the tree."""
+    logging.disable(logging.INFO)
+    trace = make_trace()
+    legacy = measure(lambda: legacy_html_graph(trace.root_span))
+    compact = measure(lambda: html.get_tree_data(trace.root_span))
+    legacy_size = len(legacy_html_graph(trace.root_span).encode('utf-8'))
+    compact_size = len(html.get_tree_data(trace.root_span).encode('utf-8'))
+
+    print(f"{SPAN_COUNT} spans")
+    print(f"nested HTML lists: {legacy:6.3f}s {legacy_size / 1e6:6.2f} MB")
+    print(f"compact JSON:      {compact:6.3f}s {compact_size / 1e6:6.2f} MB")
+
+
+if __name__ == '__main__':
+    main()
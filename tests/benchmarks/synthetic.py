@@ -0,0 +1,100 @@
+"""
+This module generates synthetic spans in the format of the Jaeger ES-Storage-Backend.
+"""
+
+import time
+import timeit
+
+BASE_TIME = 1638815067374252 # microseconds
+
+SERVICES = ['api', 'frontend', 'worker', 'db', 'auth', 'cache', 'mail', 'search']
+
+
+def make_tag(key, value):
+    """Returns a tag in the key-value-list representation of Jaeger."""
+    value_type = 'bool' if isinstance(value, bool) else 'string'
+    return {"key": key, "type": value_type, "value": value}
+
+def make_raw_span(trace_id, span_id, parent_id=None, start_offset=0, error=False, service=0):
+    """Returns a single raw span. Every erroneous span gets an error log."""
+    references = []
+    if parent_id is not None:
+        references.append({"refType": "CHILD_OF", "traceID": trace_id, "spanID": parent_id})
+    service_name = SERVICES[service % len(SERVICES)]
+    logs = []
+    if error:
+        logs.append({
+            "timestamp": BASE_TIME + start_offset + 1,
+            "fields": [
+                make_tag("event", "error"),
+                make_tag("message", "Connection refused"),
+                make_tag("error.object", "ConnectionError")
+            ]
+        })
+    return {
+        "traceID": trace_id,
+        "spanID": span_id,
+        "flags": 1,
+        "operationName": f"GET /{service_name}",
+        "references": references,
+        "startTime": BASE_TIME + start_offset,
+        "startTimeMillis": (BASE_TIME + start_offset) // 1000,
+        "duration": 1000,
+        "tags": [
+            make_tag("span.kind", "client"),
+            make_tag("component", "requests"),
+            make_tag("http.url", f"http://{service_name}/"),
+            make_tag("peer.location", "internal"),
+            make_tag("error", str(error).lower())
+        ],
+        "logs": logs,
+        "process": {
+            "serviceName": service_name,
+            "tags": [
+                make_tag("jaeger.version", "Python-4.8.0"),
+                make_tag("hostname", service_name)
+            ]
+        }
+    }
+
+def make_raw_spans(count, spans_per_trace=100, error_rate=0.05):
+    """
+    Returns a list of raw spans spread over traces of the given size.
+    Every span is a child of the span which was created before it in the same trace.
+    """
+    result = []
+    error_every = int(1 / error_rate) if error_rate else 0
+    for i in range(count):
+        trace_id = str(i // spans_per_trace)
+        position = i % spans_per_trace
+        parent_id = f"{trace_id}.{position - 1}" if position else None
+        error = bool(error_every) and i % error_every == 0
+        result.append(
+            make_raw_span(trace_id, f"{trace_id}.{position}", parent_id, position, error, i)
+        )
+    return result
+
+def make_span_data(span_id, parent_id=None, ref_type="CHILD_OF", start_offset=0, error=False):
+    """Returns a single span in the parsed (internal) representation."""
+    references = []
+    if parent_id is not None:
+        references.append({"refType": ref_type, "traceID": "1", "spanID": parent_id})
+    logs = []
+    if error:
+        logs.append({
+            "timestamp": BASE_TIME + start_offset + 1,
+            "fields": {"event": "error", "message": "Connection refused"}
+        })
+    return {
+        "operationName": "GET /api",
+        "references": references,
+        "startTime": BASE_TIME + start_offset,
+        "duration": 1000,
+        "service": {"name": "api", "hostname": "api"},
+        "tags": {"span.kind": "client", "peer.location": "internal", "error": error},
+        "logs": logs
+    }
+
+def measure(func, repeat=3):
+    """Returns the best wall clock time of several executions in seconds."""
+    return min(timeit.repeat(func, number=1, repeat=repeat, timer=time.perf_counter))
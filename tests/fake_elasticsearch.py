@@ -0,0 +1,137 @@
+"""
+A local HTTP server which answers the search requests of the Elasticsearch clients
+for a list of spans, like a Jaeger-Storage-Backend. Every search request is delayed
+to simulate the latency of a real cluster.
+"""
+
+import json
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import urlparse
+
+
+def matches(query, span):
+    """Returns if the span matches the query (range, terms and bool filters)."""
+    if 'bool' in query:
+        return all(matches(part, span) for part in query['bool'].get('filter', []))
+    if 'range' in query:
+        (field, bounds), = query['range'].items()
+        value = span[field]
+        return (value >= bounds.get('gte', value) and value <= bounds.get('lte', value)
+                and ('lt' not in bounds or value < bounds['lt']))
+    if 'terms' in query:
+        (field, values), = query['terms'].items()
+        return span[field] in values
+    raise ValueError(f'Unsupported query: {query}')
+
+
+class FakeElasticsearch:
+    """Serves the spans in a background thread, use as context manager."""
+
+    def __init__(self, spans, delay=0.0):
+        self.spans = spans
+        self.delay = delay
+        self.searches = 0
+        self.scrolls = {}
+        self.open_contexts = set()
+        self.lock = threading.Lock()
+        self.server = ThreadingHTTPServer(('127.0.0.1', 0), self.get_handler())
+        self.server.daemon_threads = True
+        self.url = f'http://127.0.0.1:{self.server.server_port}'
+
+    def __enter__(self):
+        threading.Thread(target=self.server.serve_forever, args=(0.05,), daemon=True).start()
+        return self
+
+    def __exit__(self, *args):
+        self.server.shutdown()
+        self.server.server_close()
+
+    def search(self, body):
+        """Returns the hits of a search request as (startTime, position of the span)."""
+        with self.lock:
+            self.searches += 1
+        time.sleep(self.delay)
+        hits = [(span['startTime'], i) for i, span in enumerate(self.spans)
+                if matches(body['query'], span)]
+        if 'pit' in body:
+            hits.sort()
+            if 'search_after' in body:
+                after = tuple(body['search_after'])
+                hits = [hit for hit in hits if hit > after]
+        return hits
+
+    def get_page(self, hits, size, **metadata):
+        """Returns a response with the first hits."""
+        return {
+            **metadata,
+            'hits': {
+                'hits': [{'_type': '_doc', '_source': self.spans[i], 'sort': [start, i]}
+                         for start, i in hits[:size]]
+            }
+        }
+
+    def handle(self, method, path, params, body):
+        """Returns the response for a request."""
+        parts = [part for part in path.split('/') if part]
+        if method in ('GET', 'HEAD') and not parts:
+            return {'version': {'number': '7.17.9', 'build_flavor': 'default'},
+                    'tagline': 'You Know, for Search'}
+        if parts[-1] == '_pit':
+            if method == 'DELETE':
+                self.open_contexts.discard(body['id'])
+                return {'succeeded': True}
+            self.open_contexts.add('pit')
+            return {'id': 'pit'}
+        if parts[-1] == 'scroll' and method == 'DELETE':
+            scroll_ids = body['scroll_id']
+            for scroll_id in scroll_ids if isinstance(scroll_ids, list) else [scroll_ids]:
+                self.open_contexts.discard(scroll_id)
+            return {'succeeded': True}
+        if parts[-1] == 'scroll':
+            scroll_id = body['scroll_id']
+            body, offset = self.scrolls[scroll_id]
+            hits = self.search(body)[offset:]
+            self.scrolls[scroll_id] = (body, offset + body['size'])
+            return self.get_page(hits, body['size'], _scroll_id=scroll_id)
+        if parts[-1] == '_search':
+            hits = self.search(body)
+            if 'scroll' in params:
+                with self.lock:
+                    scroll_id = f'scroll-{len(self.scrolls)}'
+                    self.scrolls[scroll_id] = (body, body['size'])
+                    self.open_contexts.add(scroll_id)
+                return self.get_page(hits, body['size'], _scroll_id=scroll_id)
+            return self.get_page(hits, body['size'])
+        raise ValueError(f'Unsupported request: {method} {path}')
+
+    def get_handler(self):
+        """Returns the request handler class of the server."""
+        fake = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = 'HTTP/1.1'
+            # the headers and the body are sent separately
+            disable_nagle_algorithm = True
+
+            def respond(self):
+                url = urlparse(self.path)
+                params = dict(param.split('=', 1) for param in url.query.split('&') if param)
+                length = int(self.headers.get('Content-Length') or 0)
+                body = json.loads(self.rfile.read(length)) if length else None
+                data = json.dumps(fake.handle(self.command, url.path, params, body)).encode()
+                self.send_response(200)
+                self.send_header('Content-Type', 'application/json')
+                self.send_header('Content-Length', str(len(data)))
+                self.send_header('X-Elastic-Product', 'Elasticsearch')
+                self.end_headers()
+                if self.command != 'HEAD':
+                    self.wfile.write(data)
+
+            do_GET = do_POST = do_DELETE = do_HEAD = respond
+
+            def log_message(self, *args):
+                pass
+
+        return Handler
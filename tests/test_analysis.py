@@ -1,14 +1,86 @@
+import copy
 import os
+import random
+import sys
+import tempfile
 import unittest
 import json
 
+from trace_explorer import config
 from trace_explorer.parsers import get_parser
 from trace_explorer.analysis.models import Trace
-from trace_explorer.analysis.rca import get_root_cause
+from trace_explorer.analysis.rca import (
+    compare_log_timestamps, get_root_cause, rating_hierarchy_level, resolve_cause_relation
+)
+from trace_explorer.analysis.utils import analyze_trace
+from trace_explorer.reports import OUTPUT_HTML, OUTPUT_JSON
 from trace_explorer.rules.parser import get_rules
 
+from .benchmarks.synthetic import make_span_data
+
 cwd = os.getcwd()
 
+
+def reference_get_root_cause(parent):
+    """The recursive rating of the errors, as reference for get_root_cause."""
+    parent_rating = 0
+    if parent.has_children():
+        rating_hierarchy_level(parent)
+        for child in parent.children:
+            if child.error and parent.error:
+                if child.type == 'child':
+                    earlier = sorted([child, parent], key=lambda span: span.cause_timestamp)
+                    resolve_cause_relation(earlier[0], earlier[1])
+                    earlier[0].rating += 1 + earlier[1].rating
+                if child.type == 'follower':
+                    if parent.cause_timestamp < child.cause_timestamp:
+                        resolve_cause_relation(parent, child)
+                        parent.rating += 1
+                    else:
+                        child.rating += 1
+                        parent.rating += 1
+                compare_log_timestamps(child, parent)
+            elif child.error:
+                child.rating += 1
+            elif parent.error:
+                parent_rating += 1
+
+            reference_get_root_cause(child)
+        parent.rating += parent_rating / len(parent.children)
+
+def reference_dict(span):
+    """The recursive representation of a span with its children, as reference for __dict__."""
+    fields = span.get_fields()
+    fields['children'] = [reference_dict(child) for child in span.children]
+    return fields
+
+def reference_caused_strand(span, visited=None):
+    """
+    The recursive search of the caused span, as reference for get_caused_strand.
+    Circular references recursed endlessly before, now the span reached twice is returned.
+    """
+    visited = visited or set()
+    if span.caused and span not in visited:
+        visited.add(span)
+        return reference_caused_strand(span.caused, visited)
+    return [span]
+
+def make_random_spans(rng, count):
+    """Returns a trace in which every span is the child or follower of a random previous span."""
+    spans = {'0': make_span_data('0', error=rng.random() < 0.5)}
+    for i in range(1, count):
+        ref_type = rng.choice(['CHILD_OF', 'FOLLOWS_FROM'])
+        spans[str(i)] = make_span_data(str(i), str(rng.randrange(i)), ref_type,
+                                       rng.randrange(5000), rng.random() < 0.4)
+    return spans
+
+def build_trace(spans, rules):
+    """Returns the trace of the spans with applied rules and counted errors."""
+    trace = Trace('1', copy.deepcopy(spans))
+    rules.apply(trace.spans)
+    trace.set_error_count()
+    return trace
+
 class TestCircularDetection(unittest.TestCase):
     """Checks if a circular dependency can be detected by the systems."""
 
@@ -105,5 +177,47 @@ class TestChildOfRelation(unittest.TestCase):
             assert len(strands) == 2, 'There should be exactly 2 failure strands recognized'
 
 
+class TestIterativeTraversal(unittest.TestCase):
+    """Checks if the iterative traversals give the same results as the recursive ones."""
+
+    def test_random_trees(self):
+        """Runs the test with random trees of children and followers."""
+        rng = random.Random(1)
+        rules = get_rules()
+        for _ in range(50):
+            spans = make_random_spans(rng, 60)
+            trace = build_trace(spans, rules)
+            reference = build_trace(spans, rules)
+            get_root_cause(trace.root_span)
+            reference_get_root_cause(reference.root_span)
+
+            for span in trace.spans:
+                expected = reference.span_index[span.span_id]
+                assert span.rating == expected.rating
+                for name in ('caused', 'caused_by'):
+                    related, expected_related = getattr(span, name), getattr(expected, name)
+                    assert str(related) == str(expected_related)
+                assert span.get_caused_strand() == reference_caused_strand(span)
+            assert trace.root_span.__dict__() == reference_dict(trace.root_span)
+
+    def test_deep_chain(self):
+        """Runs the test with the full analysis of a chain deeper than the recursion limit."""
+        depth = sys.getrecursionlimit() + 500
+        spans = {'0': make_span_data('0')}
+        for i in range(1, depth):
+            spans[str(i)] = make_span_data(str(i), str(i - 1), start_offset=i, error=i % 50 == 0)
+        report_dir = config.REPORT_DIR
+        with tempfile.TemporaryDirectory() as directory:
+            config.REPORT_DIR = directory
+            try:
+                summary = analyze_trace('1', spans, get_rules(), [OUTPUT_HTML, OUTPUT_JSON])
+            finally:
+                config.REPORT_DIR = report_dir
+            assert os.listdir(directory) == [summary.filename]
+
+        assert summary.error_count == (depth - 1) // 50
+        assert summary.result['rootCause'] is not None
+
+
 if __name__ == '__main__':
     unittest.main()
\ No newline at end of file
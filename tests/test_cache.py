@@ -0,0 +1,122 @@
+import copy
+import json
+import os
+import tempfile
+import time
+import unittest
+
+from trace_explorer import config
+from trace_explorer.analysis.cache import SpanCache
+from trace_explorer.analysis.utils import fetch_spans_in_range
+from trace_explorer.parsers import opentracing
+
+cwd = os.getcwd()
+
+
+class FakeQuery:
+    """Query module which returns spans at the given start times and records the queries."""
+
+    def __init__(self, start_times):
+        with open(os.path.join(cwd, "tests/test_child_of.json"), 'r') as f:
+            self.template = json.loads(f.read())[0]
+        self.start_times = start_times
+        self.queries = []
+
+    def iter_spans_in_range(self, start_time, end_time):
+        self.queries.append((start_time, end_time))
+        page = []
+        for start in self.start_times:
+            if start_time <= start <= end_time:
+                span = copy.deepcopy(self.template)
+                span['spanID'] = str(start)
+                span['startTime'] = start
+                span['references'] = []
+                page.append(span)
+        yield page
+
+
+class TestSpanCache(unittest.TestCase):
+    """Checks if only the parts of a time range which are not cached are fetched."""
+
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        self.cache = SpanCache(os.path.join(self.directory.name, 'spans.sqlite'), 10 ** 9)
+
+    def tearDown(self):
+        self.cache.close()
+        self.directory.cleanup()
+
+    def fetch(self, query, start_time, end_time):
+        """Return the span IDs of the time range."""
+        result = {}
+        fetch_spans_in_range(query, opentracing, start_time, end_time, result, self.cache)
+        return sorted(int(span_id) for spans in result.values() for span_id in spans)
+
+    def test_gaps(self):
+        """Runs the test with overlapping time ranges."""
+        query = FakeQuery([10, 50, 90, 120])
+
+        assert self.fetch(query, 0, 100) == [10, 50, 90]
+        assert self.fetch(query, 0, 100) == [10, 50, 90]
+        assert self.fetch(query, 50, 150) == [50, 90, 120]
+
+        assert query.queries == [(0, 100), (100, 150)]
+
+    def test_refresh(self):
+        """Runs the test with a refresh of the cached time range."""
+        query = FakeQuery([10, 50])
+        self.fetch(query, 0, 100)
+
+        config.CACHE_REFRESH = True
+        try:
+            assert self.fetch(query, 0, 100) == [10, 50]
+        finally:
+            config.CACHE_REFRESH = False
+
+        assert query.queries == [(0, 100), (0, 100)]
+
+    def test_eviction(self):
+        """Runs the test with a cache which can only hold a single span."""
+        self.cache.max_bytes = 1
+        query = FakeQuery([10, 50])
+
+        self.fetch(query, 0, 20)
+        self.fetch(query, 40, 60)
+
+        assert self.cache.get_gaps(0, 20) == [(0, 20)]
+        assert self.cache.get_gaps(40, 60) == [(40, 60)]
+
+    def test_restore(self):
+        """Runs the test with a cached span stored again by a fetch without time range."""
+        query = FakeQuery([10, 50])
+        self.fetch(query, 0, 100)
+        traces = {}
+        opentracing.parse_spans(next(query.iter_spans_in_range(50, 50)), traces)
+
+        self.cache.store(traces)
+        time.sleep(0.01)
+        covering = self.cache.connection.execute(
+            "SELECT id, size FROM segments WHERE covering"
+        ).fetchone()
+        self.cache.touch([covering[0]])
+        self.cache.max_bytes = covering[1]
+        self.cache.evict() # removes the segment without time range
+
+        result = {}
+        self.cache.load_range(0, 100, result)
+        assert self.cache.get_gaps(0, 100) == []
+        assert sorted(span_id for spans in result.values() for span_id in spans) == ['10', '50']
+
+    def test_recent_range(self):
+        """Runs the test with a time range which could still be incomplete."""
+        now = time.time_ns() // 1000
+        query = FakeQuery([now - 1000])
+
+        self.fetch(query, now - 2000, now)
+        self.fetch(query, now - 2000, now)
+
+        assert len(query.queries) == 2
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,73 @@
+import random
+import unittest
+
+from trace_explorer.analysis.models import Trace
+
+
+def make_span(parent_id, start_time, duration, service):
+    """Returns a span in the parsed format with a single log."""
+    references = []
+    if parent_id is not None:
+        references.append({"refType": "CHILD_OF", "traceID": "1", "spanID": parent_id})
+    return {
+        "operationName": "test",
+        "references": references,
+        "startTime": start_time,
+        "duration": duration,
+        "service": {"name": service},
+        "tags": {},
+        "logs": [{"timestamp": start_time + 1, "fields": {"event": "info"}}]
+    }
+
+def get_timestamps(trace):
+    """Return the start time and the log timestamps of every span."""
+    return {
+        span.span_id: (span.start_time, [log['timestamp'] for log in span.logs])
+        for span in trace.spans
+    }
+
+
+class TestClockSkew(unittest.TestCase):
+    """Checks the adjustment of spans which started before their parent."""
+
+    def test_propagation(self):
+        """Checks if the shift of a span is inherited by its descendants."""
+        trace = Trace("1", {
+            "grandchild": make_span("child", 60, 10, "db"),
+            "child": make_span("root", 50, 20, "db"),
+            "root": make_span(None, 100, 100, "api")
+        })
+
+        # child: 100 - 50 + (100 - 20) / 2, grandchild is not skewed relative to its parent
+        assert get_timestamps(trace) == {
+            "root": (100, [101]),
+            "child": (140, [141]),
+            "grandchild": (150, [151])
+        }
+        assert trace.clock_skew == {"db": {"spans": 1, "maxShift": 90}}
+
+    def test_reference_order(self):
+        """Checks if the result does not depend on the order of the spans."""
+        rand = random.Random(1)
+        spans = {"0": make_span(None, 1000, 1000, "api")}
+        for i in range(1, 300):
+            spans[str(i)] = make_span(
+                str(rand.randrange(i)), rand.randrange(2000), rand.randrange(1, 500),
+                rand.choice(["api", "db"])
+            )
+        expected = None
+        for _ in range(5):
+            items = list(spans.items())
+            rand.shuffle(items)
+            copies = {span_id: dict(span, logs=[dict(log) for log in span["logs"]])
+                      for span_id, span in items}
+
+            trace = Trace("1", copies)
+
+            if expected is None:
+                expected = (get_timestamps(trace), trace.clock_skew)
+            assert (get_timestamps(trace), trace.clock_skew) == expected
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,62 @@
+import random
+import unittest
+
+from trace_explorer.analysis.columnar import SpanColumns
+from trace_explorer.queries.stats import get_span_stats
+
+
+def make_trace(size, seed):
+    """Returns the spans of a random trace in the parsed format."""
+    rand = random.Random(seed)
+    spans = {}
+    for i in range(size):
+        error = rand.random() < 0.2
+        spans[str(i)] = {
+            "operationName": rand.choice(["GET /", "POST /"]),
+            "references": [],
+            "startTime": rand.randrange(1000),
+            "duration": rand.randrange(1, 100),
+            "service": {"name": rand.choice(["api", "db"])},
+            "tags": {"error": error},
+            "logs": [{"timestamp": 0, "fields": {"event": "error"}}] if error else []
+        }
+    return spans
+
+
+class TestSpanColumns(unittest.TestCase):
+    """Checks if the statistics of the columns match the statistics of the spans."""
+
+    def test_stats(self):
+        """Runs the test on random traces and compares with the statistics of the spans."""
+        traces_raw = {str(seed): make_trace(100, seed) for seed in range(10)}
+        columns = SpanColumns(traces_raw)
+
+        stats = columns.get_stats(200, 800)
+
+        spans = [(trace_id, span_data) for trace_id, spans in traces_raw.items()
+                 for span_data in spans.values() if 200 <= span_data["startTime"] <= 800]
+        assert stats['traceCount'] == 10
+        assert stats['spanCount'] == len(spans)
+        for service in ["api", "db"]:
+            durations = sorted(span_data["duration"] for _, span_data in spans
+                               if span_data["service"]["name"] == service)
+            errors = [span_data for _, span_data in spans
+                      if span_data["service"]["name"] == service and span_data["tags"]["error"]]
+            assert stats['services'][service]['spanCount'] == len(durations)
+            assert stats['services'][service]['errorCount'] == len(errors)
+            assert stats['services'][service]['min'] == durations[0]
+            assert stats['services'][service]['max'] == durations[-1]
+        assert stats == get_span_stats([trace_id for trace_id, _ in spans],
+                                       [span_data["service"]["name"] for _, span_data in spans],
+                                       [span_data["duration"] for _, span_data in spans],
+                                       [span_data["tags"]["error"] for _, span_data in spans])
+
+    def test_empty(self):
+        """Runs the test with a time range without spans."""
+        columns = SpanColumns({"1": make_trace(10, 1)})
+
+        assert columns.get_stats(2000, 3000) == {'traceCount': 0, 'spanCount': 0, 'services': {}}
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,175 @@
+import copy
+import json
+import os
+import unittest
+from unittest import mock
+
+from trace_explorer import config
+from trace_explorer.analysis import utils
+from trace_explorer.analysis.follow import Follower, TraceBuffer
+from trace_explorer.parsers import common, opentracing
+from trace_explorer.rules.parser import get_rules
+
+cwd = os.getcwd()
+
+
+class FakeQuery:
+    """Query module which returns the added spans by their start times."""
+
+    def __init__(self):
+        with open(os.path.join(cwd, "tests/test_child_of.json"), 'r') as f:
+            self.template = json.loads(f.read())[0]
+        self.spans = []
+        self.failures = {} # query function -> number of calls which fail
+
+    def fail(self, name):
+        """Raises a connection error for the configured number of calls of the query function."""
+        if self.failures.get(name):
+            self.failures[name] -= 1
+            raise ConnectionError('Storage-Backend not reachable')
+
+    def add_span(self, trace_id, span_id, start_time, parent_id=None):
+        span = copy.deepcopy(self.template)
+        span['traceID'] = trace_id
+        span['spanID'] = span_id
+        span['startTime'] = start_time
+        span['references'] = []
+        if parent_id:
+            span['references'] = [{'refType': 'CHILD_OF', 'traceID': trace_id,
+                                   'spanID': parent_id}]
+        self.spans.append(span)
+
+    def iter_spans_in_range(self, start_time, end_time):
+        self.fail('iter_spans_in_range')
+        yield [copy.deepcopy(span) for span in self.spans
+               if start_time <= span['startTime'] <= end_time]
+
+    def iter_spans_by_ids(self, span_ids, start_time, end_time):
+        self.fail('iter_spans_by_ids')
+        yield [copy.deepcopy(span) for span in self.spans if span['spanID'] in span_ids]
+
+
+class TestFollow(unittest.TestCase):
+    """Checks if traces are analyzed once after their quiet period."""
+
+    def setUp(self):
+        self.settings = (config.OUTPUTS, config.FOLLOW_QUIET_PERIOD, config.FOLLOW_OVERLAP,
+                         config.FOLLOW_MAX_SPANS)
+        config.OUTPUTS = []
+        config.FOLLOW_QUIET_PERIOD = 10
+        config.FOLLOW_OVERLAP = 5
+        config.FOLLOW_MAX_SPANS = 100
+        self.query = FakeQuery()
+        self.follower = Follower(get_rules(), self.query, opentracing, 100)
+
+    def tearDown(self):
+        (config.OUTPUTS, config.FOLLOW_QUIET_PERIOD, config.FOLLOW_OVERLAP,
+         config.FOLLOW_MAX_SPANS) = self.settings
+
+    def test_quiet_period(self):
+        """Runs the test with a trace which gets a new span and a late span after its analysis."""
+        self.query.add_span('a', 'a.0', 101)
+        self.follower.poll(103)
+        self.query.add_span('a', 'a.1', 104, 'a.0')
+        self.follower.poll(106)
+        # the overlapping poll does not update the trace
+        self.follower.poll(115)
+        assert self.follower.szenario.traces_count == 0
+        assert self.follower.buffer.span_count == 2
+
+        self.follower.poll(116)
+        assert self.follower.szenario.traces_count == 1
+        assert self.follower.buffer.span_count == 0
+
+        self.query.add_span('a', 'a.2', 113, 'a.0')
+        self.query.add_span('b', 'b.0', 114)
+        self.follower.poll(118)
+        assert list(self.follower.buffer.traces) == ['b']
+
+        self.follower.close()
+        assert self.follower.szenario.traces_count == 2
+        assert not self.follower.buffer.traces
+
+    def test_query_error(self):
+        """Runs the test with a failing poll, the time range is fetched again by the next one."""
+        self.query.add_span('a', 'a.0', 101)
+        self.query.failures['iter_spans_in_range'] = 1
+        self.follower.poll(103)
+        assert self.follower.watermark == 100
+        assert not self.follower.buffer.traces
+
+        self.follower.poll(104)
+        assert self.follower.watermark == 104
+        assert list(self.follower.buffer.traces) == ['a']
+
+    def test_reference_error(self):
+        """Runs the test with failing queries of referenced spans, the trace is retried."""
+        self.query.add_span('a', 'a.0', 90)
+        self.query.add_span('a', 'a.1', 101, 'a.0')
+        self.follower.poll(103)
+        self.query.failures['iter_spans_by_ids'] = 1
+        self.follower.poll(113)
+        assert self.follower.szenario.traces_count == 0
+        assert list(self.follower.buffer.traces) == ['a']
+        assert not self.query.failures['iter_spans_by_ids']
+
+        self.follower.poll(123)
+        assert self.follower.szenario.traces_count == 1
+        assert not self.follower.buffer.traces
+
+    def test_workers(self):
+        """Runs the test with worker processes, which are started once for all polls."""
+        workers = config.WORKERS
+        config.WORKERS = 2
+        try:
+            follower = Follower(get_rules(), self.query, opentracing, 100)
+        finally:
+            config.WORKERS = workers
+        executor = follower.executor
+        with mock.patch.object(utils, 'create_executor', side_effect=AssertionError), \
+                mock.patch.object(executor, 'shutdown', wraps=executor.shutdown) as shutdown:
+            for i, now in enumerate([103, 115, 127]):
+                self.query.add_span(str(i), f'{i}.0', now - 2)
+                follower.poll(now)
+            assert follower.szenario.traces_count == 2
+            assert not shutdown.called
+
+            follower.close()
+        assert follower.szenario.traces_count == 3
+        shutdown.assert_called_once()
+
+    def test_services(self):
+        """Runs the test with more services than shared service dicts are kept."""
+        services_size = common.SERVICES_SIZE
+        common.SERVICES_SIZE = 2
+        try:
+            for i in range(5):
+                self.query.add_span(str(i), f'{i}.0', 101)
+                self.query.spans[-1]['process']['serviceName'] = f'service-{i}'
+            self.follower.poll(103)
+        finally:
+            common.SERVICES_SIZE = services_size
+
+        assert len(common.services) <= 2
+        names = {span_data['service']['name'] for spans in self.follower.buffer.traces.values()
+                 for span_data in spans.values()}
+        assert names == {f'service-{i}' for i in range(5)}
+
+    def test_buffer(self):
+        """Runs the test with a buffer which is full and forgets old completed traces."""
+        buffer = TraceBuffer(max_spans=3, completed_size=1)
+        buffer.add({'a': {'a.0': {}, 'a.1': {}}, 'b': {'b.0': {}}}, 1)
+        buffer.add({'a': {'a.2': {}}}, 2)
+        assert list(buffer.traces) == ['b', 'a']
+        assert buffer.pop_complete(2, 10) == {'b': {'b.0': {}}}
+        assert buffer.span_count == 3
+
+        buffer.add({'c': {'c.0': {}}}, 3)
+        assert list(buffer.pop_complete(3, 10)) == ['a']
+        assert list(buffer.completed) == ['a']
+        assert buffer.add({'a': {'a.3': {}}, 'b': {'b.1': {}}}, 4) == 1
+        assert list(buffer.traces) == ['c', 'b']
+
+
+if __name__ == '__main__':
+    unittest.main()
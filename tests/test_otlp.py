@@ -0,0 +1,155 @@
+import base64
+import gzip
+import json
+import os
+import tempfile
+import unittest
+
+from trace_explorer.analysis.models import Trace
+from trace_explorer.parsers import otlp
+
+TRACE_ID = "5b8efff798038103d269b633813fc60c"
+
+REQUEST = {
+    "resourceSpans": [{
+        "resource": {"attributes": [
+            {"key": "service.name", "value": {"stringValue": "api"}},
+            {"key": "host.name", "value": {"stringValue": "api-1"}}
+        ]},
+        "scopeSpans": [{
+            "scope": {"name": "opentelemetry.instrumentation.flask", "version": "0.1"},
+            "spans": [{
+                "traceId": TRACE_ID,
+                "spanId": "eee19b7ec3c1b174",
+                "parentSpanId": "",
+                "name": "GET /",
+                "kind": 2,
+                "startTimeUnixNano": "1638815067374252000",
+                "endTimeUnixNano": "1638815067384252000",
+                "attributes": [
+                    {"key": "http.status_code", "value": {"intValue": "500"}},
+                    {"key": "http.flavor", "value": {"doubleValue": 1.1}},
+                    {"key": "retry", "value": {"boolValue": True}},
+                    {"key": "labels", "value": {"arrayValue": {"values": [
+                        {"stringValue": "a"}, {"stringValue": "b"}
+                    ]}}}
+                ],
+                "status": {"code": 2, "message": "Internal error"}
+            }]
+        }]
+    }, {
+        "resource": {"attributes": [
+            {"key": "service.name", "value": {"stringValue": "db"}}
+        ]},
+        "scopeSpans": [{
+            "scope": {"name": "opentelemetry.instrumentation.psycopg2"},
+            "spans": [{
+                "traceId": TRACE_ID,
+                "spanId": "d1b174eee19b7ec3",
+                "parentSpanId": "eee19b7ec3c1b174",
+                "name": "SELECT",
+                "kind": "SPAN_KIND_CLIENT",
+                "startTimeUnixNano": "1638815067375252000",
+                "endTimeUnixNano": "1638815067376252000",
+                "events": [{
+                    "timeUnixNano": "1638815067376000000",
+                    "name": "exception",
+                    "attributes": [
+                        {"key": "exception.type", "value": {"stringValue": "OperationalError"}},
+                        {"key": "exception.message", "value": {"stringValue": "timeout"}}
+                    ]
+                }],
+                "status": {"code": "STATUS_CODE_ERROR"}
+            }, {
+                "traceId": TRACE_ID,
+                "spanId": "0000000000000001",
+                "name": "cleanup",
+                "startTimeUnixNano": "1638815067390000000",
+                "endTimeUnixNano": "1638815067391000000",
+                "links": [
+                    {"traceId": "00000000000000000000000000000001", "spanId": "0000000000000002"},
+                    {"traceId": TRACE_ID, "spanId": "eee19b7ec3c1b174"}
+                ]
+            }]
+        }]
+    }]
+}
+
+
+def to_protobuf_json(request):
+    """Returns the request with base64 IDs, as used by the JSON mapping of protobuf."""
+    request = json.loads(json.dumps(request))
+    for resource_span in request["resourceSpans"]:
+        for scope_span in resource_span["scopeSpans"]:
+            for span in scope_span["spans"]:
+                for item in [span] + span.get("links", []):
+                    for key in ["traceId", "spanId", "parentSpanId"]:
+                        if key in item:
+                            item[key] = base64.b64encode(bytes.fromhex(item[key])).decode()
+    return request
+
+
+class TestOTLPParser(unittest.TestCase):
+    """Checks the transformation of OTLP into the expected format."""
+
+    def test_json(self):
+        """Runs the test with the JSON encoding."""
+        result = otlp.parse_request(json.loads(json.dumps(REQUEST)))
+
+        spans = result[TRACE_ID]
+        root = spans["eee19b7ec3c1b174"]
+        assert root["operationName"] == "GET /"
+        assert root["startTime"] == 1638815067374252
+        assert root["duration"] == 10000
+        assert root["references"] == []
+        assert root["service"] == {"name": "api", "host.name": "api-1"}
+        assert root["tags"]["span.kind"] == "server"
+        assert root["tags"]["http.status_code"] == 500
+        assert root["tags"]["labels"] == ["a", "b"]
+        assert root["tags"]["otel.scope.name"] == "opentelemetry.instrumentation.flask"
+        assert root["tags"]["error"] is True
+        assert root["logs"][0]["fields"]["event"] == "error" # taken from the status
+
+        child = spans["d1b174eee19b7ec3"]
+        assert child["references"] == [
+            {"refType": "CHILD_OF", "traceID": TRACE_ID, "spanID": "eee19b7ec3c1b174"}
+        ]
+        assert child["tags"]["span.kind"] == "client"
+        assert child["logs"] == [{
+            "timestamp": 1638815067376000,
+            "fields": {"event": "error", "error.object": "OperationalError", "message": "timeout"}
+        }]
+
+        follower = spans["0000000000000001"]
+        assert follower["references"] == [
+            {"refType": "FOLLOWS_FROM", "traceID": TRACE_ID, "spanID": "eee19b7ec3c1b174"}
+        ]
+        assert follower["tags"]["error"] is False
+
+        trace = Trace(TRACE_ID, spans)
+        assert trace.root_span.span_id == "eee19b7ec3c1b174"
+        assert trace.error_count == 2
+
+    @unittest.skipIf(otlp.TracesData is None, 'opentelemetry-proto is not installed')
+    def test_protobuf(self):
+        """Runs the test with the protobuf encoding, which has to give the same result."""
+        from google.protobuf.json_format import ParseDict
+
+        data = ParseDict(to_protobuf_json(REQUEST), otlp.TracesData()).SerializeToString()
+
+        assert otlp.parse_protobuf(data) == otlp.parse_request(json.loads(json.dumps(REQUEST)))
+
+    def test_read_file(self):
+        """Runs the test with a gzip compressed file with one request per line."""
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, 'traces.json.gz')
+            with gzip.open(path, 'wt', encoding='utf-8') as file:
+                file.write(json.dumps(REQUEST) + '\n' + json.dumps(REQUEST) + '\n')
+
+            result = otlp.read_file(path)
+
+        assert len(result[TRACE_ID]) == 3
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,240 @@
+import gzip
+import json
+import os
+import tempfile
+import unittest
+from datetime import datetime, timezone
+
+from elasticsearch import Elasticsearch
+
+from trace_explorer.queries import async_elasticsearch_helper, elasticsearch_helper, file_helper
+
+from .fake_elasticsearch import FakeElasticsearch
+
+cwd = os.getcwd()
+
+
+def to_microseconds(*args):
+    """Returns the UTC timestamp in microseconds."""
+    return int(datetime(*args, tzinfo=timezone.utc).timestamp() * 1e6)
+
+
+class TestIndexResolution(unittest.TestCase):
+    """Checks if the daily indices for a time range are resolved correctly."""
+
+    def test_single_day(self):
+        """Runs the test for a time range within one day."""
+        indices = elasticsearch_helper.get_indices(
+            to_microseconds(2021, 12, 6, 10, 0), to_microseconds(2021, 12, 6, 11, 0)
+        )
+        assert indices == ['jaeger-span-2021-12-06']
+
+    def test_midnight(self):
+        """Runs the test for a time range crossing midnight (UTC) and a month."""
+        indices = elasticsearch_helper.get_indices(
+            to_microseconds(2021, 11, 30, 23, 59), to_microseconds(2021, 12, 2, 0, 1)
+        )
+        assert indices == ['jaeger-span-2021-11-30', 'jaeger-span-2021-12-01',
+                           'jaeger-span-2021-12-02']
+
+
+def read_spans():
+    """Return the spans of the test data with a different start time per span."""
+    with open(os.path.join(cwd, "tests/test_child_of.json"), 'r') as f:
+        spans = json.loads(f.read())
+    for i, span in enumerate(spans):
+        span['startTime'] = 1000 + i
+        span['operationName'] = 'GET /\u00fcber' # non-ASCII
+    return spans
+
+def to_jaeger_export(spans):
+    """Returns the spans in the format of a Jaeger JSON export."""
+    spans = json.loads(json.dumps(spans))
+    processes = {}
+    for i, span in enumerate(spans):
+        processes[f'p{i}'] = span.pop('process')
+        span['processID'] = f'p{i}'
+    return {"data": [{"traceID": "1", "spans": spans, "processes": processes}],
+            "total": 0, "limit": 0, "offset": 0, "errors": None}
+
+
+class TestFileBackend(unittest.TestCase):
+    """Checks if the spans are read from all supported file formats."""
+
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        self.spans = read_spans()
+        self.chunk_size = file_helper.CHUNK_SIZE
+        file_helper.CHUNK_SIZE = 7 # forces values to span multiple chunks
+
+    def tearDown(self):
+        file_helper.CHUNK_SIZE = self.chunk_size
+        file_helper.PATH = None
+        self.directory.cleanup()
+
+    def write(self, name, content, compress=False):
+        """Writes the content into a file and configures it as path."""
+        file_helper.PATH = os.path.join(self.directory.name, name)
+        opener = gzip.open if compress else open
+        with opener(file_helper.PATH, 'wt', encoding='utf-8') as file:
+            file.write(content)
+
+    def check(self):
+        """Checks the spans read from the configured file."""
+        spans = file_helper.get_spans_in_range(1001, 1003)
+        assert sorted(span['spanID'] for span in spans) == ['1.1', '1.2', '1.3']
+        assert all(span['operationName'] == 'GET /\u00fcber' for span in spans)
+        assert all(span['process']['serviceName'] for span in spans)
+
+        spans = file_helper.get_spans_by_ids(['1.0', '1.4', '2.0'], 0, 2000)
+        assert sorted(span['spanID'] for span in spans) == ['1.0', '1.4']
+        assert not file_helper.get_spans_by_ids(['1.0'], 1001, 2000)
+
+    def test_array(self):
+        """Runs the test with a JSON array of spans."""
+        self.write('spans.json', json.dumps(self.spans, indent=2))
+        self.check()
+
+    def test_ndjson(self):
+        """Runs the test with a gzip compressed NDJSON file."""
+        self.write('spans.ndjson.gz', '\n'.join(json.dumps(span) for span in self.spans),
+                   compress=True)
+        self.check()
+
+    def test_hits(self):
+        """Runs the test with NDJSON of Elasticsearch hits and a search response."""
+        hits = [{"_index": "jaeger-span", "_id": str(i), "_source": span}
+                for i, span in enumerate(self.spans)]
+        self.write('hits.ndjson', '\n'.join(json.dumps(hit) for hit in hits))
+        self.check()
+        self.write('response.json', json.dumps({
+            "took": 1, "timed_out": False, "hits": {"total": {"value": 5}, "hits": hits}
+        }))
+        self.check()
+
+    def test_appended(self):
+        """Runs the test with spans appended to the file, which are indexed again."""
+        self.write('spans.ndjson', '\n'.join(json.dumps(span) for span in self.spans[:3]))
+        assert len(file_helper.get_spans_in_range(1000, 2000)) == 3
+        with open(file_helper.PATH, 'a', encoding='utf-8') as file:
+            file.write('\n' + '\n'.join(json.dumps(span) for span in self.spans[3:]))
+        mtime = os.path.getmtime(file_helper.PATH) + 1
+        os.utime(file_helper.PATH, (mtime, mtime))
+
+        self.check()
+        assert len(file_helper.indices) == 1
+
+    def test_jaeger_export(self):
+        """Runs the test with a Jaeger JSON export."""
+        self.write('export.json', json.dumps(to_jaeger_export(self.spans)))
+        self.check()
+
+    def test_directory(self):
+        """Runs the test with the spans split into the files of a directory."""
+        self.write('a.json', json.dumps(self.spans[:2]))
+        self.write('b.ndjson', '\n'.join(json.dumps(span) for span in self.spans[2:]))
+        file_helper.PATH = self.directory.name
+        self.check()
+
+    def test_error_traces(self):
+        """Runs the test with a trace without errors and a trace with HTTP status code 500."""
+        spans = json.loads(json.dumps(self.spans))
+        for trace_id, span in zip(['2', '2', '3', '3', '3'], spans):
+            span['traceID'] = trace_id
+            span['spanID'] = trace_id + span['spanID'][1:]
+            span['tags'] = [{'key': 'error', 'type': 'bool', 'value': 'false'}]
+        spans[4]['tags'].append({'key': 'http.status_code', 'type': 'int64', 'value': '500'})
+        self.write('spans.json', json.dumps(self.spans + spans))
+
+        assert list(file_helper.iter_error_trace_ids(1000, 1003)) == [['1']]
+        assert list(file_helper.iter_error_trace_ids(1000, 2000)) == [['1', '3']]
+        assert file_helper.get_szenario_stats(1000, 2000)['traceCount'] == 3
+        spans = [span for page in file_helper.iter_spans_by_trace_ids(['3'], 1000, 1003)
+                 for span in page]
+        assert sorted(span['spanID'] for span in spans) == ['3.2', '3.3']
+
+    def test_stats(self):
+        """Runs the test with the statistics of a time range."""
+        for i, span in enumerate(self.spans):
+            span['duration'] = (i + 1) * 100
+        self.write('spans.json', json.dumps(self.spans))
+
+        stats = file_helper.get_szenario_stats(1001, 1004)
+
+        assert stats['traceCount'] == 1
+        assert stats['spanCount'] == 4
+        service = stats['services']['api']
+        assert (service['spanCount'], service['errorCount']) == (4, 4)
+        assert (service['min'], service['max'], service['mean']) == (200, 500, 350.0)
+        for key, value in [('p50', 350), ('p95', 485), ('p99', 497)]:
+            self.assertAlmostEqual(service[key], value)
+
+
+@unittest.skipIf(async_elasticsearch_helper.AsyncElasticsearch is None, 'aiohttp is not installed')
+class TestAsyncElasticsearch(unittest.TestCase):
+    """Checks if the concurrent requests return the same spans as the synchronous client."""
+
+    def setUp(self):
+        template = read_spans()[0]
+        # two spans per start time, some of them on the boundaries of the sub-ranges
+        self.spans = [dict(template, traceID=str(i // 10), spanID=str(i), startTime=1000 + i // 2)
+                      for i in range(2000)]
+        self.settings = (elasticsearch_helper.BASE_URL, elasticsearch_helper.es,
+                         elasticsearch_helper.PAGING, elasticsearch_helper.PAGE_SIZE,
+                         elasticsearch_helper.TERMS_CHUNK_SIZE)
+        elasticsearch_helper.PAGE_SIZE = 50
+        elasticsearch_helper.TERMS_CHUNK_SIZE = 40
+
+    def tearDown(self):
+        (elasticsearch_helper.BASE_URL, elasticsearch_helper.es, elasticsearch_helper.PAGING,
+         elasticsearch_helper.PAGE_SIZE, elasticsearch_helper.TERMS_CHUNK_SIZE) = self.settings
+
+    def check(self, server):
+        """Checks the spans of both clients."""
+        elasticsearch_helper.BASE_URL = server.url
+        elasticsearch_helper.es = Elasticsearch(server.url,
+                                                serializer=elasticsearch_helper.Serializer())
+        expected = [str(i) for i in range(20, 2000)]
+        for helper in (elasticsearch_helper, async_elasticsearch_helper):
+            spans = helper.get_spans_in_range(1010, 1999)
+            assert sorted(span['spanID'] for span in spans) == sorted(expected)
+
+            span_ids = [str(i) for i in range(0, 2000, 7)]
+            spans = helper.get_spans_by_ids(span_ids, 1000, 1999)
+            assert sorted(span['spanID'] for span in spans) == sorted(span_ids)
+
+            spans = [span for page in helper.iter_spans_by_trace_ids(['1', '150'], 1003, 1999)
+                     for span in page]
+            assert sorted(span['spanID'] for span in spans) == sorted(
+                [str(i) for i in range(10, 20)] + [str(i) for i in range(1500, 1510)])
+        assert not server.open_contexts
+
+    def test_pit(self):
+        """Runs the test with points in time and slow responses, so the requests overlap."""
+        with FakeElasticsearch(self.spans, delay=0.02) as server:
+            self.check(server)
+
+    def test_scroll(self):
+        """
+        Runs the test with scrolls and with a consumer which stops after the first page,
+        while the first requests of the other queries are still running.
+        """
+        elasticsearch_helper.PAGING = elasticsearch_helper.PAGING_SCROLL
+        with FakeElasticsearch(self.spans, delay=0.02) as server:
+            self.check(server)
+            pages = async_elasticsearch_helper.iter_spans_in_range(1000, 1999)
+            next(pages)
+            pages.close()
+            assert not server.open_contexts
+
+    def test_error(self):
+        """Runs the test with an error, which stops all requests."""
+        elasticsearch_helper.PAGING = 'unknown'
+        with FakeElasticsearch(self.spans) as server:
+            elasticsearch_helper.BASE_URL = server.url
+            with self.assertRaises(ValueError):
+                async_elasticsearch_helper.get_spans_in_range(1000, 1999)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,114 @@
+import json
+import os
+import tempfile
+import unittest
+
+from trace_explorer import config
+from trace_explorer.analysis.models import Szenario, Trace
+from trace_explorer.analysis.rca import get_root_cause
+from trace_explorer.parsers import opentracing
+from trace_explorer.reports import html, ndjson
+from trace_explorer.rules.parser import get_rules
+
+cwd = os.getcwd()
+
+
+class ReportTestCase(unittest.TestCase):
+    """Analyzes the test trace and writes the reports into a temporary directory."""
+
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        self.report_dir = config.REPORT_DIR
+        config.REPORT_DIR = self.directory.name
+        with open(os.path.join(cwd, "tests/test_child_of.json"), 'r') as f:
+            trace_id, spans = next(iter(opentracing.parse_spans(json.loads(f.read())).items()))
+        self.trace = Trace(trace_id, spans)
+        get_rules().apply(self.trace.spans)
+        self.trace.set_error_count()
+        get_root_cause(self.trace.root_span)
+
+    def tearDown(self):
+        config.REPORT_DIR = self.report_dir
+        self.directory.cleanup()
+
+
+class TestTraceReport(ReportTestCase):
+    """Checks if reports are only rendered again if their content changed."""
+
+    def test_unchanged(self):
+        """Runs the test with an unchanged and a changed trace."""
+        filename = os.path.join(self.directory.name, self.trace.filename)
+        context = html.get_trace_context(self.trace)
+
+        assert html.write_report(filename, 'spans.html', context)
+        with open(filename, 'r', encoding='utf-8') as file:
+            content = file.read()
+        assert html.read_content_hash(filename)
+        assert self.trace.root_span.operation_name in content
+
+        assert not html.write_report(filename, 'spans.html', html.get_trace_context(self.trace))
+
+        self.trace.root_span.cause = 'Changed cause'
+        assert html.write_report(filename, 'spans.html', html.get_trace_context(self.trace))
+        assert os.listdir(self.directory.name) == [self.trace.filename]
+
+    def test_tree(self):
+        """Runs the test with the encoding of the span tree and a cause closing the script."""
+        spans = self.trace.spans
+        error_span = next(span for span in spans if span.error)
+        error_span.cause = '</script>'
+
+        encoded = html.get_tree_data(self.trace.root_span)
+        tree = json.loads(encoded)
+
+        assert '</' not in encoded
+        assert len(tree['parent']) == len(spans)
+        assert tree['parent'][0] == -1
+        assert all(0 <= parent < i for i, parent in enumerate(tree['parent'][1:], 1))
+        assert tree['names'][tree['name'][0]] == self.trace.root_span.operation_name
+        assert '</script>' in tree['errors'].values()
+        assert len(tree['errors']) == sum(1 for span in spans if span.error)
+
+
+class TestResults(ReportTestCase):
+    """Checks the machine-readable results of the traces and szenarios."""
+
+    def test_results(self):
+        """Runs the test with the results of a trace in a szenario."""
+        summary = self.trace.summarize()
+        summary.result = ndjson.get_trace_result(self.trace)
+        szenario = Szenario('szenario', '[]', '[]')
+        outputs = config.OUTPUTS
+        config.OUTPUTS = [ndjson.OUTPUT_JSON]
+        try:
+            results = ndjson.open_results()
+        finally:
+            config.OUTPUTS = outputs
+        results.write(summary, [szenario.name])
+        szenario.add_trace(summary)
+        results.close()
+        ndjson.create_szenario_json([szenario])
+
+        with open(os.path.join(self.directory.name, ndjson.RESULTS_FILENAME), 'r') as file:
+            lines = file.read().splitlines()
+        assert len(lines) == 1
+        result = json.loads(lines[0])
+        assert result['traceID'] == self.trace.trace_id
+        assert result['szenarios'] == ['szenario']
+        assert result['errorCount'] == self.trace.error_count
+        strands = self.trace.get_error_strands()
+        assert result['strands'] == [[span.span_id for span in strand] for strand in strands]
+        ratings = [span['rating'] for span in result['spans']]
+        assert ratings == sorted(ratings, reverse=True)
+        assert result['rootCause'] == next(span['spanID'] for span in result['spans']
+                                           if span['error'])
+        assert summary.result is None # not kept after writing
+
+        with open(os.path.join(self.directory.name, ndjson.SZENARIOS_FILENAME), 'r') as file:
+            szenarios = json.loads(file.read())
+        assert szenarios[0]['tracesCount'] == 1
+        assert szenarios[0]['traces'][0]['traceID'] == self.trace.trace_id
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,134 @@
+import json
+import random
+import unittest
+
+from trace_explorer.analysis.models import Span
+from trace_explorer.rules.models import RuleSet
+from trace_explorer.rules.parser import parse
+
+RULES = {
+    "rootChildren": {
+        "category": "test",
+        "conditions": [{"location": "tags", "field": "span.kind", "match": "server"}],
+        "actions": [{
+            "type": "children",
+            "match": [{"location": "tags", "field": "status", "match": "500"}],
+            "cause": "Error in {tags:depth}",
+            "error": True
+        }]
+    },
+    "clientChildren": {
+        "category": "test",
+        "conditions": [{"location": "tags", "field": "component", "match": "client"}],
+        "actions": [{
+            "type": "children",
+            "match": [{"location": "tags", "field": "status", "match": "404"}],
+            "cause": "Not found in {tags:depth}",
+            "error": False
+        }]
+    },
+    "parentAndSelf": {
+        "category": "test",
+        "conditions": [{"location": "tags", "field": "status", "match": "404"}],
+        "actions": [{
+            "type": "parent",
+            "match": [{"location": "tags", "field": "component", "match": "client"}],
+            "cause": "Parent of {tags:depth}",
+            "error": True
+        }, {
+            "type": "self",
+            "match": [],
+            "cause": "Self {tags:depth}",
+            "error": False
+        }]
+    },
+    "leaf": {
+        "category": "test",
+        "conditions": [{"location": "tags", "field": "status", "match": "500"}],
+        "actions": [{
+            "type": "no-children",
+            "match": [],
+            "cause": "Leaf {tags:depth}",
+            "error": True
+        }]
+    }
+}
+
+
+def make_span(depth, tags):
+    """Returns a span without logs, started after its parents."""
+    tags = dict(tags, depth=depth)
+    return Span('1', str(depth), {
+        "operationName": "test",
+        "startTime": depth,
+        "duration": 1,
+        "service": {"name": "test"},
+        "tags": tags,
+        "references": []
+    })
+
+def make_chain(depth):
+    """Returns the spans of a chain in which every span is the child of the previous one."""
+    spans = [make_span(0, {"span.kind": "server"})]
+    for i in range(1, depth):
+        span = make_span(i, {"status": "500" if i % 3 == 0 else "200"})
+        spans[-1].add_child(span)
+        spans.append(span)
+    return spans
+
+def make_tree(size, seed):
+    """Returns the spans of a random tree with random tags."""
+    rand = random.Random(seed)
+    spans = [make_span(0, {"span.kind": "server"})]
+    for i in range(1, size):
+        tags = {
+            "component": rand.choice(["client", "server"]),
+            "status": rand.choice(["200", "404", "500"])
+        }
+        span = make_span(i, tags)
+        rand.choice(spans).add_child(span)
+        spans.append(span)
+    rand.shuffle(spans)
+    return spans
+
+def get_result(spans):
+    """Returns the attributes written by the rules."""
+    return {span.span_id: (span.cause, span.error, span.cause_timestamp) for span in spans}
+
+
+class TestRuleSetApply(unittest.TestCase):
+    """Checks if applying a rule set to a trace at once has the same result as per span."""
+
+    def test_deep_chain(self):
+        """Runs the test on a chain of 5000 spans."""
+        rules = RuleSet(parse(json.dumps({"rootChildren": RULES["rootChildren"]})))
+        spans = make_chain(5000)
+
+        rules.apply(spans)
+
+        for span in spans[1:]:
+            if int(span.span_id) % 3 == 0:
+                assert span.cause == f'Error in {span.span_id}'
+                assert span.error
+                assert span.cause_timestamp == span.end_time
+            else:
+                assert span.cause is None
+                assert not span.error
+
+    def test_random_trees(self):
+        """Runs the test on random trees and compares with performing the rules per span."""
+        rules = RuleSet(parse(json.dumps(RULES)))
+        for seed in range(20):
+            expected_spans = make_tree(300, seed)
+            for span in expected_spans:
+                for rule in rules:
+                    rule.perform(span)
+
+            spans = make_tree(300, seed)
+            rules.apply(spans)
+
+            assert get_result(spans) == get_result(expected_spans)
+
+
+if __name__ == '__main__':
+    unittest.main()
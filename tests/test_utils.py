@@ -0,0 +1,228 @@
+import copy
+import json
+import multiprocessing
+import os
+import tempfile
+import unittest
+from unittest import mock
+
+from trace_explorer import config, queries
+from trace_explorer.analysis.utils import (
+    analyze_szenarios, analyze_trace, assign_traces, coalesce_ranges, fetch_missing_spans,
+    map_traces
+)
+from trace_explorer.definitions import span as span_def
+from trace_explorer.parsers import opentracing
+from trace_explorer.queries import file_helper
+from trace_explorer.reports import OUTPUT_HTML, OUTPUT_JSON
+from trace_explorer.rules.parser import get_rules
+
+cwd = os.getcwd()
+
+
+class FakeQuery:
+    """Query module which returns the added spans by their SpanIDs and records the queries."""
+
+    def __init__(self):
+        with open(os.path.join(cwd, "tests/test_child_of.json"), 'r') as f:
+            self.template = json.loads(f.read())[0]
+        self.spans = []
+        self.queries = []
+
+    def make_span(self, trace_id, span_id, parent_id=None, start_time=1000):
+        """Returns a raw span of the trace, as child of the parent."""
+        span = copy.deepcopy(self.template)
+        span['traceID'] = trace_id
+        span['spanID'] = span_id
+        span['startTime'] = start_time
+        span['references'] = []
+        if parent_id:
+            span['references'] = [{'refType': 'CHILD_OF', 'traceID': trace_id,
+                                   'spanID': parent_id}]
+        return span
+
+    def add_span(self, *args, **kwargs):
+        self.spans.append(self.make_span(*args, **kwargs))
+
+    def iter_spans_by_ids(self, span_ids, start_time, end_time):
+        self.queries.append(set(span_ids))
+        yield [copy.deepcopy(span) for span in self.spans if span['spanID'] in span_ids]
+
+
+class TestFetchMissingSpans(unittest.TestCase):
+    """Checks if missing referenced spans are fetched in rounds and merged into their traces."""
+
+    def test_chain(self):
+        """Runs the test with a chain of missing parents and a span of a foreign trace."""
+        query = FakeQuery()
+        query.add_span('1', '1.0')
+        query.add_span('1', '1.1', '1.0')
+        query.add_span('1', '1.2', '1.1')
+        # referenced by trace 1, but stored in a trace which is not analyzed
+        query.add_span('2', '2.0')
+        traces_raw = {}
+        opentracing.parse_spans([query.make_span('1', '1.3', '1.2'),
+                                 query.make_span('1', '1.4', '2.0')], traces_raw)
+
+        fetch_missing_spans(traces_raw, query, opentracing, 1000, 2000)
+
+        assert query.queries == [{'1.2', '2.0'}, {'1.1'}, {'1.0'}]
+        assert list(traces_raw) == ['1']
+        assert sorted(traces_raw['1']) == ['1.0', '1.1', '1.2', '1.3', '1.4']
+
+    def test_complete(self):
+        """Runs the test with a complete trace, which needs no query."""
+        query = FakeQuery()
+        traces_raw = {}
+        opentracing.parse_spans([query.make_span('1', '1.0'),
+                                 query.make_span('1', '1.1', '1.0')], traces_raw)
+
+        fetch_missing_spans(traces_raw, query, opentracing, 1000, 2000)
+
+        assert not query.queries
+        assert sorted(traces_raw['1']) == ['1.0', '1.1']
+
+
+class TestMapTraces(unittest.TestCase):
+    """Checks if the worker processes analyze the traces like the parent process."""
+
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        self.settings = (config.REPORT_DIR, config.OUTPUTS, config.WORKERS)
+        config.REPORT_DIR = self.directory.name
+        config.OUTPUTS = [OUTPUT_HTML, OUTPUT_JSON]
+        with open(os.path.join(cwd, "tests/test_child_of.json"), 'r') as f:
+            spans = next(iter(opentracing.parse_spans(json.loads(f.read())).values()))
+        self.traces_raw = {str(i): copy.deepcopy(spans) for i in range(1, 5)}
+
+    def tearDown(self):
+        config.REPORT_DIR, config.OUTPUTS, config.WORKERS = self.settings
+        self.directory.cleanup()
+
+    def analyze(self, workers):
+        """Returns the summaries of the traces analyzed with the number of workers."""
+        config.WORKERS = workers
+        summaries = list(map_traces(copy.deepcopy(self.traces_raw), get_rules()))
+        return [(summary.trace_id, summary.error_count, summary.result)
+                for summary in summaries]
+
+    def test_spawn(self):
+        """Runs the test with spawned workers, which import the config again."""
+        expected = self.analyze(1)
+        for filename in os.listdir(self.directory.name):
+            os.remove(os.path.join(self.directory.name, filename))
+        start_method = multiprocessing.get_start_method()
+        multiprocessing.set_start_method('spawn', force=True)
+        try:
+            summaries = self.analyze(2)
+        finally:
+            multiprocessing.set_start_method(start_method, force=True)
+
+        assert summaries == expected
+        assert all(result is not None for _, _, result in summaries)
+        assert sorted(os.listdir(self.directory.name)) == [f'trace_{i}.html' for i in range(1, 5)]
+
+    def test_outputs(self):
+        """Runs the test with the output formats passed to the analysis instead of the config."""
+        spans = self.traces_raw['1']
+        config.OUTPUTS = [OUTPUT_HTML]
+
+        summary = analyze_trace('1', spans, get_rules(), [OUTPUT_JSON])
+
+        assert summary.result is not None
+        assert not os.listdir(self.directory.name)
+
+
+def make_traces(**start_times):
+    """Returns traces with a span per start time, only the start times are set."""
+    return {trace_id: {f'{trace_id}.{i}': {span_def.START_TIME: start}
+                       for i, start in enumerate(starts)}
+            for trace_id, starts in start_times.items()}
+
+
+class TestSzenarioRanges(unittest.TestCase):
+    """Checks the merging of the time ranges of szenarios and the assignment of the traces."""
+
+    def setUp(self):
+        self.merge_gap = config.SZENARIO_MERGE_GAP
+        config.SZENARIO_MERGE_GAP = 10
+
+    def tearDown(self):
+        config.SZENARIO_MERGE_GAP = self.merge_gap
+
+    def test_overlapping(self):
+        """Runs the test with overlapping and contained time ranges in any order."""
+        assert coalesce_ranges([(50, 150), (0, 100), (60, 70)]) == [[0, 150]]
+
+    def test_gap(self):
+        """Runs the test with gaps below, at and above the merge gap."""
+        assert coalesce_ranges([(0, 100), (109, 200)]) == [[0, 200]]
+        assert coalesce_ranges([(0, 100), (110, 200)]) == [[0, 200]]
+        assert coalesce_ranges([(0, 100), (111, 200)]) == [[0, 100], [111, 200]]
+
+    def test_assign_gap(self):
+        """Runs the test with traces starting in the gap between and outside of the ranges."""
+        ranges = [(200, 300), (0, 100)]
+        traces_raw = make_traces(a=[250, 150], b=[50, 250], c=[150, 350], d=[100])
+
+        assert assign_traces(traces_raw, ranges) == {'a': [0], 'b': [1], 'd': [1]}
+
+    def test_assign_overlapping(self):
+        """Runs the test with a trace starting in two overlapping ranges."""
+        ranges = [(200, 300), (50, 150), (0, 100), (0, 10)]
+        traces_raw = make_traces(a=[160, 75], b=[120], c=[160, 5])
+
+        assert assign_traces(traces_raw, ranges) == {'a': [1, 2], 'b': [1], 'c': [2, 3]}
+
+
+class TestSzenarioStats(unittest.TestCase):
+    """Checks if the statistics of the szenarios are computed from the fetched spans."""
+
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        self.settings = (queries.DB_ENGINE, config.REPORT_DIR, config.OUTPUTS,
+                         config.CACHE_ENABLED, config.ERRORS_ONLY)
+        queries.DB_ENGINE = 'File'
+        config.REPORT_DIR = self.directory.name
+        config.OUTPUTS = []
+        config.CACHE_ENABLED = False
+        with open(os.path.join(cwd, "tests/test_child_of.json"), 'r') as f:
+            spans = json.loads(f.read())
+        for i, span in enumerate(spans):
+            span['startTime'] = 1000 + i
+            span['duration'] = (i + 1) * 100
+        file_helper.PATH = os.path.join(self.directory.name, 'spans.json')
+        with open(file_helper.PATH, 'w') as f:
+            f.write(json.dumps(spans))
+        self.rows = [(1000, 1002, 'a', '[]', '[]'), (1001, 1004, 'b', '[]', '[]')]
+
+    def tearDown(self):
+        (queries.DB_ENGINE, config.REPORT_DIR, config.OUTPUTS,
+         config.CACHE_ENABLED, config.ERRORS_ONLY) = self.settings
+        file_helper.PATH = None
+        self.directory.cleanup()
+
+    def test_all_spans(self):
+        """Runs the test with all spans fetched, the backend must not be asked."""
+        config.ERRORS_ONLY = False
+        expected = [file_helper.get_szenario_stats(row[0], row[1]) for row in self.rows]
+        with mock.patch.object(file_helper, 'get_szenario_stats',
+                               side_effect=ConnectionError('unreachable')):
+            szenarios = analyze_szenarios(self.rows, get_rules())
+
+        assert [szenario.stats for szenario in szenarios] == expected
+        assert [szenario.traces_count for szenario in szenarios] == [1, 0]
+
+    def test_errors_only(self):
+        """Runs the test with only the traces with errors fetched, the backend is asked."""
+        config.ERRORS_ONLY = True
+        with mock.patch.object(file_helper, 'get_szenario_stats',
+                               wraps=file_helper.get_szenario_stats) as get_szenario_stats:
+            szenarios = analyze_szenarios(self.rows, get_rules())
+
+        assert get_szenario_stats.call_count == 2
+        assert [szenario.stats['spanCount'] for szenario in szenarios] == [3, 4]
+
+
+if __name__ == '__main__':
+    unittest.main()